@@ -0,0 +1,71 @@
+"""
+Benchmark the streaming data pipeline against the original three-pass one.
+
+Builds a synthetic raw dataset in a temp directory and reports wall time and
+bytes written to disk for each. Hardlinked outputs count as zero bytes written.
+Usage: python bench_data_pipeline.py [num_classes] [images_per_class]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import data_pipeline
+
+
+def make_raw_dataset(root, num_classes, per_class):
+    rng = np.random.default_rng(0)
+    for c in range(num_classes):
+        class_dir = Path(root) / f"class_{c}"
+        class_dir.mkdir(parents=True)
+        for i in range(per_class):
+            image = rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+            cv2.imwrite(str(class_dir / f"{i}.jpg"), cv2.GaussianBlur(image, (9, 9), 0))
+    # One corrupt file so the cleaning path is exercised
+    (Path(root) / "class_0" / "broken.jpg").write_bytes(b"not an image")
+
+
+def bytes_written(*dirs):
+    total = 0
+    for d in dirs:
+        for path in Path(d).rglob("*"):
+            stat = path.stat()
+            if path.is_file() and stat.st_nlink == 1:
+                total += stat.st_size
+    return total
+
+
+def main(num_classes=5, per_class=40):
+    root = Path(tempfile.mkdtemp())
+    raw = root / "raw"
+    make_raw_dataset(raw, num_classes, per_class)
+    print(f"[*] Raw dataset: {num_classes * per_class} images, {bytes_written(raw) / 1e6:.1f} MB")
+
+    t0 = time.perf_counter()
+    data_pipeline.clean_data(raw, root / "processed")
+    data_pipeline.augment_dataset(root / "processed")
+    data_pipeline.split_dataset(root / "processed", root / "legacy_splits")
+    legacy_time = time.perf_counter() - t0
+    legacy_bytes = bytes_written(root / "processed", root / "legacy_splits")
+
+    t0 = time.perf_counter()
+    data_pipeline.run_pipeline(raw, root / "splits")
+    stream_time = time.perf_counter() - t0
+    stream_bytes = bytes_written(root / "splits")
+
+    dataset = data_pipeline.AugmentedDataset(root / "splits" / "train")
+    t0 = time.perf_counter()
+    for i in range(len(dataset)):
+        dataset[i]
+    load_rate = len(dataset) / (time.perf_counter() - t0)
+
+    print(f"\n[*] Legacy pipeline:    {legacy_time:6.2f}s, {legacy_bytes / 1e6:8.1f} MB written")
+    print(f"[*] Streaming pipeline: {stream_time:6.2f}s, {stream_bytes / 1e6:8.1f} MB written")
+    print(f"[*] Lazy augmentation:  {len(dataset)} train samples at {load_rate:.0f} samples/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,86 @@
+"""
+Benchmark packed shards against the loose cub_yolo layout.
+
+Builds a synthetic cub_yolo tree, packs it, then reads every sample in random
+order both ways, counting open() calls and measuring samples per second.
+Usage: python bench_packed_dataset.py [num_samples]
+"""
+import builtins
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import packed_dataset
+
+
+class OpenCounter:
+    """Counts open() calls made from Python while active."""
+
+    def __enter__(self):
+        self.count = 0
+        self._open = builtins.open
+
+        def counting_open(*args, **kwargs):
+            self.count += 1
+            return self._open(*args, **kwargs)
+
+        builtins.open = counting_open
+        return self
+
+    def __exit__(self, *exc):
+        builtins.open = self._open
+
+
+def make_cub_yolo(root, num_samples):
+    rng = np.random.default_rng(0)
+    (root / "images" / "val").mkdir(parents=True)
+    (root / "labels" / "val").mkdir(parents=True)
+    for i in range(num_samples):
+        image = cv2.GaussianBlur(rng.integers(0, 255, size=(375, 500, 3), dtype=np.uint8), (9, 9), 0)
+        cv2.imwrite(str(root / "images" / "val" / f"{i}.jpg"), image)
+        (root / "labels" / "val" / f"{i}.txt").write_text(f"{i % 200} 0.5 0.5 0.3 0.4\n")
+
+
+def read_loose(root, order):
+    for i in order:
+        with open(root / "images" / "val" / f"{i}.jpg", "rb") as f:
+            image = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
+        labels = packed_dataset.read_yolo_labels(root / "labels" / "val" / f"{i}.txt")
+        assert image is not None and len(labels) == 1
+
+
+def read_packed(packed_dir, order):
+    dataset = packed_dataset.PackedDataset(packed_dir / "val")
+    for i in order:
+        image = dataset.image(i)
+        assert image is not None and len(dataset.labels(i)) == 1
+
+
+def main(num_samples=500):
+    root = Path(tempfile.mkdtemp())
+    make_cub_yolo(root / "cub_yolo", num_samples)
+    packed_dataset.pack_cub_yolo(root / "cub_yolo", root / "cub_packed", splits=("val",))
+    order = np.random.default_rng(1).permutation(num_samples)
+
+    for name, reader, path in [("loose files", read_loose, root / "cub_yolo"),
+                               ("packed shards", read_packed, root / "cub_packed")]:
+        with OpenCounter() as opened:
+            t0 = time.perf_counter()
+            reader(path, order)
+            rate = num_samples / (time.perf_counter() - t0)
+        print(f"[*] {name:<14} {opened.count:6d} files opened, {rate:8.0f} samples/s")
+
+    # Raw access without decoding shows the cost of the storage layer alone
+    dataset = packed_dataset.PackedDataset(root / "cub_packed" / "val")
+    t0 = time.perf_counter()
+    for i in order:
+        dataset.raw(i), dataset.labels(i)
+    print(f"[*] packed raw views: {num_samples / (time.perf_counter() - t0):8.0f} samples/s (no decode)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
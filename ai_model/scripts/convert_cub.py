@@ -1,7 +1,13 @@
 import os
+import sys
+import json
 import shutil
+import fcntl
 import cv2
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
 
 # Paths
 CUB_DIR = Path("../data/CUB_200_2011/CUB_200_2011")
@@ -9,6 +15,11 @@ YOLO_DIR = Path("../data/cub_yolo")
 
 IMAGES_DIR = YOLO_DIR / "images"
 LABELS_DIR = YOLO_DIR / "labels"
+# Records what each output was built from so reruns only redo changed or missing files
+MANIFEST_PATH = YOLO_DIR / "manifest.json"
+
+# Linux ioctl for copy-on-write clones (btrfs, XFS with reflink=1)
+FICLONE = 0x40049409
 
 def read_txt_to_dict(filepath, split_char=' '):
     d = {}
@@ -29,72 +40,170 @@ def read_bboxes(filepath):
                 d[int(parts[0])] = [float(x) for x in parts[1:]]
     return d
 
-def main():
+# EXIF orientations that turn the stored image by 90 degrees (ImageOps.exif_transpose swaps its sides)
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def image_size(path):
+    """
+    Return the displayed (width, height) from the image header without decoding the pixels.
+    Like cv2.imread and the training loader, this honours the EXIF orientation.
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if img.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            return width, height
+    except Exception:
+        # Fall back to a full decode for anything PIL can't parse
+        img = cv2.imread(str(path))
+        return (img.shape[1], img.shape[0]) if img is not None else None
+
+def link_or_copy(src, dst):
+    """Place src at dst as a hardlink, else a reflink, else a plain copy. Returns the method used."""
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+        return "link"
+    except OSError:
+        pass
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+def convert_one(job):
+    """Worker: write the YOLO label and place the image for one CUB sample."""
+    img_id, src_img_path, phase, class_idx, (x_min, y_min, w, h) = job
+
+    size = image_size(src_img_path)
+    if size is None:
+        return img_id, None
+    img_w, img_h = size
+
+    # Calculate YOLO normalized bbox
+    x_center = x_min + w / 2.0
+    y_center = y_min + h / 2.0
+
+    x_center_norm = x_center / img_w
+    y_center_norm = y_center / img_h
+    w_norm = w / img_w
+    h_norm = h / img_h
+
+    # Place image
+    dst_img_path = IMAGES_DIR / phase / f"{img_id}.jpg"
+    method = link_or_copy(src_img_path, dst_img_path)
+
+    # Write YOLO label
+    dst_label_path = LABELS_DIR / phase / f"{img_id}.txt"
+    with open(dst_label_path, 'w') as f:
+        f.write(f"{class_idx} {x_center_norm:.6f} {y_center_norm:.6f} {w_norm:.6f} {h_norm:.6f}\n")
+
+    return img_id, method
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def main(workers=None, force=False):
     print("[*] Starting conversion of CUB-200-2011 to YOLO format...")
-    
+
     # Read metadata
     images = read_txt_to_dict(CUB_DIR / "images.txt")
     bboxes = read_bboxes(CUB_DIR / "bounding_boxes.txt")
     splits = read_txt_to_dict(CUB_DIR / "train_test_split.txt")
     labels = read_txt_to_dict(CUB_DIR / "image_class_labels.txt")
     classes = read_txt_to_dict(CUB_DIR / "classes.txt")
-    
+
     # Create directories
     for phase in ["train", "val"]:
         (IMAGES_DIR / phase).mkdir(parents=True, exist_ok=True)
         (LABELS_DIR / phase).mkdir(parents=True, exist_ok=True)
-        
-    # Convert and copy
+
+    manifest = {} if force else load_manifest()
+    new_manifest = {}
+    pending = {}
+    jobs = []
     count_train = 0
     count_val = 0
-    
+
     for img_id, rel_img_path in images.items():
         is_train = int(splits[img_id]) == 1
         phase = "train" if is_train else "val"
-        
+
         # YOLO class index is 0-based
         class_idx = int(labels[img_id]) - 1
-        
-        # Original bbox (x, y, w, h)
-        x_min, y_min, w, h = bboxes[img_id]
-        
-        # Read image to get width and height for normalization
+
         src_img_path = CUB_DIR / "images" / rel_img_path
         if not src_img_path.exists():
             print(f"[!] Warning: Image not found -> {src_img_path}")
             continue
-            
-        img = cv2.imread(str(src_img_path))
-        if img is None:
-            continue
-            
-        img_h, img_w = img.shape[:2]
-        
-        # Calculate YOLO normalized bbox
-        x_center = x_min + w / 2.0
-        y_center = y_min + h / 2.0
-        
-        x_center_norm = x_center / img_w
-        y_center_norm = y_center / img_h
-        w_norm = w / img_w
-        h_norm = h / img_h
-        
-        # Copy image
-        dst_img_path = IMAGES_DIR / phase / f"{img_id}.jpg"
-        shutil.copy2(src_img_path, dst_img_path)
-        
-        # Write YOLO label
-        dst_label_path = LABELS_DIR / phase / f"{img_id}.txt"
-        with open(dst_label_path, 'w') as f:
-            f.write(f"{class_idx} {x_center_norm:.6f} {y_center_norm:.6f} {w_norm:.6f} {h_norm:.6f}\n")
-            
+
+        # Anything that changes the outputs: the source file, the split, the class and the box
+        stat = src_img_path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns, phase, class_idx, bboxes[img_id]]
+        key = str(img_id)
+        previous = manifest.get(key)
+
+        if previous is not None and previous != signature and previous[2] != phase:
+            # The sample moved between splits; drop the outputs in the old split
+            (IMAGES_DIR / previous[2] / f"{img_id}.jpg").unlink(missing_ok=True)
+            (LABELS_DIR / previous[2] / f"{img_id}.txt").unlink(missing_ok=True)
+
+        up_to_date = (
+            previous == signature
+            and (IMAGES_DIR / phase / f"{img_id}.jpg").exists()
+            and (LABELS_DIR / phase / f"{img_id}.txt").exists()
+        )
+        if up_to_date:
+            new_manifest[key] = signature
+        else:
+            jobs.append((img_id, src_img_path, phase, class_idx, bboxes[img_id]))
+            # Only recorded in the manifest once the worker succeeds
+            pending[key] = signature
+
         if is_train:
             count_train += 1
         else:
             count_val += 1
-            
+
+    print(f"[*] {len(jobs)} images to convert, {len(new_manifest)} already up to date.")
+
+    methods = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for img_id, method in pool.map(convert_one, jobs, chunksize=64):
+                if method is None:
+                    print(f"[!] Warning: Unreadable image skipped -> {img_id}")
+                    continue
+                new_manifest[str(img_id)] = pending[str(img_id)]
+                methods[method] = methods.get(method, 0) + 1
+
+    # Samples whose source image is gone (or no longer converts): drop their outputs with the manifest entry
+    removed = 0
+    for key, previous in manifest.items():
+        if key not in new_manifest:
+            (IMAGES_DIR / previous[2] / f"{key}.jpg").unlink(missing_ok=True)
+            (LABELS_DIR / previous[2] / f"{key}.txt").unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        print(f"[*] Removed the outputs of {removed} images that are no longer in the source set.")
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(new_manifest, f)
+
     print(f"[*] Conversion completed. Train images: {count_train}, Val images: {count_val}")
-    
+    if methods:
+        print(f"[*] Images placed by: {methods}")
+
     # Generate cub_dataset.yaml
     yaml_path = YOLO_DIR / "cub_dataset.yaml"
     with open(yaml_path, 'w') as f:
@@ -102,7 +211,7 @@ def main():
         f.write("train: images/train\n")
         f.write("val: images/val\n")
         f.write("test: images/val\n\n")
-        
+
         f.write(f"nc: {len(classes)}\n")
         f.write("names: [\n")
         for cls_id in sorted(classes.keys()):
@@ -110,8 +219,9 @@ def main():
             name = classes[cls_id].split('.', 1)[1].replace('_', ' ')
             f.write(f"  '{name}',\n")
         f.write("]\n")
-        
+
     print(f"[*] Generated YOLO config at {yaml_path}")
 
 if __name__ == "__main__":
-    main()
+    # python convert_cub.py [--force]
+    main(force="--force" in sys.argv)
@@ -1,9 +1,13 @@
 import os
+import sys
 import cv2
 import glob
 import shutil
 import random
+import zlib
 import numpy as np
+from collections import defaultdict
+from multiprocessing import Pool
 from pathlib import Path
 
 # Paths
@@ -11,6 +15,9 @@ RAW_DATA_DIR = Path("../data/raw")
 PROCESSED_DATA_DIR = Path("../data/processed")
 SPLIT_DATA_DIR = Path("../data/splits")
 
+VALID_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+NUM_AUGMENTATIONS = 4  # original, flip, rotate, brightness
+
 def setup_directories():
     """Create necessary directories if they don't exist."""
     print("[*] Setting up directories...")
@@ -56,37 +63,39 @@ def clean_data(input_dir, output_dir):
     
     print(f"[*] Cleaned {count_cleaned} valid images.")
 
+def augment_variant(image, index):
+    """
+    Return one augmentation of the image:
+    0 original, 1 horizontal flip, 2 rotate 15 degrees, 3 brightness +30.
+    """
+    if index == 0:
+        return image
+
+    if index == 1:
+        return cv2.flip(image, 1)
+
+    if index == 2:
+        rows, cols = image.shape[:2]
+        M = cv2.getRotationMatrix2D((cols / 2, rows / 2), 15, 1)
+        return cv2.warpAffine(image, M, (cols, rows))
+
+    if index == 3:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        h, s, v = cv2.split(hsv)
+        v = cv2.add(v, 30)
+        v[v > 255] = 255
+        v[v < 0] = 0
+        final_hsv = cv2.merge((h, s, v))
+        return cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR)
+
+    raise IndexError(f"Augmentation index must be in [0, {NUM_AUGMENTATIONS}), got {index}")
+
 def augment_image(image):
     """
     Apply augmentations: rotate, flip, brightness
     Return a list of augmented images.
     """
-    augmented = []
-    
-    # 1. Original
-    augmented.append(image)
-    
-    # 2. Horizontal Flip
-    flipped = cv2.flip(image, 1)
-    augmented.append(flipped)
-    
-    # 3. Rotate 15 degrees
-    rows, cols = image.shape[:2]
-    M = cv2.getRotationMatrix2D((cols / 2, rows / 2), 15, 1)
-    rotated = cv2.warpAffine(image, M, (cols, rows))
-    augmented.append(rotated)
-    
-    # 4. Brightness adjustment
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    v = cv2.add(v, 30)
-    v[v > 255] = 255
-    v[v < 0] = 0
-    final_hsv = cv2.merge((h, s, v))
-    bright = cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR)
-    augmented.append(bright)
-    
-    return augmented
+    return [augment_variant(image, i) for i in range(NUM_AUGMENTATIONS)]
 
 def augment_dataset(input_dir):
     """
@@ -149,10 +158,129 @@ def split_dataset(input_dir, output_dir, train_ratio=0.8, val_ratio=0.1):
                 
     print(f"[*] Split complete. Outputs saved in {output_dir}")
 
+# --- Streaming pipeline -------------------------------------------------------
+# The stages above each walk the whole dataset and rewrite it. The pipeline below
+# streams every raw file through one worker that decodes it once, validates it,
+# picks its split and writes it straight into the split directory. Augmentations
+# are applied lazily at load time by AugmentedDataset instead of being stored.
+
+def iter_raw_images(input_dir):
+    """Stage 1: yield (path, class name) for every candidate image under input_dir."""
+    for filepath in Path(input_dir).rglob("*"):
+        if filepath.is_file() and filepath.suffix.lower() in VALID_EXTENSIONS:
+            yield filepath, filepath.parent.name
+
+def plan_splits(samples, train_ratio=0.8, val_ratio=0.1, seed=0):
+    """
+    Stage 1b: yield (path, class name, split) with the per-class counts split_dataset
+    gives: int(n * train_ratio) train, int(n * val_ratio) val and the rest test. Within
+    a class the order is a hash of the file name instead of a shuffle, so reruns and
+    added files leave existing images where they were as far as the counts allow.
+    Only paths are held in memory; images are read later by the workers.
+    """
+    by_class = defaultdict(list)
+    for filepath, class_name in samples:
+        by_class[class_name].append(filepath)
+
+    for class_name, paths in by_class.items():
+        paths.sort(key=lambda p: (zlib.crc32(f"{seed}:{class_name}/{p.name}".encode()), p.name))
+        train_end = int(len(paths) * train_ratio)
+        val_end = train_end + int(len(paths) * val_ratio)
+        for i, filepath in enumerate(paths):
+            split = "train" if i < train_end else "val" if i < val_end else "test"
+            yield filepath, class_name, split
+
+def place_file(src, dst, content):
+    """Hardlink the raw file into place when possible, else write the bytes already in memory."""
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+        return 0
+    except OSError:
+        with open(dst, "wb") as f:
+            f.write(content)
+        return len(content)
+
+def process_image(job):
+    """Stage 2 (worker): decode once to validate, then route to its split. Returns (status, split, bytes written)."""
+    filepath, class_name, split, output_dir = job
+    content = filepath.read_bytes()
+    img = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return "corrupt", str(filepath), 0
+
+    class_dir = Path(output_dir) / split / class_name
+    class_dir.mkdir(parents=True, exist_ok=True)
+    written = place_file(filepath, class_dir / filepath.name, content)
+    return "ok", (split, class_name), written
+
+def run_pipeline(input_dir, output_dir, train_ratio=0.8, val_ratio=0.1, seed=0, workers=None):
+    """Clean and split the raw dataset in one streaming pass over a process pool."""
+    print(f"[*] Streaming {input_dir} -> {output_dir} (clean + split in one pass)...")
+    jobs = (
+        (filepath, class_name, split, output_dir)
+        for filepath, class_name, split in plan_splits(iter_raw_images(input_dir), train_ratio, val_ratio, seed)
+    )
+
+    counts = {"train": 0, "val": 0, "test": 0}
+    for split in counts:
+        (Path(output_dir) / split).mkdir(parents=True, exist_ok=True)
+    val_counts = defaultdict(int)
+    bytes_written = 0
+    # imap_unordered hands jobs out a chunk at a time instead of queueing the whole dataset up front
+    with Pool(processes=workers) as pool:
+        for status, detail, written in pool.imap_unordered(process_image, jobs, chunksize=32):
+            if status == "corrupt":
+                print(f"[!] Warning: Corrupt image ignored -> {detail}")
+                continue
+            split, class_name = detail
+            counts[split] += 1
+            val_counts[class_name] += split == "val"
+            bytes_written += written
+
+    # Classes under 1 / val_ratio images get no val image at all, as with split_dataset
+    no_val = sorted(name for name, count in val_counts.items() if count == 0)
+    if val_ratio > 0 and no_val:
+        print(f"[!] Warning: {len(no_val)} classes have no val images: {', '.join(no_val[:10])}"
+              f"{' ...' if len(no_val) > 10 else ''}")
+    print(f"[*] Split complete: {counts}, {bytes_written / 1e6:.1f} MB written.")
+    return counts, bytes_written
+
+class AugmentedDataset:
+    """
+    Random-access view over a split directory that yields every image in all
+    NUM_AUGMENTATIONS variants, computed on demand instead of stored on disk.
+    Index i is image i // NUM_AUGMENTATIONS with augment_variant i % NUM_AUGMENTATIONS.
+    """
+
+    def __init__(self, split_dir, augment=True):
+        self.augment = augment
+        self.samples = sorted(
+            (filepath, filepath.parent.name) for filepath, _ in iter_raw_images(split_dir)
+        )
+        self.classes = sorted({class_name for _, class_name in self.samples})
+        self.class_to_idx = {name: i for i, name in enumerate(self.classes)}
+
+    def __len__(self):
+        return len(self.samples) * (NUM_AUGMENTATIONS if self.augment else 1)
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        variants = NUM_AUGMENTATIONS if self.augment else 1
+        filepath, class_name = self.samples[index // variants]
+        image = cv2.imread(str(filepath))
+        return augment_variant(image, index % variants), self.class_to_idx[class_name]
+
 if __name__ == "__main__":
     setup_directories()
     collect_data()
-    clean_data(RAW_DATA_DIR, PROCESSED_DATA_DIR)
-    augment_dataset(PROCESSED_DATA_DIR)
-    split_dataset(PROCESSED_DATA_DIR, SPLIT_DATA_DIR)
+    if "--legacy" in sys.argv:
+        # Original three-pass pipeline that writes augmentations to disk
+        clean_data(RAW_DATA_DIR, PROCESSED_DATA_DIR)
+        augment_dataset(PROCESSED_DATA_DIR)
+        split_dataset(PROCESSED_DATA_DIR, SPLIT_DATA_DIR)
+    else:
+        run_pipeline(RAW_DATA_DIR, SPLIT_DATA_DIR)
     print("[*] Data Pipeline Completed.")
@@ -1,7 +1,10 @@
 import os
+import sys
 from ultralytics import YOLO
 
-def evaluate_model():
+DATA_YAML = "../data/cub_yolo/cub_dataset.yaml"
+
+def evaluate_model(packed=False):
     print("[*] Loading best trained model...")
     weights_path = "../weights/birdbase_v1/weights/best.pt"
     
@@ -13,7 +16,12 @@ def evaluate_model():
 
     # Evaluate the model on the validation set
     print("[*] Running evaluation...")
-    metrics = model.val() # Evaluates using the parameters in dataset.yaml
+    if packed:
+        # Read the val split from the memory-mapped shards written by packed_dataset.py
+        from packed_dataset import PackedDetectionValidator
+        metrics = model.val(data="../data/cub_packed/packed_dataset.yaml", validator=PackedDetectionValidator)
+    else:
+        metrics = model.val() # Evaluates using the parameters in dataset.yaml
 
     print(f"[*] mAP50-95: {metrics.box.map}")        # map50-95
     print(f"[*] mAP50: {metrics.box.map50}")         # map50
@@ -22,5 +30,45 @@ def evaluate_model():
     print(f"[*] Recall: {metrics.box.mr}")           # Recall
     print("[*] Evaluation Completed.")
 
+def compare_quantized(onnx_path="../weights/birdbase_v1/weights/best.onnx", data=DATA_YAML):
+    """Report accuracy and latency of the FP32 ONNX export against its INT8 copy from export.py."""
+    int8_path = onnx_path.replace(".onnx", ".int8.onnx")
+    rows = []
+    for label, path in [("FP32", onnx_path), ("INT8", int8_path)]:
+        if not os.path.exists(path):
+            print(f"[!] Error: {label} model not found at {path}")
+            return
+        print(f"[*] Evaluating {label} model {path}...")
+        # Square 640 inputs like the backend's letterbox; export.py pins the ONNX height and width
+        metrics = YOLO(path, task="detect").val(data=data, imgsz=640, batch=1, rect=False, device="cpu", verbose=False)
+        rows.append((label, metrics.box.map50, metrics.box.map, metrics.speed["inference"]))
+
+    print(f"\n{'Model':<6} {'mAP50':>8} {'mAP50-95':>9} {'Inference ms/img':>17}")
+    for label, map50, map5095, latency in rows:
+        print(f"{label:<6} {map50:8.4f} {map5095:9.4f} {latency:17.2f}")
+    (_, fp_map50, _, fp_ms), (_, q_map50, _, q_ms) = rows
+    print(f"[*] INT8 speedup: {fp_ms / q_ms:.2f}x, mAP50 change: {q_map50 - fp_map50:+.4f}")
+
+def evaluate_deployed(onnx_path="../weights/birdbase_v1/weights/best.onnx", packed=False):
+    """Evaluate the ONNX export, and its INT8 copy if present, through the backend's inference code."""
+    from evaluate_onnx import LooseSplit, evaluate_onnx, load_class_names, print_report
+    from packed_dataset import PACKED_DIR, YOLO_DIR, PackedDataset
+
+    if packed:
+        dataset, class_names = PackedDataset(PACKED_DIR / "val"), load_class_names(PACKED_DIR / "packed_dataset.yaml")
+    else:
+        dataset, class_names = LooseSplit(YOLO_DIR), load_class_names(YOLO_DIR / "cub_dataset.yaml")
+    paths = [p for p in (onnx_path, onnx_path.replace(".onnx", ".int8.onnx")) if os.path.exists(p)]
+    if not paths:
+        print(f"[!] Error: ONNX model not found at {onnx_path}")
+        return
+    print_report([evaluate_onnx(path, dataset, class_names) for path in paths])
+
 if __name__ == "__main__":
-    evaluate_model()
+    # python evaluate.py [--compare-int8 | --onnx] [--packed]
+    if "--compare-int8" in sys.argv:
+        compare_quantized()
+    elif "--onnx" in sys.argv:
+        evaluate_deployed(packed="--packed" in sys.argv)
+    else:
+        evaluate_model(packed="--packed" in sys.argv)
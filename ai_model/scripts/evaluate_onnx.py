@@ -0,0 +1,289 @@
+"""
+Evaluate the deployed ONNX detector (or a quantized variant) on the CUB val split.
+
+The model runs through the backend's YOLOv8ONNX, so letterboxing, decoding and NMS are
+exactly what the API serves. A thread pool decodes and letterboxes images a few batches
+ahead of the session, and all metrics are computed with vectorized NumPy:
+    mAP50 / mAP50-95   ultralytics-style IoU matching and 101-point interpolated AP
+    per-class AP       AP50 and AP50-95 for every species present in the split
+    top-1 accuracy     share of images whose most confident detection names the right species
+    images/s           end to end, plus the time spent in each stage
+Usage: python evaluate_onnx.py [model.onnx ...] [--packed] [--batch N] [--workers N] [--limit N] [--out results.json]
+"""
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+from core.inference import YOLOv8ONNX  # noqa: E402
+from core.model_loader import load_session_config  # noqa: E402
+
+from packed_dataset import PACKED_DIR, YOLO_DIR, PackedDataset, read_yolo_labels  # noqa: E402
+
+ONNX_PATH = "../weights/birdbase_v1/weights/best.onnx"
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+# Low threshold and generous max_det, as for ultralytics val, so the PR curve is complete
+CONF_THRESHOLD = 0.001
+NMS_IOU = 0.7
+MAX_DET = 300
+
+trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+class LooseSplit:
+    """One split of the cub_yolo images/labels layout, with the same accessors as PackedDataset."""
+
+    def __init__(self, yolo_dir, split="val"):
+        image_dir = Path(yolo_dir) / "images" / split
+        self.paths = sorted(image_dir.glob("*.jpg"), key=lambda p: (len(p.stem), p.stem))
+        self.label_dir = Path(yolo_dir) / "labels" / split
+
+    def __len__(self):
+        return len(self.paths)
+
+    def image(self, i) -> np.ndarray:
+        return cv2.imread(str(self.paths[i]), cv2.IMREAD_COLOR)
+
+    def labels(self, i) -> np.ndarray:
+        return read_yolo_labels(self.label_dir / f"{self.paths[i].stem}.txt")
+
+
+def load_class_names(yaml_path) -> list:
+    with open(yaml_path) as f:
+        names = yaml.safe_load(f).get("names", [])
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    return list(names)
+
+
+def to_xyxy(labels, height, width) -> np.ndarray:
+    """Normalized YOLO (class, xc, yc, w, h) rows -> [n, 4] pixel x1y1x2y2 boxes."""
+    xc, yc = labels[:, 1] * width, labels[:, 2] * height
+    half_w, half_h = labels[:, 3] * width / 2, labels[:, 4] * height / 2
+    return np.stack([xc - half_w, yc - half_h, xc + half_w, yc + half_h], axis=1).astype(np.float32)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of [n, 4] and [m, 4] x1y1x2y2 boxes, as an [n, m] matrix."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_classes, gt_boxes, gt_classes, thresholds=IOU_THRESHOLDS) -> np.ndarray:
+    """
+    [n_pred, n_thresholds] bool matrix: is each prediction a true positive at each IoU threshold.
+    Same-class pairs are matched one-to-one in order of decreasing IoU, as ultralytics val does,
+    so the numbers are comparable with evaluate.py.
+    """
+    correct = np.zeros((len(pred_boxes), len(thresholds)), dtype=bool)
+    if not len(pred_boxes) or not len(gt_boxes):
+        return correct
+    iou = box_iou(gt_boxes, pred_boxes) * (gt_classes[:, None] == pred_classes[None, :])
+    for t, threshold in enumerate(thresholds):
+        gt_idx, pred_idx = np.nonzero(iou >= threshold)
+        if not len(gt_idx):
+            continue
+        order = iou[gt_idx, pred_idx].argsort()[::-1]
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        # np.unique returns first occurrences, i.e. the best remaining pair for each prediction, then each box
+        first = np.sort(np.unique(pred_idx, return_index=True)[1])
+        gt_idx, pred_idx = gt_idx[first], pred_idx[first]
+        first = np.unique(gt_idx, return_index=True)[1]
+        correct[pred_idx[first], t] = True
+    return correct
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """Area under the precision envelope, sampled at 101 recall points (COCO style, as ultralytics computes it)."""
+    # Precision drops to 0 right after the highest recall reached
+    recall = np.concatenate(([0.0], recall, [recall[-1] if len(recall) else 1.0], [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0], [0.0]))
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    x = np.linspace(0, 1, 101)
+    return float(trapezoid(np.interp(x, recall, precision), x))
+
+
+def ap_per_class(correct, confidences, pred_classes, gt_classes, num_classes):
+    """
+    AP at every IoU threshold for each class, as a [num_classes, n_thresholds] array, plus the
+    ground-truth count per class. Classes without ground truth keep AP 0 and are left out of the mean.
+    """
+    gt_counts = np.bincount(gt_classes, minlength=num_classes)
+    ap = np.zeros((num_classes, correct.shape[1]))
+
+    # One stable sort groups predictions by class while keeping them in descending confidence
+    order = np.argsort(-confidences, kind="stable")
+    order = order[np.argsort(pred_classes[order], kind="stable")]
+    bounds = np.searchsorted(pred_classes[order], np.arange(num_classes + 1))
+
+    for c in np.nonzero(gt_counts)[0]:
+        tp = correct[order[bounds[c]:bounds[c + 1]]]
+        if not len(tp):
+            continue
+        tp_cum = tp.cumsum(axis=0)
+        fp_cum = (~tp).cumsum(axis=0)
+        recall = tp_cum / gt_counts[c]
+        precision = tp_cum / (tp_cum + fp_cum)
+        for t in range(tp.shape[1]):
+            ap[c, t] = average_precision(recall[:, t], precision[:, t])
+    return ap, gt_counts
+
+
+def load_batch(dataset, indices, preprocessor):
+    """Decode and letterbox one batch on a loader thread; returns (tensor, letterboxes, targets)."""
+    tensor = np.empty((len(indices), 3, preprocessor.input_size, preprocessor.input_size), dtype=np.float32)
+    letterboxes, targets = [], []
+    for i, out in zip(indices, tensor):
+        image = dataset.image(i)
+        if image is None:
+            raise FileNotFoundError(f"Unreadable image at index {i}")
+        labels = np.asarray(dataset.labels(i))
+        letterboxes.append(preprocessor.letterbox_into(image, out))
+        targets.append((to_xyxy(labels, *image.shape[:2]), labels[:, 0].astype(np.int64)))
+    return tensor, letterboxes, targets
+
+
+def iterate_batches(dataset, preprocessor, batch_size, workers, limit=None):
+    """Yield loaded batches in order while up to 2 * `workers` later batches load in the background."""
+    count = min(len(dataset), limit or len(dataset))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start in range(0, count, batch_size):
+            indices = range(start, min(start + batch_size, count))
+            pending.append(pool.submit(load_batch, dataset, indices, preprocessor))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def evaluate_onnx(onnx_path, dataset, class_names, batch_size=16, workers=4, limit=None):
+    """Run one ONNX model over `dataset` and return a dict of accuracy and speed metrics."""
+    session_config = dict(load_session_config(), optimized_model_dir="../weights/.ort_cache")
+    detector = YOLOv8ONNX(str(onnx_path), class_names, session_config=session_config)
+    if detector.session is None:
+        raise FileNotFoundError(f"Could not load ONNX model {onnx_path}")
+
+    correct, confidences, pred_classes, gt_classes = [], [], [], []
+    top1_hits, top1_total = 0, 0
+    stages = {"load_wait": 0.0, "inference": 0.0, "postprocess": 0.0}
+    images = 0
+
+    started = time.perf_counter()
+    batches = iterate_batches(dataset, detector.preprocessor, batch_size, workers, limit)
+    while True:
+        wait_started = time.perf_counter()
+        batch = next(batches, None)
+        stages["load_wait"] += time.perf_counter() - wait_started
+        if batch is None:
+            break
+        tensor, letterboxes, targets = batch
+
+        stage_started = time.perf_counter()
+        outputs = detector.run(tensor)
+        stages["inference"] += time.perf_counter() - stage_started
+
+        stage_started = time.perf_counter()
+        for output, letterbox, (gt_boxes, gt_ids) in zip(outputs, letterboxes, targets):
+            boxes, confs, ids, _ = detector.decode(output, letterbox, CONF_THRESHOLD, NMS_IOU, MAX_DET)
+            correct.append(match_predictions(boxes, ids, gt_boxes, gt_ids))
+            confidences.append(confs)
+            pred_classes.append(ids)
+            gt_classes.append(gt_ids)
+            if len(gt_ids):
+                # CUB has one bird per image; score the largest box if there are more
+                areas = (gt_boxes[:, 2] - gt_boxes[:, 0]) * (gt_boxes[:, 3] - gt_boxes[:, 1])
+                top1_total += 1
+                top1_hits += bool(len(ids)) and ids[confs.argmax()] == gt_ids[areas.argmax()]
+        stages["postprocess"] += time.perf_counter() - stage_started
+        images += len(letterboxes)
+    elapsed = time.perf_counter() - started
+
+    correct = np.concatenate(correct) if correct else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    confidences = np.concatenate(confidences) if confidences else np.zeros(0)
+    pred_classes = np.concatenate(pred_classes).astype(np.int64) if pred_classes else np.zeros(0, dtype=np.int64)
+    gt_classes = np.concatenate(gt_classes) if gt_classes else np.zeros(0, dtype=np.int64)
+    num_classes = max(len(class_names), int(gt_classes.max(initial=-1)) + 1, int(pred_classes.max(initial=-1)) + 1)
+    ap, gt_counts = ap_per_class(correct, confidences, pred_classes, gt_classes, num_classes)
+
+    present = gt_counts > 0
+    per_class = {
+        (class_names[c] if c < len(class_names) else str(c)): {
+            "ap50": round(float(ap[c, 0]), 4), "ap50_95": round(float(ap[c].mean()), 4), "instances": int(gt_counts[c]),
+        }
+        for c in np.nonzero(present)[0]
+    }
+    return {
+        "model": str(onnx_path),
+        "images": images,
+        "map50": float(ap[present, 0].mean()) if present.any() else 0.0,
+        "map50_95": float(ap[present].mean()) if present.any() else 0.0,
+        "top1": top1_hits / top1_total if top1_total else 0.0,
+        "images_per_s": images / elapsed if elapsed else 0.0,
+        "stage_seconds": {k: round(v, 3) for k, v in stages.items()},
+        "per_class": per_class,
+    }
+
+
+def print_report(results, worst=10):
+    for result in results:
+        print(f"\n[*] {result['model']} ({result['images']} images)")
+        print(f"    mAP50 {result['map50']:.4f} | mAP50-95 {result['map50_95']:.4f} | top-1 {result['top1']:.2%} "
+              f"| {result['images_per_s']:.1f} img/s")
+        print("    seconds in " + ", ".join(f"{k} {v:.2f}" for k, v in result["stage_seconds"].items()))
+        weakest = sorted(result["per_class"].items(), key=lambda item: item[1]["ap50"])[:worst]
+        if weakest:
+            print(f"    lowest AP50: " + ", ".join(f"{name} {row['ap50']:.3f}" for name, row in weakest))
+
+    if len(results) > 1:
+        print(f"\n{'Model':<48} {'mAP50':>8} {'mAP50-95':>9} {'top-1':>7} {'img/s':>8}")
+        for result in results:
+            print(f"{Path(result['model']).name:<48} {result['map50']:8.4f} {result['map50_95']:9.4f} "
+                  f"{result['top1']:7.2%} {result['images_per_s']:8.1f}")
+
+
+def option(args, name, default):
+    return type(default)(args[args.index(name) + 1]) if name in args else default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    packed = "--packed" in args
+    batch_size = option(args, "--batch", 16)
+    workers = option(args, "--workers", min(8, os.cpu_count() or 1))
+    limit = option(args, "--limit", 0) or None
+    out = option(args, "--out", "")
+    values = {args[args.index(flag) + 1] for flag in ("--batch", "--workers", "--limit", "--out") if flag in args}
+    models = [a for a in args if not a.startswith("--") and a not in values] or [ONNX_PATH]
+
+    if packed:
+        dataset, yaml_path = PackedDataset(PACKED_DIR / "val"), PACKED_DIR / "packed_dataset.yaml"
+    else:
+        dataset, yaml_path = LooseSplit(YOLO_DIR), YOLO_DIR / "cub_dataset.yaml"
+    if not len(dataset):
+        print(f"[!] Error: No validation images found for {yaml_path}")
+        sys.exit(1)
+    class_names = load_class_names(yaml_path)
+
+    results = []
+    for model in models:
+        print(f"[*] Evaluating {model} on {min(len(dataset), limit or len(dataset))} images...")
+        results.append(evaluate_onnx(model, dataset, class_names, batch_size, workers, limit))
+    print_report(results)
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[*] Results written to {out}")
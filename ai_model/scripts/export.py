@@ -1,7 +1,204 @@
+import json
 import os
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
 from ultralytics import YOLO
 
-def export_model():
+# CUB images used to calibrate static INT8 quantization
+CALIBRATION_DIR = Path("../data/cub_yolo/images/train")
+CALIBRATION_SAMPLES = 200
+
+# Input sizes of the model ladder; the backend picks one per request from ladder.json (BIRDBASE_MODEL_LADDER).
+# 640 is always exported as the main model (best.onnx); the others are written as best.<size>.onnx.
+LADDER_SIZES = (320, 480, 640)
+# Batch sizes whose CPU latency is measured for the manifest
+LATENCY_BATCH_SIZES = (1, 8)
+
+
+def letterbox(image, size=640):
+    """Same letterbox the backend applies before inference (BGR uint8 -> RGB float32 NCHW)."""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = min(size, int(round(w * scale))), min(size, int(round(h * scale)))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = cv2.resize(image, (new_w, new_h))
+    return canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+
+
+def calibration_reader(onnx_path, image_dir=CALIBRATION_DIR, samples=CALIBRATION_SAMPLES, size=640):
+    """Build a CalibrationDataReader over a random sample of CUB images."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    paths = sorted(Path(image_dir).glob("*.jpg"))
+    random.Random(0).shuffle(paths)
+    paths = paths[:samples]
+
+    class CUBCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return {input_name: letterbox(image, size)}
+            return None
+
+    return CUBCalibrationReader(), len(paths)
+
+
+def head_decode_nodes(onnx_path) -> list:
+    """
+    Nodes of the Detect head after its conv branches: the DFL box decode, the class sigmoid and
+    the Concat that joins pixel boxes with 0-1 scores into output0. Quantized, that output shares
+    one uint8 scale sized for the boxes, which rounds every class score to 0.
+    """
+    import onnx
+
+    graph = onnx.load(str(onnx_path), load_external_data=False).graph
+    output = graph.output[0].name
+    producer = next((node for node in graph.node if output in node.output), None)
+    if producer is None or "/" not in producer.name:
+        return []
+    head = producer.name.rsplit("/", 1)[0] + "/"
+    branches = (head + "cv2", head + "cv3")
+    return [node.name for node in graph.node if node.name.startswith(head) and not node.name.startswith(branches)]
+
+
+def quantize_model(onnx_path, mode="static", size=640):
+    """
+    Write an INT8 copy of an exported ONNX model next to it as <name>.int8.onnx.
+    'dynamic' quantizes weights only; 'static' also quantizes activations using
+    ranges calibrated on CUB images, which is what speeds up the Conv-heavy backbone.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    onnx_path = Path(onnx_path)
+    prepared_path = onnx_path.with_suffix(".prep.onnx")
+    int8_path = onnx_path.with_suffix(".int8.onnx")
+    # Symbolic shape inference can't follow a dynamic batch axis through an unsimplified export;
+    # ONNX shape inference alone is enough for this Conv/Concat graph
+    batch_dim = onnx.load(str(onnx_path), load_external_data=False).graph.input[0].type.tensor_type.shape.dim[0]
+    quant_pre_process(str(onnx_path), str(prepared_path), skip_symbolic_shape=bool(batch_dim.dim_param))
+
+    if mode == "dynamic":
+        quantize_dynamic(str(prepared_path), str(int8_path), weight_type=QuantType.QUInt8)
+    else:
+        reader, count = calibration_reader(prepared_path, size=size)
+        if count == 0:
+            raise FileNotFoundError(f"No calibration images found in {CALIBRATION_DIR}")
+        print(f"[*] Calibrating on {count} CUB images...")
+        quantize_static(
+            str(prepared_path), str(int8_path), reader,
+            quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+            per_channel=True, nodes_to_exclude=head_decode_nodes(prepared_path),
+        )
+
+    prepared_path.unlink(missing_ok=True)
+    return str(int8_path)
+
+def pin_input_size(onnx_path, size):
+    """
+    Fix the height and width of a dynamic-axes export to `size`, leaving only the batch axis dynamic,
+    so the backend reads the model's input size from it and ONNX Runtime can plan for one shape.
+    """
+    import onnx
+
+    model = onnx.load(str(onnx_path))
+    for dim in model.graph.input[0].type.tensor_type.shape.dim[2:]:
+        dim.Clear()
+        dim.dim_value = size
+    onnx.save(model, str(onnx_path))
+
+
+def export_onnx(model, size, rung=False):
+    """Export to ONNX at `size` with a dynamic batch axis; a rung is renamed to <name>.<size>.onnx."""
+    onnx_path = Path(model.export(format="onnx", imgsz=size, dynamic=True, simplify=True))
+    if rung:
+        onnx_path = onnx_path.replace(onnx_path.with_name(f"{onnx_path.stem}.{size}.onnx"))
+    pin_input_size(onnx_path, size)
+    return str(onnx_path)
+
+
+def measure_latency(onnx_path, batch_sizes=LATENCY_BATCH_SIZES, rounds=20):
+    """Median CPU milliseconds per batch for each batch size, through the backend's session settings."""
+    import evaluate_onnx  # noqa: F401  (puts the backend on sys.path)
+    from core.inference import YOLOv8ONNX
+    from core.model_loader import load_session_config
+
+    session_config = dict(load_session_config(), optimized_model_dir="../weights/.ort_cache")
+    detector = YOLOv8ONNX(str(onnx_path), [], session_config=session_config)
+    if detector.session is None:
+        raise FileNotFoundError(f"Could not load ONNX model {onnx_path}")
+    size = detector.input_size
+    latency = {}
+    for batch_size in batch_sizes:
+        tensor = np.random.default_rng(0).random((batch_size, 3, size, size), dtype=np.float32)
+        for _ in range(3):
+            detector.run(tensor)
+        times = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            detector.run(tensor)
+            times.append(time.perf_counter() - started)
+        latency[str(batch_size)] = round(float(np.median(times)) * 1000, 2)
+    return latency
+
+
+def write_ladder_manifest(rungs, val_limit=None):
+    """
+    Measure each exported rung ({size: (onnx_path, int8_path or None)}) and write ladder.json next to them:
+    CPU latency per batch size for the FP32 and INT8 models, and mAP / top-1 on the CUB val split
+    (left empty when the split isn't on disk).
+    """
+    from evaluate_onnx import LooseSplit, evaluate_onnx, load_class_names
+    from packed_dataset import YOLO_DIR
+
+    dataset = LooseSplit(YOLO_DIR)
+    class_names = load_class_names(YOLO_DIR / "cub_dataset.yaml") if len(dataset) else []
+    if not len(dataset):
+        print(f"[!] No validation images in {YOLO_DIR}; the manifest will have latency only.")
+
+    entries = []
+    for size, (onnx_path, int8_path) in sorted(rungs.items()):
+        print(f"[*] Measuring the {size} px rung...")
+        entry = {"size": size, "path": Path(onnx_path).name, "latency_ms": measure_latency(onnx_path)}
+        if int8_path:
+            entry["int8_path"] = Path(int8_path).name
+            entry["int8_latency_ms"] = measure_latency(int8_path)
+        entry.update(map50=None, map50_95=None, top1=None)
+        if len(dataset):
+            result = evaluate_onnx(onnx_path, dataset, class_names, limit=val_limit)
+            entry.update({k: round(result[k], 4) for k in ("map50", "map50_95", "top1")})
+        print(f"    {size:4d} px | " + " | ".join(f"batch {b} {ms:.1f} ms" for b, ms in entry["latency_ms"].items())
+              + (f" | mAP50-95 {entry['map50_95']:.4f} | top-1 {entry['top1']:.2%}" if len(dataset) else ""))
+        entries.append(entry)
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "cpu": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "val_images": min(len(dataset), val_limit or len(dataset)),
+        "rungs": entries,
+    }
+    manifest_path = Path(next(iter(rungs.values()))[0]).with_name("ladder.json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return str(manifest_path)
+
+
+def export_model(quantize_mode="static", ladder_sizes=LADDER_SIZES, val_limit=None):
     print("[*] Initializing Export Process...")
     weights_path = "../weights/birdbase_v1/weights/best.pt"
     
@@ -13,11 +210,37 @@ def export_model():
     print(f"[*] Loading model from {weights_path}")
     model = YOLO(weights_path)
 
-    # 1. Export to ONNX (for Backend deployment)
+    # 1. Export to ONNX (for Backend deployment), with a dynamic batch axis for batched inference.
+    # Smaller ladder rungs first: every export writes <name>.onnx, which the main 640 model keeps last.
     print("\n[*] Exporting to ONNX format...")
-    onnx_path = model.export(format="onnx", imgsz=640, optimize=True)
+    rungs = {}
+    for size in sorted(set(ladder_sizes) - {640}):
+        rungs[size] = export_onnx(model, size, rung=True)
+        print(f"[*] {size} px ONNX model saved at: {rungs[size]}")
+    onnx_path = rungs[640] = export_onnx(model, 640)
     print(f"[*] ONNX model saved at: {onnx_path}")
 
+    # 1b. INT8 quantized ONNX (served by the backend with BIRDBASE_QUANTIZED=1)
+    int8_paths = {}
+    if quantize_mode != "none":
+        print(f"\n[*] Quantizing ONNX models to INT8 ({quantize_mode})...")
+        for size, path in sorted(rungs.items()):
+            try:
+                int8_paths[size] = quantize_model(path, mode=quantize_mode, size=size)
+                print(f"[*] INT8 ONNX model saved at: {int8_paths[size]}")
+            except Exception as e:
+                print(f"[!] Failed to quantize {path}: {e}")
+
+    # 1c. Model ladder manifest: measured CPU latency and val accuracy of every rung
+    print("\n[*] Measuring the model ladder...")
+    try:
+        manifest_path = write_ladder_manifest(
+            {size: (path, int8_paths.get(size)) for size, path in rungs.items()}, val_limit,
+        )
+        print(f"[*] Model ladder manifest saved at: {manifest_path}")
+    except Exception as e:
+        print(f"[!] Failed to measure the model ladder: {e}")
+
     # 2. Export to TFLite (for Android offline deployment)
     # This might require TensorFlow installed in the environment (pip install tensorflow)
     print("\n[*] Exporting to TensorFlow Lite (TFLite) format...")
@@ -39,4 +262,15 @@ def export_model():
     print("\n[*] Export pipeline finished.")
 
 if __name__ == "__main__":
-    export_model()
+    # python export.py [static|dynamic|none] [--sizes 320,480,640] [--val-limit N]
+    args = sys.argv[1:]
+    sizes, val_limit = LADDER_SIZES, None
+    if "--sizes" in args:
+        i = args.index("--sizes")
+        sizes = tuple(int(n) for n in args[i + 1].split(",") if n)
+        del args[i:i + 2]
+    if "--val-limit" in args:
+        i = args.index("--val-limit")
+        val_limit = int(args[i + 1]) or None
+        del args[i:i + 2]
+    export_model(args[0] if args else "static", sizes, val_limit)
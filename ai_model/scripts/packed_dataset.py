@@ -0,0 +1,272 @@
+"""
+Packed, memory-mapped dataset format for the CUB YOLO data.
+
+Instead of one JPEG and one label .txt per sample, each split is stored as:
+    <root>/<split>/shard-00000.bin ...   concatenated, still-encoded image bytes
+    <root>/<split>/index.npy             per-sample shard, offset, length, size and box range
+    <root>/<split>/boxes.npy             float32 [num_boxes, 5] rows of (class, xc, yc, w, h), normalized
+    <root>/packed_dataset.yaml           ultralytics data config pointing at the splits
+
+A split is read through a handful of memory-mapped files, so random access costs no
+open() calls and the encoded bytes are handed to the decoder as zero-copy views.
+"""
+import json
+import sys
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics.data import base as ultralytics_base
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer, DetectionValidator
+from ultralytics.utils import colorstr
+
+from convert_cub import image_size
+
+YOLO_DIR = Path("../data/cub_yolo")
+PACKED_DIR = Path("../data/cub_packed")
+SHARD_BYTES = 256 * 1024 * 1024
+
+INDEX_DTYPE = np.dtype([
+    ("shard", "<u2"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("box_start", "<u4"),
+    ("box_count", "<u2"),
+])
+
+
+def read_yolo_labels(label_path):
+    """Read a YOLO label file into a float32 [n, 5] array (empty if the file is missing)."""
+    try:
+        rows = [line.split() for line in open(label_path, "r") if line.strip()]
+    except FileNotFoundError:
+        rows = []
+    return np.array([[float(v) for v in row[:5]] for row in rows], dtype=np.float32).reshape(-1, 5)
+
+
+def pack_split(image_dir, label_dir, out_dir, shard_bytes=SHARD_BYTES):
+    """Pack one split of the cub_yolo layout into shards plus index.npy/boxes.npy."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    image_paths = sorted(Path(image_dir).glob("*.jpg"), key=lambda p: (len(p.stem), p.stem))
+
+    index = np.zeros(len(image_paths), dtype=INDEX_DTYPE)
+    boxes, box_count = [], 0
+    shard_id, shard_size, shard = 0, 0, None
+
+    for i, image_path in enumerate(image_paths):
+        size = image_size(image_path)
+        if size is None:
+            print(f"[!] Warning: Unreadable image skipped -> {image_path}")
+            continue
+        content = image_path.read_bytes()
+
+        if shard is None or (shard_size > 0 and shard_size + len(content) > shard_bytes):
+            if shard is not None:
+                shard.close()
+                shard_id += 1
+            shard = open(out_dir / f"shard-{shard_id:05d}.bin", "wb")
+            shard_size = 0
+
+        labels = read_yolo_labels(Path(label_dir) / f"{image_path.stem}.txt")
+        index[i] = (shard_id, shard_size, len(content), size[1], size[0], box_count, len(labels))
+        shard.write(content)
+        shard_size += len(content)
+        boxes.append(labels)
+        box_count += len(labels)
+
+    if shard is not None:
+        shard.close()
+    index = index[index["length"] > 0]
+    np.save(out_dir / "index.npy", index)
+    np.save(out_dir / "boxes.npy", np.concatenate(boxes) if boxes else np.zeros((0, 5), dtype=np.float32))
+    return len(index), shard_id + 1 if len(index) else 0
+
+
+def pack_cub_yolo(yolo_dir=YOLO_DIR, packed_dir=PACKED_DIR, splits=("train", "val")):
+    """Convert the cub_yolo images/labels layout produced by convert_cub.py into packed shards."""
+    yolo_dir, packed_dir = Path(yolo_dir), Path(packed_dir)
+    for split in splits:
+        count, shards = pack_split(yolo_dir / "images" / split, yolo_dir / "labels" / split, packed_dir / split)
+        print(f"[*] Packed {split}: {count} samples into {shards} shard(s)")
+
+    # Reuse the class names from the original dataset config
+    names = []
+    source_yaml = yolo_dir / "cub_dataset.yaml"
+    if source_yaml.exists():
+        names = [line.strip().strip(",").strip("'") for line in open(source_yaml) if line.startswith("  '")]
+
+    yaml_path = packed_dir / "packed_dataset.yaml"
+    with open(yaml_path, "w") as f:
+        f.write(f"path: {packed_dir.resolve()}\n")
+        f.write("train: train\n")
+        f.write("val: val\n")
+        f.write("test: val\n\n")
+        f.write(f"nc: {len(names)}\n")
+        f.write(f"names: {json.dumps(names)}\n")
+    print(f"[*] Generated packed dataset config at {yaml_path}")
+    return yaml_path
+
+
+def is_packed(path) -> bool:
+    return isinstance(path, (str, Path)) and (Path(path) / "index.npy").exists()
+
+
+class PackedDataset:
+    """Random-access reader over one packed split; every accessor returns views into memory maps."""
+
+    def __init__(self, split_dir):
+        self.split_dir = Path(split_dir)
+        self._open()
+
+    def _open(self):
+        self.index = np.load(self.split_dir / "index.npy", mmap_mode="r")
+        self.boxes = np.load(self.split_dir / "boxes.npy", mmap_mode="r")
+        self._shards = {}
+
+    def __getstate__(self):
+        # Don't pickle the memory maps (that would copy them); DataLoader workers reopen lazily
+        return {"split_dir": self.split_dir}
+
+    def __setstate__(self, state):
+        self.split_dir = state["split_dir"]
+        self._open()
+
+    def __len__(self):
+        return len(self.index)
+
+    def _shard(self, shard_id):
+        shard = self._shards.get(shard_id)
+        if shard is None:
+            shard = np.memmap(self.split_dir / f"shard-{shard_id:05d}.bin", dtype=np.uint8, mode="r")
+            self._shards[shard_id] = shard
+        return shard
+
+    def raw(self, i) -> np.ndarray:
+        """Encoded image bytes of sample i, as a zero-copy uint8 view."""
+        entry = self.index[i]
+        offset = int(entry["offset"])
+        return self._shard(int(entry["shard"]))[offset:offset + int(entry["length"])]
+
+    def image(self, i, flags=cv2.IMREAD_COLOR) -> np.ndarray:
+        return cv2.imdecode(self.raw(i), flags)
+
+    def labels(self, i) -> np.ndarray:
+        """[n, 5] (class, xc, yc, w, h) rows of sample i, as a view."""
+        entry = self.index[i]
+        start = int(entry["box_start"])
+        return self.boxes[start:start + int(entry["box_count"])]
+
+    def shape(self, i):
+        entry = self.index[i]
+        return int(entry["height"]), int(entry["width"])
+
+
+# The PackedDataset whose load_image is running on this thread, if any
+_reading = threading.local()
+_upstream_imread = ultralytics_base.imread
+
+
+def _imread(filename, flags=cv2.IMREAD_COLOR):
+    """ultralytics' image read, except inside PackedYOLODataset.load_image, where it decodes from the shards."""
+    packed = getattr(_reading, "packed", None)
+    if packed is None:
+        return _upstream_imread(filename, flags)
+    return packed.image(int(Path(filename).stem), flags)
+
+
+ultralytics_base.imread = _imread
+
+
+class PackedYOLODataset(YOLODataset):
+    """ultralytics YOLODataset that reads images and labels from a packed split instead of loose files."""
+
+    def __init__(self, *args, img_path, **kwargs):
+        self.packed = PackedDataset(img_path)
+        super().__init__(*args, img_path=img_path, **kwargs)
+
+    def get_img_files(self, img_path):
+        # Synthetic names: ultralytics only uses them as identifiers once load_image is overridden
+        files = [str(Path(img_path) / f"{i}.jpg") for i in range(len(self.packed))]
+        if self.fraction < 1:
+            files = files[: round(len(files) * self.fraction)]
+        return files
+
+    def get_labels(self):
+        labels = []
+        for i, im_file in enumerate(self.im_files):
+            rows = np.array(self.packed.labels(i))
+            labels.append({
+                "im_file": im_file,
+                "shape": self.packed.shape(i),
+                "cls": rows[:, 0:1],
+                "bboxes": rows[:, 1:5],
+                "segments": [],
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            })
+        return labels
+
+    def load_image(self, i, rect_mode=True, resize_short=False):
+        """
+        BaseDataset.load_image with its file read served from the shard view, so the decode
+        flags (self.cv2_flag), the rect/resize_short resizing and the mosaic buffer are the
+        same as for loose files.
+        """
+        _reading.packed = self.packed
+        try:
+            return super().load_image(i, rect_mode, resize_short)
+        finally:
+            _reading.packed = None
+
+
+def build_packed_dataset(cfg, img_path, batch, data, mode="train", rect=False, stride=32):
+    """Packed counterpart of ultralytics.data.build_yolo_dataset for detection."""
+    return PackedYOLODataset(
+        img_path=img_path,
+        imgsz=cfg.imgsz,
+        batch_size=batch,
+        augment=mode == "train",
+        hyp=cfg,
+        rect=cfg.rect or rect,
+        cache=None,  # the shards already sit in the page cache
+        single_cls=cfg.single_cls or False,
+        stride=int(stride),
+        pad=0.0 if mode == "train" else 0.5,
+        prefix=colorstr(f"{mode}: "),
+        task=cfg.task,
+        classes=cfg.classes,
+        data=data,
+        fraction=cfg.fraction if mode == "train" else 1.0,
+    )
+
+
+class PackedDetectionTrainer(DetectionTrainer):
+    """Pass as model.train(trainer=PackedDetectionTrainer, data=<packed_dataset.yaml>)."""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        if not is_packed(img_path):
+            return super().build_dataset(img_path, mode, batch)
+        model = getattr(self.model, "module", self.model)
+        gs = max(int(model.stride.max() if model else 0), 32)
+        return build_packed_dataset(self.args, img_path, batch, self.data, mode=mode, rect=mode == "val", stride=gs)
+
+
+class PackedDetectionValidator(DetectionValidator):
+    """Pass as model.val(validator=PackedDetectionValidator, data=<packed_dataset.yaml>)."""
+
+    def build_dataset(self, img_path, mode="val", batch=None):
+        if not is_packed(img_path):
+            return super().build_dataset(img_path, mode, batch)
+        return build_packed_dataset(self.args, img_path, batch, self.data, mode=mode, stride=self.stride)
+
+
+if __name__ == "__main__":
+    # python packed_dataset.py [cub_yolo dir] [output dir]
+    args = sys.argv[1:]
+    pack_cub_yolo(Path(args[0]) if args else YOLO_DIR, Path(args[1]) if len(args) > 1 else PACKED_DIR)
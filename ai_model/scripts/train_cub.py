@@ -1,24 +1,34 @@
 import os
+import sys
 from ultralytics import YOLO
 
-def train_cub():
+def train_cub(packed=False):
     print("[*] Initializing YOLOv8 nano model for CUB-200-2011...")
     model = YOLO("yolov8n.pt") 
 
+    # --packed reads the memory-mapped shards written by packed_dataset.py instead of loose files
+    extra = {}
+    data = "../data/cub_yolo/cub_dataset.yaml"
+    if packed:
+        from packed_dataset import PackedDetectionTrainer
+        data = "../data/cub_packed/packed_dataset.yaml"
+        extra["trainer"] = PackedDetectionTrainer
+
     print("[*] Starting training process... (This might take a while on a CPU!)")
     # Reducing epochs to 5 for demonstration purposes. Real training requires 50-100+ epochs on a GPU.
     results = model.train(
-        data="../data/cub_yolo/cub_dataset.yaml",
+        data=data,
         epochs=1,
         imgsz=640,
         batch=16,
         project="../weights",
         name="cub_v1",
         device="cpu", # Change to "cuda" if GPU is available
-        val=True
+        val=True,
+        **extra
     )
 
     print("[*] Training completed. Best model saved in ../weights/cub_v1/weights/best.pt")
 
 if __name__ == "__main__":
-    train_cub()
+    train_cub(packed="--packed" in sys.argv)
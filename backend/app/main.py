@@ -1,82 +1,787 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-import cv2
-import numpy as np
+from fastapi import (
+    Depends, FastAPI, File, UploadFile, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+import asyncio
+import functools
+import json
+import os
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
 import uvicorn
-from io import BytesIO
 
-from core.inference import YOLOv8ONNX
-from core.species_info import get_species_info
+from core.admin import AdminToken, PublicCORSMiddleware
+from core.admission import AdmissionController, AdmissionMiddleware, Overloaded
+from core.batch_io import iter_uploads
+from core.cascade import CropCascade, Florence2Verifier
+from core.enrichment import SpeciesEnricher
+from core.ingest import (
+    UploadLimitMiddleware, UploadRejected, decode_upload, probe_dimensions, resize_factors, scale_detections,
+)
+from core.ladder import ModelLadder
+from core.lifecycle import ModelLifecycle, ModelNotReady
+from core.registry import ModelRegistry, RegistryError
+from core.metrics import (
+    Gauge, StageMetrics, add_timing, prometheus_gauge, prometheus_histogram, prometheus_samples, server_timing_header,
+)
+from core.result_cache import ResultCache
+from core.sightings import BUCKETS, SightingsStore, parse_time
+from core.video import Frame, VideoAnalyzer, VideoFrames, save_to_temp
+from core import species_info
+
+CLASSES_PATH = "../ai_model/data/CUB_200_2011/CUB_200_2011/classes.txt"
+
+def load_classes(classes_path=CLASSES_PATH):
+    """Class names from a CUB classes.txt ("1 001.Black_footed_Albatross") or a plain one-name-per-line file."""
+    try:
+        with open(classes_path, "r") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        return [(line.split(".", 1)[1] if "." in line else line).replace("_", " ") for line in lines]
+    except Exception:
+        return ['Eagle', 'Hawk', 'Sparrow', 'Pigeon', 'Owl']
+
+# Point to the expected path of the exported model.
+MODEL_PATH = os.environ.get("BIRDBASE_MODEL_PATH", "../ai_model/weights/best.onnx")
+# Serve the INT8 model written next to the FP32 one by ai_model/scripts/export.py
+QUANTIZED = os.environ.get("BIRDBASE_QUANTIZED", "0") == "1"
+if QUANTIZED:
+    MODEL_PATH = MODEL_PATH.replace(".onnx", ".int8.onnx")
+# More versions can be loaded at runtime through /models, from files under MODEL_DIR only.
+MODEL_DIR = os.environ.get("BIRDBASE_MODEL_DIR", os.path.dirname(MODEL_PATH) or ".")
+MODEL_NAME = os.environ.get("BIRDBASE_MODEL_NAME", "default")
+CONF_THRESHOLD = 0.4
+INPUT_SIZE = int(os.environ.get("BIRDBASE_INPUT_SIZE", "640"))
+
+# Uploads are cut off while streaming past these sizes, and images are checked against
+# MAX_IMAGE_MP from their header before decoding. JPEGs decode at the smallest 1/2, 1/4
+# or 1/8 reduction that still covers INPUT_SIZE.
+MAX_UPLOAD_MB = int(os.environ.get("BIRDBASE_MAX_UPLOAD_MB", "25"))
+MAX_BATCH_UPLOAD_MB = int(os.environ.get("BIRDBASE_MAX_BATCH_UPLOAD_MB", "512"))
+MAX_VIDEO_UPLOAD_MB = int(os.environ.get("BIRDBASE_MAX_VIDEO_UPLOAD_MB", "1024"))
+MAX_IMAGE_PIXELS = int(float(os.environ.get("BIRDBASE_MAX_IMAGE_MP", "100")) * 1_000_000)
+
+# Concurrent /predict/ requests are grouped into micro-batches in front of the detector.
+BATCH_MAX_SIZE = int(os.environ.get("BIRDBASE_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BIRDBASE_BATCH_MAX_WAIT_MS", "5"))
+# With INFERENCE_WORKERS > 0 the model runs in a pool of processes instead of this one.
+INFERENCE_WORKERS = int(os.environ.get("BIRDBASE_INFERENCE_WORKERS", "0"))
+INTRA_OP_THREADS = int(os.environ.get("BIRDBASE_INTRA_OP_THREADS", "1" if INFERENCE_WORKERS else "0"))
+
+# The model loads in the background once the server is up; /readyz turns 200 after warmup.
+# Warmup runs each batch size until two rounds agree within 10%, at most WARMUP_MAX_ROUNDS times (0 skips it).
+WARMUP_BATCH_SIZES = [int(n) for n in os.environ.get("BIRDBASE_WARMUP_BATCH_SIZES", f"1,{BATCH_MAX_SIZE}").split(",") if n]
+WARMUP_MAX_ROUNDS = int(os.environ.get("BIRDBASE_WARMUP_MAX_ROUNDS", "10"))
+# Without real weights the detector returns mock detections; only report ready in that case when allowed.
+ALLOW_MOCK = os.environ.get("BIRDBASE_ALLOW_MOCK", "0") == "1"
+
+def new_lifecycle(model_path, classes_path=None):
+    return ModelLifecycle(
+        model_path, functools.partial(load_classes, classes_path or CLASSES_PATH), input_size=INPUT_SIZE,
+        inference_workers=INFERENCE_WORKERS, intra_op_threads=INTRA_OP_THREADS, max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS, warmup_batch_sizes=WARMUP_BATCH_SIZES, warmup_max_rounds=WARMUP_MAX_ROUNDS,
+        allow_mock=ALLOW_MOCK, conf_threshold=CONF_THRESHOLD, top_k=CASCADE_TOP_K if CASCADE_MODEL else 0,
+    )
+
+# Loading, switching, rerouting and unloading versions under /models needs ADMIN_TOKEN as a bearer token;
+# without one those routes are disabled. /models is also left out of the public CORS policy.
+ADMIN_TOKEN = os.environ.get("BIRDBASE_ADMIN_TOKEN", "")
+require_admin = AdminToken(ADMIN_TOKEN)
+
+# A retired version is unloaded once its in-flight requests finish, or after MODEL_DRAIN_S seconds.
+registry = ModelRegistry(new_lifecycle, drain_timeout=float(os.environ.get("BIRDBASE_MODEL_DRAIN_S", "30")))
+
+# With MODEL_LADDER pointing at the ladder.json written by ai_model/scripts/export.py, each request runs on
+# one of several input sizes: the smallest covering the image, capped by the client's input_size hint and
+# stepped down a size each time admission pressure crosses one of LADDER_STEP_DOWN_ABOVE. The rung that is
+# MODEL_PATH is the main model; the others load as "ladder-<size>" versions.
+MODEL_LADDER = os.environ.get("BIRDBASE_MODEL_LADDER", "")
+ladder = ModelLadder.from_manifest(
+    MODEL_LADDER, main_model_path=MODEL_PATH, quantized=QUANTIZED,
+    step_down_above=[float(p) for p in os.environ.get("BIRDBASE_LADDER_STEP_DOWN_ABOVE", "0.5,0.75").split(",") if p],
+) if MODEL_LADDER else None
+
+# /predict/batch decodes uploads in this pool and keeps at most this many images in flight.
+DECODE_WORKERS = int(os.environ.get("BIRDBASE_DECODE_WORKERS", "4"))
+BATCH_MAX_INFLIGHT = int(os.environ.get("BIRDBASE_BATCH_MAX_INFLIGHT", str(BATCH_MAX_SIZE * 4)))
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+
+# Identical uploads are answered from here without decoding or inference.
+# Set BIRDBASE_RESULT_CACHE_PATH to share results between worker processes on one host.
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("BIRDBASE_RESULT_CACHE_ENTRIES", "4096")),
+    max_bytes=int(os.environ.get("BIRDBASE_RESULT_CACHE_MB", "64")) * 1024 * 1024,
+    disk_path=os.environ.get("BIRDBASE_RESULT_CACHE_PATH"),
+)
+
+# Species enrichment never blocks the event loop and is bounded by a per-request deadline.
+ENRICH_DEADLINE_MS = float(os.environ.get("BIRDBASE_ENRICH_DEADLINE_MS", "1500"))
+enricher = SpeciesEnricher()
+
+# Admission control for /predict/: at most ADMISSION_MAX_INFLIGHT requests are in flight, each with a
+# deadline from the X-Request-Deadline-Ms header or DEFAULT_DEADLINE_MS (0 means none), counted from
+# arrival. Requests that can't finish in time get a 503 before their body is read, or a 504 if the
+# deadline passes while they wait for the model.
+# Once DEGRADE_ABOVE of the slots are taken (0 disables it), requests skip enrichment, the cascade and
+# tiling, and run on the DEGRADED_MODEL version while it is loaded and serving. DEGRADED_MODEL_PATH loads it
+# at startup (named "degraded" unless DEGRADED_MODEL says otherwise); it can also be loaded through /models.
+DEGRADED_MODEL_PATH = os.environ.get("BIRDBASE_DEGRADED_MODEL_PATH", "")
+DEGRADED_MODEL = os.environ.get("BIRDBASE_DEGRADED_MODEL", "degraded" if DEGRADED_MODEL_PATH else "")
+admission = AdmissionController(
+    max_inflight=int(os.environ.get("BIRDBASE_ADMISSION_MAX_INFLIGHT", str(BATCH_MAX_SIZE * 8))),
+    default_deadline_ms=float(os.environ.get("BIRDBASE_DEFAULT_DEADLINE_MS", "5000")),
+    degrade_above=float(os.environ.get("BIRDBASE_DEGRADE_ABOVE", "0")),
+    headroom=float(os.environ.get("BIRDBASE_ADMISSION_HEADROOM", "0.5")),
+    route=lambda degraded: _admission_version(degraded),
+)
+
+# Video is sampled at VIDEO_SAMPLE_FPS; frames where less than VIDEO_DIFF_THRESHOLD of the pixels
+# changed since the last analysed frame reuse its detections (0 analyses every frame).
+VIDEO_SAMPLE_FPS = float(os.environ.get("BIRDBASE_VIDEO_SAMPLE_FPS", "5"))
+VIDEO_DIFF_THRESHOLD = float(os.environ.get("BIRDBASE_VIDEO_DIFF_THRESHOLD", "0.002"))
+# A track ends after this many analysed frames without a matching detection.
+VIDEO_TRACK_MAX_MISSED = int(os.environ.get("BIRDBASE_VIDEO_TRACK_MAX_MISSED", "5"))
+
+# Cascade: detections under CASCADE_BELOW confidence are cropped and checked by Florence-2
+# (BIRDBASE_CASCADE_MODEL is a Hugging Face id or local path; unset disables it), which picks
+# between the detector's CASCADE_TOP_K best classes (listed in each detection's "candidates")
+# and a generic "bird", generating at most CASCADE_MAX_TOKENS tokens. A Hugging Face id runs the
+# repo's own code, so it is only loaded at the commit in BIRDBASE_CASCADE_REVISION.
+# Crops from concurrent requests are batched and answers are cached by crop hash.
+CASCADE_MODEL = os.environ.get("BIRDBASE_CASCADE_MODEL", "")
+CASCADE_REVISION = os.environ.get("BIRDBASE_CASCADE_REVISION", "") or None
+CASCADE_BELOW = float(os.environ.get("BIRDBASE_CASCADE_BELOW", "0.6"))
+CASCADE_TOP_K = int(os.environ.get("BIRDBASE_CASCADE_TOP_K", "5"))
+CASCADE_MAX_TOKENS = int(os.environ.get("BIRDBASE_CASCADE_MAX_TOKENS", "20"))
+cascade = CropCascade(
+    functools.partial(Florence2Verifier, CASCADE_MODEL, revision=CASCADE_REVISION, max_new_tokens=CASCADE_MAX_TOKENS)
+    if CASCADE_MODEL else None,
+    threshold=CASCADE_BELOW,
+    max_batch_size=int(os.environ.get("BIRDBASE_CASCADE_BATCH_SIZE", "8")),
+    max_wait_ms=float(os.environ.get("BIRDBASE_CASCADE_MAX_WAIT_MS", "10")),
+)
+
+# Every detection served is appended to this store off the request path ("" disables it).
+SIGHTINGS_PATH = os.environ.get("BIRDBASE_SIGHTINGS_PATH", "sightings.sqlite3")
+sightings = SightingsStore(
+    SIGHTINGS_PATH,
+    flush_interval=float(os.environ.get("BIRDBASE_SIGHTINGS_FLUSH_S", "1")),
+    max_pending=int(os.environ.get("BIRDBASE_SIGHTINGS_MAX_PENDING", "200000")),
+)
+
+# Per-stage latency histograms served at /metrics; BIRDBASE_METRICS=0 turns timing off.
+# BIRDBASE_SERVER_TIMING=1 also returns each request's stages in a Server-Timing header.
+stage_metrics = StageMetrics()
+SERVER_TIMING = stage_metrics.enabled and os.environ.get("BIRDBASE_SERVER_TIMING", "0") == "1"
+inflight_detections = Gauge()
 
-app = FastAPI(title="BirdBase API", description="AI Backend for bird detection and info.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await registry.load(MODEL_NAME, MODEL_PATH)
+    if DEGRADED_MODEL_PATH:
+        await registry.load(DEGRADED_MODEL, DEGRADED_MODEL_PATH, activate=False)
+    for rung in ladder.rungs if ladder else []:
+        if rung.version:
+            await registry.load(rung.version, rung.path, activate=False)
+    await cascade.start()
+    if SIGHTINGS_PATH:
+        await asyncio.to_thread(sightings.start)
+    yield
+    await cascade.stop()
+    await registry.stop()
+    await asyncio.to_thread(sightings.stop)
+    await enricher.aclose()
+
+app = FastAPI(title="BirdBase API", description="AI Backend for bird detection and info.", lifespan=lifespan)
 
-# Allow CORS for Web Frontend
 app.add_middleware(
-    CORSMiddleware,
+    UploadLimitMiddleware,
+    limits={
+        "/predict/": MAX_UPLOAD_MB * 1024 * 1024,
+        "/predict/batch": MAX_BATCH_UPLOAD_MB * 1024 * 1024,
+        "/predict/video": MAX_VIDEO_UPLOAD_MB * 1024 * 1024,
+    },
+)
+# Added after the upload limit so it runs first: shed requests never reach it or the multipart parser
+app.add_middleware(AdmissionMiddleware, controller=admission, paths=["/predict/"])
+
+# Allow CORS for Web Frontend (but not for the model admin API). Added last so it wraps everything,
+# including the 503s and 413s the middlewares above answer with themselves.
+app.add_middleware(
+    PublicCORSMiddleware,
+    private_prefixes=["/models"],
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-def load_classes():
-    classes_path = "../ai_model/data/CUB_200_2011/CUB_200_2011/classes.txt"
-    try:
-        with open(classes_path, "r") as f:
-            return [line.strip().split(".", 1)[1].replace("_", " ") for line in f]
-    except Exception:
-        return ['Eagle', 'Hawk', 'Sparrow', 'Pigeon', 'Owl']
+@app.exception_handler(UploadRejected)
+async def upload_rejected(request, exc: UploadRejected):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+@app.exception_handler(RegistryError)
+async def registry_error(request, exc: RegistryError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
 
-CLASSES = load_classes()
-# Initialize ONNX inference class. Point to the expected path of the exported model.
-MODEL_PATH = "../ai_model/weights/best.onnx" 
-detector = YOLOv8ONNX(MODEL_PATH, CLASSES)
+@app.exception_handler(Overloaded)
+async def overloaded(request, exc: Overloaded):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(ModelNotReady)
+async def model_not_ready(request, exc: ModelNotReady):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the BirdBase API"}
 
+def _serving(name):
+    """Whether version `name` can take requests now: loaded, and not being drained for unload."""
+    version = registry.versions.get(name)
+    return version is not None and version.lifecycle.loaded and version.role == "serving"
+
+def _rung_available(rung):
+    return rung.version is None or _serving(rung.version)
+
+def _admission_version(degraded):
+    """The version a request admitted now is expected to run on, for the admission wait projection."""
+    if degraded and _serving(DEGRADED_MODEL):
+        return DEGRADED_MODEL
+    if degraded and ladder is not None and _rung_available(ladder.rungs[0]):
+        return ladder.rungs[0].version or registry.active
+    return registry.active
+
+def _ladder_version(content, input_size=None, degraded=False):
+    """The registry version of the ladder rung for this upload (None for the main model)."""
+    size = probe_dimensions(content)
+    rung = ladder.pick(
+        image_size=max(size) if size else None, hint=input_size, pressure=admission.pressure, degraded=degraded,
+        available=_rung_available,
+    )
+    return rung.version
+
+async def detect(content: bytes, executor=None, timings=None, tiled=False, ticket=None, input_size=None):
+    """
+    Return (predictions, from_cache) for raw upload bytes, or (None, False) if they don't decode.
+    A cache hit skips decoding and inference; `executor` moves decoding off the event loop.
+    With `tiled` the image is decoded at full resolution and run as overlapping tiles.
+    Raises UploadRejected for images over the size limit, and Overloaded if the admission `ticket`'s
+    deadline passes first; a degraded ticket runs the DEGRADED_MODEL version (if loaded) without the cascade.
+    With a model ladder, untiled images run on the rung picked for their size, the client's `input_size`
+    hint and the current load. Stage durations are added to `timings` when it is a dict.
+    """
+    degraded = ticket is not None and ticket.degraded
+    # Still loading, failed or draining: fall back to normal routing rather than failing degraded requests
+    name = DEGRADED_MODEL if degraded and _serving(DEGRADED_MODEL) else None
+    if name is None and ladder is not None and not tiled:
+        name = _ladder_version(content, input_size, degraded)
+    # The request keeps the version it was routed to even if the active one is switched meanwhile
+    with inflight_detections.track(), registry.route(name) as model:
+        lifecycle = model.lifecycle
+        started = time.perf_counter()
+        version = f"{lifecycle.model_version}:tiled" if tiled else lifecycle.model_version
+        verify = cascade.enabled and not degraded
+        if verify:
+            version += f":{cascade.model_id}"
+        cache_key = ResultCache.key(content, version, CONF_THRESHOLD)
+        predictions = result_cache.get(cache_key, disk=False)
+        if predictions is None and result_cache.disk_path:
+            # SQLite reads can wait on another process's write, so keep them off the event loop
+            predictions = await asyncio.to_thread(result_cache.get, cache_key)
+        add_timing(timings, "cache", started)
+        if predictions is not None:
+            return predictions, True
+
+        started = time.perf_counter()
+        # Tiles need the original pixels, so only untiled requests get a reduced decode (to the version's own size)
+        target_size = None if tiled else getattr(lifecycle.detector, "input_size", INPUT_SIZE)
+        if executor is None:
+            decoded = decode_upload(content, target_size, MAX_IMAGE_PIXELS)
+        else:
+            decoded = await asyncio.get_running_loop().run_in_executor(
+                executor, decode_upload, content, target_size, MAX_IMAGE_PIXELS,
+            )
+        add_timing(timings, "decode", started)
+        if decoded is None:
+            return None, False
+
+        # The scheduler batches this with other in-flight requests off the event loop.
+        predictions = await admission.within(model.submit(decoded.image, timings, tiled), ticket, model.name)
+        registry.mirror(model, decoded.image, predictions, tiled)
+        if verify:
+            predictions = await cascade.verify(decoded.image, predictions, timings)
+        # Boxes come back in the (possibly reduced) decoded image's pixels
+        predictions = scale_detections(predictions, decoded.scale_x, decoded.scale_y)
+        if result_cache.disk_path:
+            await asyncio.to_thread(result_cache.put, cache_key, predictions)
+        else:
+            result_cache.put(cache_key, predictions)
+        return predictions, False
+
+def finish_timings(timings, response: Response):
+    """Record a request's stage timings and, if enabled, report them in its Server-Timing header."""
+    if timings is None:
+        return
+    stage_metrics.observe(timings)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+
 @app.post("/predict/")
-async def predict_bird(file: UploadFile = File(...)):
+async def predict_bird(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    enrich: str = Query("inline", pattern="^(inline|stream|none)$"),
+    deadline_ms: float = Query(None, gt=0),
+    tiled: bool = Query(False),
+    source: str = Query(None, max_length=128),
+    original_width: int = Query(None, gt=0, le=100_000),
+    original_height: int = Query(None, gt=0, le=100_000),
+    input_size: int = Query(None, gt=0, le=4096),
+):
+    """
+    enrich=inline waits up to deadline_ms for species info and omits it on a miss,
+    enrich=stream returns NDJSON with the detection first and the info as a second line,
+    enrich=none skips species info entirely.
+    tiled=true runs overlapping model-sized tiles over high-resolution photos to find small, distant birds.
+    source optionally tags the stored sightings with a camera/source ID.
+    original_width/original_height mark the upload as downscaled by the client from a photo of that size;
+    boxes are then reported in the original photo's pixels.
+    input_size caps the model input size when the server has a model ladder (e.g. 320 for a fast answer).
+    The X-Request-Deadline-Ms header is the client's total time budget; a request that can't make it is
+    rejected with 503 and Retry-After. Under heavy load responses carry "degraded": true and skip species info.
+    """
     if file.content_type is None or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail=f"Ensure the file is an image. Received type: {file.content_type}")
+    if (original_width is None) != (original_height is None):
+        raise HTTPException(status_code=400, detail="Pass both original_width and original_height, or neither.")
 
+    timings = stage_metrics.new_timings()
+    # Set by AdmissionMiddleware when the request was admitted
+    ticket = getattr(request.state, "admission", None)
+    degraded = ticket is not None and ticket.degraded
+    started = time.perf_counter()
     content = await file.read()
-    nparr = np.frombuffer(content, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    add_timing(timings, "read", started)
+    # Run inference with a standard threshold now that we have a fully trained model.
+    predictions, cached = await detect(
+        content, timings=timings, tiled=tiled and not degraded, ticket=ticket, input_size=input_size,
+    )
 
-    if img is None:
+    if predictions is None:
         raise HTTPException(status_code=400, detail="Invalid image file or cannot be decoded.")
-
-    # Run inference with a standard threshold now that we have a fully trained model.
-    predictions = detector.predict(img, conf_threshold=0.4)
+    if original_width is not None:
+        # The result cache keeps upload pixels; the response and stored sightings use the original photo's
+        predictions = scale_detections(predictions, *resize_factors(content, original_width, original_height))
+    sightings.record(predictions, source)
     
     # Check if a bird was detected
     if len(predictions) == 0:
-        return {"detected": False, "message": "No bird found with confidence > 0.4. Try a clearer image."}
+        finish_timings(timings, response)
+        result = {"detected": False, "cached": cached, "message": "No bird found with confidence > 0.4. Try a clearer image."}
+        return dict(result, degraded=True) if degraded else result
     
     # Top prediction
     top_pred = predictions[0]
     species_name = top_pred['class']
-    
-    # Enrich with species information
-    details = get_species_info(species_name)
-    
-    return {
+    deadline = (deadline_ms or ENRICH_DEADLINE_MS) / 1000.0
+    if ticket is not None and ticket.deadline is not None:
+        deadline = max(0.0, min(deadline, ticket.deadline - time.perf_counter()))
+
+    result = {
         "detected": True,
         "species": species_name,
         "confidence": top_pred['confidence'],
         "bounding_box": top_pred['bbox'],
-        "info": details
+        "detections": predictions,
+        "cached": cached,
     }
+    if degraded:
+        result["degraded"] = True
+        enrich = "none"
+
+    if enrich == "stream":
+        async def ndjson():
+            yield json.dumps(result) + "\n"
+            started = time.perf_counter()
+            details = await enricher.get(species_name, deadline)
+            if timings is not None:
+                stage_metrics.observe({"enrich": time.perf_counter() - started})
+            yield json.dumps({"info": details, "info_timed_out": details is None}) + "\n"
+        stream = StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        # The header goes out with the first line, so it only covers the detection stages
+        finish_timings(timings, stream)
+        return stream
+
+    # Enrich with species information
+    if enrich == "inline":
+        started = time.perf_counter()
+        details = await enricher.get(species_name, deadline)
+        add_timing(timings, "enrich", started)
+        result["info"] = details
+        result["info_timed_out"] = details is None
+    finish_timings(timings, response)
+    return result
+
+async def _predict_one(name, content, error=None, source=None):
+    """Decode and run one image from a batch upload, returning its NDJSON record."""
+    if content is None:
+        return {"filename": name, "error": error}
+    timings = stage_metrics.new_timings()
+    try:
+        predictions, cached = await detect(content, decode_pool, timings)
+    except UploadRejected as e:
+        return {"filename": name, "error": str(e)}
+    except Exception as e:
+        return {"filename": name, "error": f"Inference failed: {e}"}
+    if predictions is None:
+        return {"filename": name, "error": "Invalid image file or cannot be decoded."}
+    stage_metrics.observe(timings)
+    sightings.record(predictions, source)
+
+    record = {"filename": name, "detected": len(predictions) > 0, "detections": predictions, "cached": cached}
+    if predictions:
+        record["species"] = predictions[0]['class']
+        record["confidence"] = predictions[0]['confidence']
+    return record
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...), source: str = Query(None, max_length=128)):
+    """
+    Run detection over many images, given as several image files and/or zip/tar archives.
+    Results stream back as NDJSON, one line per image in completion order.
+    """
+    registry.require_loaded()
+
+    async def ndjson():
+        loop = asyncio.get_running_loop()
+        sources = iter_uploads(files, MAX_UPLOAD_MB * 1024 * 1024, MAX_IMAGE_PIXELS)
+        pending = set()
+        exhausted = False
+
+        while pending or not exhausted:
+            # Keep the window full so the scheduler sees enough concurrent images to batch
+            while not exhausted and len(pending) < BATCH_MAX_INFLIGHT:
+                item = await loop.run_in_executor(decode_pool, next, sources, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.create_task(_predict_one(*item, source)))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield json.dumps(task.result()) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+async def _track_info(track):
+    """Species info for a new track, looked up once per track rather than per frame."""
+    details = await enricher.get(track["class"], ENRICH_DEADLINE_MS / 1000.0)
+    return {"type": "track_info", "track_id": track["track_id"], "info": details, "info_timed_out": details is None}
+
+def _new_analyzer():
+    # Frames go to whichever version is active, so a long stream survives a model switch
+    return VideoAnalyzer(registry.submit, diff_threshold=VIDEO_DIFF_THRESHOLD, max_missed=VIDEO_TRACK_MAX_MISSED)
+
+@app.post("/predict/video")
+async def predict_video(
+    file: UploadFile = File(...),
+    sample_fps: float = Query(None, gt=0),
+    emit: str = Query("frames", pattern="^(frames|tracks)$"),
+    enrich: bool = Query(True),
+):
+    """
+    Run detection over a video file and stream NDJSON events as it goes:
+    "frame" per sampled frame (emit=frames only), "track_start"/"track_end" as birds come and go,
+    "track_info" with species info once per track, and a final "summary".
+    """
+    registry.require_loaded()
+    loop = asyncio.get_running_loop()
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    path = await loop.run_in_executor(decode_pool, save_to_temp, file.file, suffix)
+    try:
+        frames = await loop.run_in_executor(decode_pool, VideoFrames, path, sample_fps or VIDEO_SAMPLE_FPS)
+    except ValueError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        analyzer = _new_analyzer()
+        info_tasks = set()
+        try:
+            while True:
+                # One chunk is submitted at once so the scheduler can batch its frames
+                chunk = await loop.run_in_executor(decode_pool, frames.read_chunk, BATCH_MAX_SIZE)
+                events = await analyzer.process_chunk(chunk) if chunk else analyzer.finish()
+                for event in events:
+                    if event["type"] == "track_start" and enrich:
+                        info_tasks.add(asyncio.create_task(_track_info(event["track"])))
+                    if event["type"] != "frame" or emit == "frames":
+                        yield json.dumps(event) + "\n"
+                for task in [t for t in info_tasks if t.done()]:
+                    info_tasks.discard(task)
+                    yield json.dumps(task.result()) + "\n"
+                if not chunk:
+                    break
+            for task in asyncio.as_completed(info_tasks):
+                yield json.dumps(await task) + "\n"
+            yield json.dumps(dict(analyzer.stats, type="summary")) + "\n"
+        finally:
+            for task in info_tasks:
+                task.cancel()
+            frames.close()
+            os.unlink(path)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/frames")
+async def frame_stream(websocket: WebSocket, enrich: bool = True):
+    """
+    Live frame stream: the client sends each frame as a binary JPEG/PNG message and receives
+    JSON events back ("frame", "track_start", "track_end", "track_info", or "error").
+    """
+    await websocket.accept()
+    try:
+        registry.require_loaded()
+    except ModelNotReady as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    loop = asyncio.get_running_loop()
+    analyzer = _new_analyzer()
+    send_lock = asyncio.Lock()
+    info_tasks = set()
+
+    async def send(event):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    async def send_track_info(track):
+        await send(await _track_info(track))
+
+    started = time.perf_counter()
+    try:
+        for index in itertools.count():
+            content = await websocket.receive_bytes()
+            try:
+                decoded = await loop.run_in_executor(decode_pool, decode_upload, content, INPUT_SIZE, MAX_IMAGE_PIXELS)
+            except UploadRejected as e:
+                await send({"type": "error", "frame": index, "detail": str(e)})
+                continue
+            if decoded is None:
+                await send({"type": "error", "frame": index, "detail": "Invalid image file or cannot be decoded."})
+                continue
+            frame = Frame(index, time.perf_counter() - started, decoded.image, decoded.scale_x, decoded.scale_y)
+            for event in await analyzer.process_chunk([frame]):
+                if event["type"] == "track_start" and enrich:
+                    task = asyncio.create_task(send_track_info(event["track"]))
+                    info_tasks.add(task)
+                    task.add_done_callback(info_tasks.discard)
+                await send(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(info_tasks):
+            task.cancel()
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up, whatever the model is doing."""
+    return {"status": "ok", "model": registry.versions[registry.active].status() if registry.active else None}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 only once the active model is loaded, warmed up and not in mock mode (unless allowed)."""
+    status = registry.versions[registry.active].status() if registry.active else {"state": "starting"}
+    return JSONResponse(status_code=200 if registry.ready else 503, content=status)
+
+def _model_file(path):
+    """Resolve an admin-supplied path, which must name an existing file under MODEL_DIR."""
+    root = os.path.realpath(MODEL_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=400, detail=f"Model files must be under {MODEL_DIR}.")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail=f"No such file: {path}")
+    return resolved
+
+class RoutingConfig(BaseModel):
+    # version -> relative share of live traffic; empty sends everything to the active version
+    weights: dict[str, float] = {}
+    # version -> fraction of requests also run on it in the background, for comparison only
+    shadow: dict[str, float] = {}
+
+@app.get("/models")
+def list_models():
+    """Loaded model versions with their state, routing and per-version latency and shadow agreement."""
+    return registry.status()
+
+@app.post("/models/{name}", status_code=202, dependencies=[Depends(require_admin)])
+async def load_model(name: str, model_path: str, classes_path: str = None, activate: bool = True):
+    """
+    Load another version from MODEL_DIR next to the serving one and warm it up in the background.
+    With activate=true traffic switches to it once it is ready, and the old version is drained and unloaded.
+    """
+    model_path = _model_file(model_path)
+    classes_path = _model_file(classes_path) if classes_path else None
+    await registry.load(name, model_path, classes_path, activate=activate)
+    return registry.get(name).status()
+
+@app.post("/models/{name}/activate", dependencies=[Depends(require_admin)])
+async def activate_model(name: str, keep_previous: bool = False):
+    await registry.activate(name, keep_previous=keep_previous)
+    return registry.status()
+
+@app.put("/models/routing", dependencies=[Depends(require_admin)])
+def set_model_routing(config: RoutingConfig):
+    registry.set_routing(config.weights, config.shadow)
+    return registry.status()
+
+@app.delete("/models/{name}", status_code=202, dependencies=[Depends(require_admin)])
+async def unload_model(name: str):
+    """Stop routing to a version; it is unloaded once its in-flight requests finish."""
+    await registry.unload(name)
+    return registry.get(name).status()
+
+def _sightings_range(start, end):
+    if not sightings.enabled:
+        raise HTTPException(status_code=404, detail="The sightings store is disabled.")
+    try:
+        return parse_time(start), parse_time(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be epoch seconds or ISO 8601 timestamps.")
+
+@app.get("/sightings")
+def list_sightings(
+    species: str = None,
+    source: str = None,
+    start: str = None,
+    end: str = None,
+    min_confidence: float = Query(None, ge=0, le=1),
+    limit: int = Query(1000, gt=0, le=10000),
+):
+    """Stored sightings in [start, end), newest first; start/end are epoch seconds or ISO 8601 (UTC if naive)."""
+    start, end = _sightings_range(start, end)
+    return {"sightings": sightings.query(species, source, start, end, min_confidence, limit)}
+
+@app.get("/sightings/counts")
+def sighting_counts(
+    bucket: str = Query("day", pattern=f"^({'|'.join(BUCKETS)})$"),
+    species: str = None,
+    source: str = None,
+    start: str = None,
+    end: str = None,
+):
+    """
+    Pre-aggregated sighting counts per UTC hour or day and species, e.g. detections per species per day.
+    Whole buckets are counted: start is rounded down and end up to the bucket boundary.
+    """
+    start, end = _sightings_range(start, end)
+    return {"bucket": bucket, "counts": sightings.counts(bucket, species, source, start, end)}
+
+@app.get("/stats/inference")
+def inference_stats():
+    return registry.require_loaded().stats()
+
+@app.get("/stats/result_cache")
+def result_cache_stats():
+    return result_cache.snapshot()
+
+@app.get("/stats/admission")
+def admission_stats():
+    return admission.snapshot()
+
+@app.get("/stats/ladder")
+def ladder_stats():
+    if ladder is None:
+        raise HTTPException(status_code=404, detail="No model ladder configured (set BIRDBASE_MODEL_LADDER).")
+    return ladder.snapshot()
+
+@app.get("/stats/cascade")
+def cascade_stats():
+    return cascade.snapshot()
+
+@app.get("/stats/sightings")
+def sightings_stats():
+    return sightings.snapshot()
+
+@app.get("/stats/species_cache")
+def species_cache_stats():
+    return dict(species_info.cache.snapshot(), enrichment=enricher.snapshot())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of stage latencies, model state and queue/cache gauges."""
+    active = registry.versions.get(registry.active)
+    lifecycle = active.lifecycle if active is not None else None
+    stats = lifecycle.scheduler.stats() if lifecycle is not None and lifecycle.loaded else {}
+    cache = result_cache.snapshot()
+    versions = sorted(registry.versions.items())
+
+    lines = prometheus_histogram(
+        "birdbase_stage_seconds", "Time spent in each stage of a detection request.",
+        [({"stage": stage}, histogram.snapshot()) for stage, histogram in sorted(stage_metrics.stages.items())],
+    )
+    lines += prometheus_gauge("birdbase_model_loaded", "1 if the ONNX model is loaded, 0 in mock mode or while loading.",
+                              bool(lifecycle and lifecycle.loaded and not lifecycle.mock))
+    lines += prometheus_gauge("birdbase_model_ready", "1 once the model is loaded and warmed up.", registry.ready)
+    lines += prometheus_gauge("birdbase_model_load_seconds", "Time taken to load the active ONNX model.",
+                              (lifecycle and lifecycle.load_seconds) or 0)
+    lines += prometheus_gauge("birdbase_model_warmup_seconds", "Time taken to warm up the active model.",
+                              (lifecycle and lifecycle.warmup_seconds) or 0)
+    lines += prometheus_histogram(
+        "birdbase_model_inference_seconds", "Scheduler round trip per request, by model version (live and shadow).",
+        [({"version": name}, version.latency.snapshot()) for name, version in versions],
+    )
+    for counter in ("requests", "errors", "shadow_requests", "shadow_agreed"):
+        lines += prometheus_samples(
+            f"birdbase_model_{counter}_total", f"Model {counter.replace('_', ' ')}, by version.",
+            [({"version": name}, version.stats[counter]) for name, version in versions], kind="counter",
+        )
+    lines += prometheus_samples("birdbase_model_weight", "A/B routing weight by version.",
+                                [({"version": name}, weight) for name, weight in sorted(registry.weights.items())])
+    if ladder is not None:
+        lines += prometheus_samples("birdbase_ladder_picks_total", "Requests routed to each model ladder input size.",
+                                    [({"size": size}, picks) for size, picks in ladder.picks.items()], kind="counter")
+    for counter in ("admitted", "rejected_full", "rejected_deadline", "expired", "degraded"):
+        lines += prometheus_gauge(f"birdbase_admission_{counter}_total", f"Admission {counter.replace('_', ' ')}.",
+                                  admission.stats[counter], kind="counter")
+    lines += prometheus_gauge("birdbase_admission_pressure", "Fraction of /predict/ admission slots taken.",
+                              admission.pressure)
+    lines += prometheus_gauge("birdbase_inflight_detections", "Images currently being decoded or inferred.",
+                              inflight_detections.value)
+    lines += prometheus_gauge("birdbase_inference_queue_depth", "Images waiting for the model.",
+                              stats.get("queue_depth_now", stats.get("inflight_now", 0)))
+    lines += prometheus_histogram(
+        "birdbase_cascade_added_seconds", "Latency the cascade verifier added to escalated requests.",
+        [({}, cascade.added_latency.snapshot())],
+    )
+    for counter in ("requests", "escalated_requests", "crops", "cache_hits", "verified", "relabelled"):
+        lines += prometheus_gauge(f"birdbase_cascade_{counter}_total", f"Cascade {counter.replace('_', ' ')}.",
+                                  cascade.stats[counter], kind="counter")
+    for counter in ("recorded", "written", "dropped", "failed"):
+        lines += prometheus_gauge(f"birdbase_sightings_{counter}_total", f"Sightings {counter}.",
+                                  sightings.stats[counter], kind="counter")
+    for counter in ("memory_hits", "disk_hits", "misses"):
+        lines += prometheus_gauge(f"birdbase_result_cache_{counter}_total", f"Result cache {counter.replace('_', ' ')}.",
+                                  cache[counter], kind="counter")
+    return "\n".join(lines) + "\n"
 
 @app.get("/species/{name}")
-def get_species(name: str):
-    info = get_species_info(name)
+async def get_species(name: str):
+    info = await enricher.get(name)
     if "error" in info:
         raise HTTPException(status_code=404, detail=info["error"])
     return info
 
 if __name__ == "__main__":
     print("[*] Starting BirdBase Backend...")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # No auto-reload: the reloader supervisor restarts workers and would redo the model load
+    uvicorn.run("main:app", host="0.0.0.0", port=8000)
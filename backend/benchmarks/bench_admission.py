@@ -0,0 +1,181 @@
+"""
+Load test: goodput under overload with and without admission control.
+
+Starts a local uvicorn server on the synthetic model for each configuration, measures
+its closed-loop capacity, then offers an open-loop stream of /predict/ requests at a
+multiple of that rate. Every client gives up after its deadline (and sends it in
+X-Request-Deadline-Ms where the server honours it). Goodput counts answers that came
+back 200 within the deadline; a request abandoned by the client is wasted server work.
+
+    off       no queue bound or deadline: everything is queued and served late
+    admission bounded queue + deadlines: early 503s, expired requests dropped
+    degraded  admission, plus a 320 px model and no enrichment past 20% of the slots
+
+Run from the backend directory:
+    python -m benchmarks.bench_admission [overload_factor] [seconds] [deadline_ms]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.suite import free_port, server_env, synthetic_images
+from benchmarks.synthetic_model import build_synthetic_yolo
+
+BOUNDARY = "birdbase-bench"
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+CONFIGS = {
+    "off": {"BIRDBASE_ADMISSION_MAX_INFLIGHT": "1000000", "BIRDBASE_DEFAULT_DEADLINE_MS": "0"},
+    "admission": {"BIRDBASE_ADMISSION_MAX_INFLIGHT": "64"},
+    "degraded": {"BIRDBASE_ADMISSION_MAX_INFLIGHT": "64", "BIRDBASE_DEGRADE_ABOVE": "0.2",
+                 "BIRDBASE_DEGRADED_MODEL": "lite"},
+}
+
+
+async def start_server(env, startup_timeout=60.0):
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return server, base_url
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.terminate()
+                raise RuntimeError("Benchmark server failed to become ready")
+            await asyncio.sleep(0.2)
+
+
+def multipart_bodies(payloads, boundary=BOUNDARY):
+    """Pre-encoded multipart uploads, so the client spends as little of the shared CPU as possible."""
+    bodies = []
+    for content in payloads:
+        bodies.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bird.jpg"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        )
+    return bodies
+
+
+async def capacity(client, payloads, seconds, concurrency=16):
+    """Closed-loop requests per second with `concurrency` clients."""
+    done = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def worker(i):
+        nonlocal done
+        while time.perf_counter() < stop_at:
+            response = await client.post("/predict/", content=payloads[(i + done) % len(payloads)], headers=HEADERS)
+            done += response.status_code == 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return done / (time.perf_counter() - started)
+
+
+async def open_loop(client, payloads, rate, seconds, deadline_ms, send_deadline):
+    """Send requests at `rate`/s for `seconds`; returns per-outcome counts and good latencies."""
+    import httpx
+
+    outcomes = {"ok": 0, "late": 0, "timeout": 0, "503": 0, "504": 0, "other": 0}
+    good = []
+    headers = dict(HEADERS, **({"X-Request-Deadline-Ms": str(deadline_ms)} if send_deadline else {}))
+
+    async def one(content):
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                client.post("/predict/", content=content, headers=headers),
+                deadline_ms / 1000.0,
+            )
+        except asyncio.TimeoutError:
+            outcomes["timeout"] += 1
+            return
+        except httpx.TransportError:
+            # e.g. the connection closed under a rejected upload that was still being sent
+            outcomes["other"] += 1
+            return
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            if elapsed <= deadline_ms / 1000.0:
+                outcomes["ok"] += 1
+                good.append(elapsed)
+            else:
+                outcomes["late"] += 1
+        else:
+            key = str(response.status_code)
+            outcomes[key if key in outcomes else "other"] += 1
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(payloads[i % len(payloads)])))
+    await asyncio.gather(*tasks)
+    return outcomes, good
+
+
+async def run_config(name, env, payloads, rate, seconds, deadline_ms):
+    import httpx
+
+    server, base_url = await start_server(env)
+    try:
+        limits = httpx.Limits(max_connections=2000, max_keepalive_connections=2000)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            if name == "degraded":
+                while (await client.get("/models")).json()["versions"]["lite"]["state"] != "ready":
+                    await asyncio.sleep(0.2)
+            await capacity(client, payloads, 1.0)  # warm up
+            if rate is None:
+                return await capacity(client, payloads, 3.0), None
+            outcomes, good = await open_loop(client, payloads, rate, seconds, deadline_ms, name != "off")
+            stats = (await client.get("/stats/admission")).json()
+        total = sum(outcomes.values())
+        p50 = np.percentile(good, 50) * 1000 if good else 0.0
+        p99 = np.percentile(good, 99) * 1000 if good else 0.0
+        print(f"    {name:<10} goodput {outcomes['ok'] / seconds:6.1f} req/s ({outcomes['ok'] / total:5.1%}) "
+              f"| p50 {p50:6.1f} ms p99 {p99:6.1f} ms | 503 {outcomes['503']:4d} 504 {outcomes['504']:4d} "
+              f"| client timeouts {outcomes['timeout']:4d} late {outcomes['late']:3d} other {outcomes['other']:3d} "
+              f"| degraded {stats['degraded']}")
+        return outcomes, stats
+    finally:
+        # The overloaded server would finish its whole backlog before a graceful shutdown
+        server.kill()
+        server.wait()
+
+
+async def main(factor=2.0, seconds=10.0, deadline_ms=1000.0):
+    workdir = tempfile.mkdtemp(prefix="birdbase-admission-")
+    model_path = build_synthetic_yolo(os.path.join(workdir, "synthetic.onnx"))
+    lite_path = build_synthetic_yolo(os.path.join(workdir, "lite.onnx"), input_size=320)
+    payloads = multipart_bodies(synthetic_images(32)[1])
+
+    base_env = dict(server_env(model_path, workdir), BIRDBASE_SIGHTINGS_PATH="")
+    served = await run_config("off", dict(base_env, **CONFIGS["off"]), payloads, None, seconds, deadline_ms)
+    rate = served[0] * factor
+    print(f"[*] capacity {served[0]:.1f} req/s; offering {rate:.1f} req/s for {seconds:.0f}s, "
+          f"client deadline {deadline_ms:.0f} ms")
+    for name, overrides in CONFIGS.items():
+        if name == "degraded":
+            overrides = dict(overrides, BIRDBASE_DEGRADED_MODEL_PATH=lite_path)
+        await run_config(name, dict(base_env, **overrides), payloads, rate, seconds, deadline_ms)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*[float(a) for a in sys.argv[1:]]))
@@ -0,0 +1,74 @@
+"""
+Benchmark: micro-batched inference vs one session.run per request.
+
+Uses a synthetic dynamic-batch model so it runs without the trained weights.
+Run from the backend directory:
+    python -m benchmarks.bench_batching [concurrency] [requests]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+from core.batching import BatchScheduler
+from core.inference import YOLOv8ONNX
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q)) * 1000
+
+
+async def run_load(submit, images, concurrency):
+    latencies = []
+    queue = list(images)
+
+    async def client():
+        while queue:
+            image = queue.pop()
+            t0 = time.perf_counter()
+            await submit(image)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return time.perf_counter() - t0, latencies
+
+
+def report(name, elapsed, latencies):
+    print(f"[*] {name:<12} {len(latencies) / elapsed:8.1f} img/s | "
+          f"p50 {percentile_ms(latencies, 50):7.1f} ms | p99 {percentile_ms(latencies, 99):7.1f} ms")
+
+
+async def main(concurrency=32, num_requests=256):
+    model_path = os.path.join(tempfile.mkdtemp(), "synthetic.onnx")
+    build_synthetic_yolo(model_path)
+    detector = YOLOv8ONNX(model_path, [f"class_{i}" for i in range(200)])
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8) for _ in range(num_requests)]
+
+    # Baseline: each request runs its own batch-1 inference in a thread
+    async def unbatched(image):
+        return await asyncio.to_thread(detector.predict, image, 0.4)
+
+    elapsed, latencies = await run_load(unbatched, images, concurrency)
+    report("unbatched", elapsed, latencies)
+
+    scheduler = BatchScheduler(detector, max_batch_size=16, max_wait_ms=5, conf_threshold=0.4)
+    await scheduler.start()
+    elapsed, latencies = await run_load(scheduler.submit, images, concurrency)
+    await scheduler.stop()
+    report("batched", elapsed, latencies)
+
+    stats = scheduler.stats()
+    print(f"[*] Batch size histogram:  {stats['batch_size']['buckets']}")
+    print(f"[*] Queue depth histogram: {stats['queue_depth']['buckets']}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(main(*args))
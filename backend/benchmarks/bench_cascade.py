@@ -0,0 +1,170 @@
+"""
+Benchmark: confidence-gated cascade on top of the batched detector.
+
+A blob-detector stand-in (synthetic_model.build_blob_detector) finds coloured squares;
+dim squares come out under the cascade threshold and are escalated to the TinyCaptioner
+stand-in verifier. Each square's hue is its true species. The one-class stand-in always
+says "Cardinal", so each detection is given TOP_K candidates the way a real detector's
+top-k would be: its own class, then others, with the true species among them TOP_K_RECALL
+of the time. The verifier can't place the species for `generic_rate` of the crops.
+
+Concurrent requests run detect -> verify like /predict/ does, with verifier batching on
+and off, then once more to show crop-cache hits. Reports the fraction of requests
+escalated, the latency the verifier adds to each escalated request, and what the
+verifier did with the escalated detections: confirmed, relabelled (right or wrong), or
+left unverified when the generic caption won.
+Run from the backend directory:
+    python -m benchmarks.bench_cascade [requests] [concurrency] [generic_rate]
+"""
+import asyncio
+import collections
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_model import TinyCaptioner, build_blob_detector
+from core.batching import BatchScheduler
+from core.cascade import CropCascade
+from core.inference import YOLOv8ONNX
+
+CLASSES = ["Cardinal", "Oriole", "Goldfinch", "Warbler", "Green Jay", "Kingfisher", "Blue Jay", "Bunting", "Finch"]
+# Mean blob brightness: the blob detector scores it, so BRIGHT is confident and DIM lands near 0.5
+BRIGHT = 200
+DIM = 153
+CONF_THRESHOLD = 0.4
+CASCADE_BELOW = 0.6
+TOP_K = 5
+TOP_K_RECALL = 0.9
+
+
+def blob_colour(species, brightness):
+    """BGR colour with the hue the stand-in verifier reads as `species`, at a mean `brightness`."""
+    hue = round((species + 0.5) * 180 / len(CLASSES))
+    pixel = cv2.cvtColor(np.uint8([[[hue, 90, 255]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    value = min(255, round(255 * brightness / float(pixel.mean())))
+    return tuple(int(c) for c in cv2.cvtColor(np.uint8([[[hue, 90, value]]]), cv2.COLOR_HSV2BGR)[0, 0])
+
+
+def synthetic_images(count, rng, dim_fraction=0.3):
+    """(image, true species, top-k candidates) for `count` images with one blob each."""
+    samples = []
+    for i in range(count):
+        image = rng.integers(0, 40, size=(480, 640, 3), dtype=np.uint8)
+        species = int(rng.integers(0, len(CLASSES)))
+        brightness = DIM if rng.random() < dim_fraction else BRIGHT
+        # Aligned to the stand-in's 8px cells so no partly covered cell scores in between
+        x, y = 8 * int(rng.integers(0, 70)), 8 * int(rng.integers(0, 50))
+        image[y:y + 16, x:x + 16] = blob_colour(species, brightness)
+
+        others = [name for name in CLASSES[1:] if name != CLASSES[species]]
+        rng.shuffle(others)
+        candidates = [CLASSES[0]] + others[:TOP_K - 1]
+        if species != 0 and rng.random() < TOP_K_RECALL:
+            candidates[int(rng.integers(1, TOP_K))] = CLASSES[species]
+        samples.append((image, CLASSES[species], candidates))
+    return samples
+
+
+async def run_load(scheduler, cascade, samples, concurrency, outcomes=None):
+    latencies, verify = [], []
+    queue = list(samples)
+
+    async def client():
+        while queue:
+            image, truth, candidates = queue.pop()
+            timings = {}
+            started = time.perf_counter()
+            detections = await scheduler.submit(image)
+            # What the real detector's top_k option adds to each detection
+            detections = [dict(d, candidates=candidates) for d in detections]
+            if cascade is not None:
+                detections = await cascade.verify(image, detections, timings)
+            latencies.append(time.perf_counter() - started)
+            if "verify" in timings:
+                verify.append(timings["verify"])
+            if outcomes is not None:
+                for d in detections:
+                    if "verified" in d:
+                        outcomes[outcome(d, truth)] += 1
+                        outcomes["detector right"] += d.get("detector_class", d["class"]) == truth
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return time.perf_counter() - started, latencies, verify
+
+
+def outcome(detection, truth):
+    if not detection["verified"]:
+        return "unverified"
+    if "detector_class" not in detection:
+        return "confirmed right" if detection["class"] == truth else "confirmed wrong"
+    return "relabelled right" if detection["class"] == truth else "relabelled wrong"
+
+
+def ms(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def report(name, elapsed, latencies, verify, cascade=None):
+    line = (f"    {name:<18} {len(latencies) / elapsed:7.1f} req/s | p50 {ms(latencies, 50):7.1f} ms "
+            f"| p95 {ms(latencies, 95):7.1f} ms")
+    if cascade is not None:
+        line += (f" | escalated {len(verify) / len(latencies):5.1%} | added p50 {ms(verify, 50):6.1f} ms "
+                 f"p95 {ms(verify, 95):6.1f} ms | cache hits {cascade.stats['cache_hits']}")
+    print(line)
+
+
+async def new_cascade(max_batch_size, captioner):
+    cascade = CropCascade(lambda: captioner, threshold=CASCADE_BELOW, max_batch_size=max_batch_size)
+    await cascade.start()
+    await cascade._task
+    return cascade
+
+
+async def main(num_requests=200, concurrency=16, generic_rate=0.5):
+    model_path = os.path.join(tempfile.mkdtemp(), "blobs.onnx")
+    build_blob_detector(model_path)
+    detector = YOLOv8ONNX(model_path, CLASSES)
+    scheduler = BatchScheduler(detector, max_batch_size=16, max_wait_ms=5, conf_threshold=CONF_THRESHOLD)
+    await scheduler.start()
+    captioner = TinyCaptioner(CLASSES, generic_rate=generic_rate)
+    samples = synthetic_images(num_requests, np.random.default_rng(0))
+
+    await run_load(scheduler, None, samples[:32], concurrency)  # warm up
+    print(f"[*] {num_requests} requests, concurrency {concurrency}, cascade below {CASCADE_BELOW:.2f} confidence, "
+          f"top-{TOP_K} candidates ({TOP_K_RECALL:.0%} recall), generic answers {generic_rate:.0%}")
+    report("detector only", *await run_load(scheduler, None, samples, concurrency))
+
+    # One client shows the verifier's own cost; the concurrent runs add queueing for it
+    cascade = await new_cascade(1, captioner)
+    report("cascade, 1 client", *await run_load(scheduler, cascade, samples[:50], 1), cascade)
+    await cascade.stop()
+
+    for label, batch_size in [("cascade unbatched", 1), ("cascade batched", 8)]:
+        cascade = await new_cascade(batch_size, captioner)
+        outcomes = collections.Counter()
+        report(label, *await run_load(scheduler, cascade, samples, concurrency, outcomes), cascade)
+        if batch_size > 1:
+            # Same uploads again: every escalated crop is answered from the cache
+            report("cascade, repeat", *await run_load(scheduler, cascade, samples, concurrency), cascade)
+            stats = cascade.snapshot()
+            print(f"[*] crops verified {stats['crops']}, verifier batches {stats['batch_size']['count']}")
+            names = ("confirmed right", "confirmed wrong", "relabelled right", "relabelled wrong", "unverified")
+            escalated = sum(outcomes[name] for name in names)
+            right = outcomes["confirmed right"] + outcomes["relabelled right"]
+            print("[*] escalated detections: " + ", ".join(
+                f"{name} {outcomes[name]} ({outcomes[name] / max(1, escalated):.0%})" for name in names
+            ))
+            print(f"[*] low-confidence labels right: detector {outcomes['detector right']}/{escalated}, "
+                  f"after the cascade {right}/{escalated}")
+        await cascade.stop()
+    await scheduler.stop()
+
+
+if __name__ == "__main__":
+    args = [float(a) if "." in a else int(a) for a in sys.argv[1:]]
+    asyncio.run(main(*args))
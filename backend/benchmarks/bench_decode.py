@@ -0,0 +1,66 @@
+"""
+Benchmark: full-resolution cv2.imdecode vs header-checked reduced-resolution decode_upload.
+
+Encodes large synthetic camera-sized JPEGs and, for each, times decode plus letterbox
+to the model input and measures the peak NumPy memory of the decoded frame (tracemalloc).
+Run from the backend directory:
+    python -m benchmarks.bench_decode [input_size]
+"""
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from core.inference import LetterboxPreprocessor
+from core.ingest import decode_upload
+
+REPEATS = 10
+# 12, 24 and 40 MP
+SIZES = [(3000, 4000), (4000, 6000), (5304, 7952)]
+
+
+def synthetic_jpeg(height, width, seed=0):
+    """A smooth random photo-like image; pure noise would be unrealistically expensive to decode."""
+    small = np.random.default_rng(seed).integers(0, 255, size=(height // 32, width // 32, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+
+def full_decode(content):
+    return cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+
+
+def measure(decode, content, preprocessor, out):
+    decode(content)
+    tracemalloc.start()
+    image = decode(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del image
+
+    t0 = time.perf_counter()
+    for _ in range(REPEATS):
+        image = decode(content)
+        preprocessor.letterbox_into(image, out)
+    return (time.perf_counter() - t0) / REPEATS * 1000, peak / (1024 * 1024)
+
+
+def main(input_size=640):
+    preprocessor = LetterboxPreprocessor(input_size)
+    out = preprocessor.batch_buffer(1)[0]
+    reduced = lambda content: decode_upload(content, input_size).image
+
+    for height, width in SIZES:
+        content = synthetic_jpeg(height, width)
+        full_ms, full_mb = measure(full_decode, content, preprocessor, out)
+        reduced_ms, reduced_mb = measure(reduced, content, preprocessor, out)
+        print(f"[*] {width}x{height} ({len(content) / 1e6:.1f} MB JPEG)")
+        print(f"    full decode     {full_ms:8.1f} ms | {full_mb:7.1f} MB decoded")
+        print(f"    reduced decode  {reduced_ms:8.1f} ms | {reduced_mb:7.1f} MB decoded "
+              f"({full_ms / reduced_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,73 @@
+"""
+Concurrency benchmark for species enrichment against a slow local stand-in for Wikipedia.
+
+Compares the blocking requests-based lookup (run from the event loop, as the old
+/predict/ handler did) with SpeciesEnricher, and checks request coalescing and deadlines.
+Run from the backend directory:
+    python -m benchmarks.bench_enrichment
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.bench_species_cache import FakeWikipedia, start_fake_wikipedia
+from core import species_info
+from core.enrichment import SpeciesEnricher
+
+CONCURRENCY = 100
+NUM_SPECIES = 5
+UPSTREAM_DELAY = 0.2
+
+
+def fresh_cache():
+    species_info.cache = species_info.SpeciesInfoCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+
+
+async def blocking_lookups(names):
+    # Each call blocks the loop for the full upstream round trip
+    return [species_info.get_species_info(name) for name in names]
+
+
+async def async_lookups(enricher, names, deadline=None):
+    return await asyncio.gather(*[enricher.get(name, deadline) for name in names])
+
+
+async def main():
+    server = start_fake_wikipedia()
+    FakeWikipedia.delay = UPSTREAM_DELAY
+    names = [f"Synthetic Bird {i % NUM_SPECIES}" for i in range(CONCURRENCY)]
+
+    fresh_cache()
+    FakeWikipedia.requests_served = 0
+    t0 = time.perf_counter()
+    await blocking_lookups(names)
+    print(f"[*] Blocking requests:   {time.perf_counter() - t0:6.2f}s, "
+          f"{FakeWikipedia.requests_served} upstream requests for {CONCURRENCY} lookups")
+
+    fresh_cache()
+    FakeWikipedia.requests_served = 0
+    enricher = SpeciesEnricher()
+    t0 = time.perf_counter()
+    results = await async_lookups(enricher, names)
+    print(f"[*] Async + coalescing:  {time.perf_counter() - t0:6.2f}s, "
+          f"{FakeWikipedia.requests_served} upstream requests for {CONCURRENCY} lookups")
+    assert all(r is not None and "error" not in r for r in results)
+    assert FakeWikipedia.requests_served == NUM_SPECIES
+
+    # A deadline shorter than the upstream delay returns None quickly, the fetch still lands in the cache
+    fresh_cache()
+    t0 = time.perf_counter()
+    results = await async_lookups(enricher, names, deadline=0.05)
+    print(f"[*] 50 ms deadline:      {time.perf_counter() - t0:6.2f}s, "
+          f"{sum(r is None for r in results)} of {CONCURRENCY} lookups missed the deadline")
+    await asyncio.sleep(UPSTREAM_DELAY * 2)
+    assert all(species_info.cache.get(species_info.normalize_name(n))[1] for n in names)
+
+    print(f"[*] Enricher stats: {enricher.snapshot()}")
+    await enricher.aclose()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
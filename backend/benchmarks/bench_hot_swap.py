@@ -0,0 +1,100 @@
+"""
+Benchmark: switching model versions under load.
+
+Concurrent clients send requests through ModelRegistry.route like /predict/ does while a
+second blob-detector version is loaded, warmed up and switched to, and the first is drained.
+Reports throughput and latency per phase (before, while v2 warms up, after the switch)
+and any failed requests, then the same with v2 taking 50% of traffic as a shadow.
+Run from the backend directory:
+    python -m benchmarks.bench_hot_swap [seconds_per_phase] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_model import build_blob_detector
+from core.lifecycle import ModelLifecycle
+from core.registry import ModelRegistry
+
+CLASSES = ["Cardinal"]
+
+
+def new_lifecycle(model_path, classes_path=None):
+    return ModelLifecycle(model_path, lambda: CLASSES, max_batch_size=16, max_wait_ms=5,
+                          warmup_batch_sizes=[1, 16], warmup_max_rounds=3, conf_threshold=0.4)
+
+
+def ms(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+async def main(seconds=3.0, concurrency=16):
+    model_dir = tempfile.mkdtemp()
+    for name in ("v1", "v2"):
+        build_blob_detector(os.path.join(model_dir, f"{name}.onnx"))
+    registry = ModelRegistry(new_lifecycle, drain_timeout=10)
+    await registry.load("v1", os.path.join(model_dir, "v1.onnx"))
+    await registry.active_version.lifecycle.wait_ready()
+
+    image = np.zeros((480, 640, 3), np.uint8)
+    image[96:112, 200:216] = 255
+    phase = ["before"]
+    results = {}  # phase -> (latencies, errors)
+    running = True
+
+    async def client():
+        while running:
+            started = time.perf_counter()
+            latencies, errors = results.setdefault(phase[0], ([], []))
+            try:
+                with registry.route() as version:
+                    detections = await version.submit(image)
+                registry.mirror(version, image, detections)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    clients = [asyncio.create_task(client()) for _ in range(concurrency)]
+    await asyncio.sleep(seconds)
+    phase[0] = "loading v2"
+    started = time.perf_counter()
+    await registry.load("v2", os.path.join(model_dir, "v2.onnx"))
+    while registry.active != "v2":
+        await asyncio.sleep(0.01)
+    switch_s = time.perf_counter() - started
+    phase[0] = "after switch"
+    while "v1" in registry.versions:
+        await asyncio.sleep(0.01)
+    drain_s = time.perf_counter() - started - switch_s
+    await asyncio.sleep(seconds)
+
+    phase[0] = "v1 shadowing 50%"
+    await registry.load("v1", os.path.join(model_dir, "v1.onnx"), activate=False)
+    await registry.versions["v1"].lifecycle.wait_ready()
+    registry.set_routing(shadow={"v1": 0.5})
+    phase_started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    running = False
+    await asyncio.gather(*clients)
+    shadow_s = time.perf_counter() - phase_started
+
+    print(f"[*] concurrency {concurrency}, switched after {switch_s:.2f}s (load + warmup), "
+          f"v1 drained and unloaded {drain_s:.2f}s later")
+    durations = {"before": seconds, "loading v2": switch_s, "after switch": seconds + drain_s,
+                 "v1 shadowing 50%": shadow_s}
+    for name, (latencies, errors) in results.items():
+        print(f"    {name:<18} {len(latencies) / durations[name]:7.1f} req/s | p50 {ms(latencies, 50):6.1f} ms "
+              f"| p99 {ms(latencies, 99):6.1f} ms | failed {len(errors)}")
+    stats = registry.versions["v1"].stats
+    print(f"[*] shadow requests {stats['shadow_requests']}, agreed {stats['shadow_agreed']}, "
+          f"skipped {registry.stats['shadow_skipped']}")
+    await registry.stop()
+
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:2]] + [int(a) for a in sys.argv[2:3]]
+    asyncio.run(main(*args))
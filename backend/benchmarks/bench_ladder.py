@@ -0,0 +1,151 @@
+"""
+Benchmark: the model ladder as a latency/accuracy dial.
+
+Loads every rung of a ladder into a ModelRegistry the way the API does, measures each
+rung's closed-loop throughput, then offers an open-loop stream of images (a mix of
+thumbnail and camera-sized uploads) at a multiple of the largest rung's capacity:
+
+    fixed     every request on the largest rung, as without a ladder
+    size      the smallest rung covering each image's long side
+    ladder    image size plus one rung down per step_down_above pressure crossed
+    hint 320  every client asking for input_size=320
+
+Pressure is in-flight requests over `max_inflight`, as the admission controller reports it.
+With a ladder.json from ai_model/scripts/export.py the real exports are used (and their
+measured accuracy printed); without one, synthetic models are built at 320/480/640.
+Run from the backend directory:
+    python -m benchmarks.bench_ladder [ladder.json] [overload_factor] [seconds]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+from core.ladder import ModelLadder, Rung
+from core.lifecycle import ModelLifecycle
+from core.metrics import Gauge
+from core.registry import ModelRegistry
+
+CLASSES = [f"class_{i}" for i in range(200)]
+UPLOAD_SIZES = [(240, 320), (360, 480), (480, 640), (3024, 4032)]
+
+
+def new_lifecycle(model_path, classes_path=None):
+    return ModelLifecycle(model_path, lambda: CLASSES, max_batch_size=8, max_wait_ms=5,
+                          warmup_batch_sizes=[1, 8], warmup_max_rounds=3, conf_threshold=0.4)
+
+
+def synthetic_ladder(workdir, sizes=(320, 480, 640)):
+    rungs = []
+    for size in sizes:
+        path = build_synthetic_yolo(os.path.join(workdir, f"synthetic.{size}.onnx"), input_size=size)
+        rungs.append(Rung(size, path, f"ladder-{size}", {}, None, None))
+    return ModelLadder(rungs)
+
+
+def upload_images(count=32, seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        h, w = UPLOAD_SIZES[i % len(UPLOAD_SIZES)]
+        small = rng.integers(0, 255, size=(max(1, h // 16), max(1, w // 16), 3), dtype=np.uint8)
+        # Camera-sized uploads arrive decoded at the model size, as a reduced JPEG decode leaves them
+        scale = min(1.0, 640 / max(h, w))
+        images.append((max(h, w), cv2.resize(small, (round(w * scale), round(h * scale)))))
+    return images
+
+
+def ms(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+async def capacity(registry, version, images, seconds=3.0, concurrency=16):
+    done = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def worker(i):
+        nonlocal done
+        while time.perf_counter() < stop_at:
+            with registry.route(version) as model:
+                await model.submit(images[(i + done) % len(images)][1])
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return done / (time.perf_counter() - started)
+
+
+async def open_loop(registry, ladder, images, rate, seconds, choose, max_inflight):
+    inflight = Gauge()
+    latencies = []
+    picks = {size: 0 for size in ladder.sizes}
+
+    async def one(long_side, image):
+        with inflight.track():
+            started = time.perf_counter()
+            rung = choose(long_side, inflight.value / max_inflight)
+            picks[rung.size] += 1
+            with registry.route(rung.version) as model:
+                await model.submit(image)
+            latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(*images[i % len(images)])))
+    await asyncio.gather(*tasks)
+    return len(latencies) / (time.perf_counter() - started), latencies, picks
+
+
+async def main(manifest=None, factor=1.5, seconds=8.0, max_inflight=64):
+    if manifest:
+        ladder = ModelLadder.from_manifest(manifest)
+    else:
+        ladder = synthetic_ladder(tempfile.mkdtemp(prefix="birdbase-ladder-"))
+    registry = ModelRegistry(new_lifecycle)
+    for rung in ladder.rungs:
+        await registry.load(rung.version or f"ladder-{rung.size}", rung.path, activate=False)
+    for version in registry.versions.values():
+        await version.lifecycle.wait_ready()
+    # Rungs that are the main model are served under their size here
+    ladder.rungs = [rung._replace(version=rung.version or f"ladder-{rung.size}") for rung in ladder.rungs]
+    images = upload_images()
+
+    print(f"{'rung':>6} {'req/s':>8} {'batch-1 ms':>11} {'mAP50-95':>9} {'top-1':>7}")
+    capacities = {}
+    for rung in ladder.rungs:
+        capacities[rung.size] = await capacity(registry, rung.version, images)
+        accuracy = (f"{rung.map50_95:9.4f} {rung.top1:7.2%}" if rung.map50_95 is not None
+                    else f"{'-':>9} {'-':>7}")
+        latency = f"{rung.latency_ms['1']:11.1f}" if "1" in rung.latency_ms else f"{'-':>11}"
+        print(f"{rung.size:6d} {capacities[rung.size]:8.1f} {latency} {accuracy}")
+
+    rate = capacities[ladder.sizes[-1]] * factor
+    print(f"\n[*] offering {rate:.1f} req/s ({factor:g}x the {ladder.sizes[-1]} px capacity) for {seconds:.0f}s, "
+          f"pressure = in flight / {max_inflight}")
+    policies = {
+        "fixed": lambda long_side, pressure: ladder.rungs[-1],
+        "size": lambda long_side, pressure: ladder.pick(image_size=long_side),
+        "ladder": lambda long_side, pressure: ladder.pick(image_size=long_side, pressure=pressure),
+        "hint 320": lambda long_side, pressure: ladder.pick(image_size=long_side, hint=320, pressure=pressure),
+    }
+    for name, choose in policies.items():
+        served, latencies, picks = await open_loop(registry, ladder, images, rate, seconds, choose, max_inflight)
+        mix = " ".join(f"{size}:{count / max(1, sum(picks.values())):4.0%}" for size, count in picks.items())
+        print(f"    {name:<9} {served:6.1f} req/s | p50 {ms(latencies, 50):7.1f} ms | p99 {ms(latencies, 99):7.1f} ms "
+              f"| rungs {mix}")
+    await registry.stop()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    manifest = args.pop(0) if args and args[0].endswith(".json") else None
+    asyncio.run(main(manifest, *[float(a) for a in args]))
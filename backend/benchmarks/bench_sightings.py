@@ -0,0 +1,91 @@
+"""
+Benchmark: the sightings store at dashboard scale.
+
+Records millions of synthetic detections (200 species over 90 days, 4 cameras) through
+SightingsStore.record, reporting the per-call cost the predict path pays and how fast the
+writer thread drains them. Then times the query endpoints' work against a full scan of the
+raw rows for "detections per species per day".
+Run from the backend directory:
+    python -m benchmarks.bench_sightings [num_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from core.sightings import SightingsStore
+
+NUM_SPECIES = 200
+DAYS = 90
+START = 1_700_000_000.0
+
+
+def timed_ms(fn, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main(num_rows=2_000_000):
+    path = os.path.join(tempfile.mkdtemp(), "sightings.sqlite3")
+    store = SightingsStore(path, flush_interval=0.5, max_pending=num_rows)
+    store.start()
+    rng = np.random.default_rng(0)
+    species = [f"Species {i}" for i in range(NUM_SPECIES)]
+
+    # One record call per request with 1-3 detections, like /predict/
+    per_call = rng.integers(1, 4, size=num_rows // 2)
+    per_call = per_call[np.cumsum(per_call) <= num_rows]
+    timestamps = np.sort(rng.uniform(START, START + DAYS * 86400, size=len(per_call)))
+    species_ids = rng.zipf(1.3, size=int(per_call.sum())) % NUM_SPECIES
+    requests, offset = [], 0
+    for n, ts in zip(per_call, timestamps):
+        dets = [{"class": species[species_ids[offset + k]], "confidence": 0.5 + 0.5 * rng.random(),
+                 "bbox": [10.0, 20.0, 100.0, 80.0]} for k in range(n)]
+        requests.append((dets, f"cam-{offset % 4}", float(ts)))
+        offset += n
+
+    call_times = np.empty(len(requests))
+    started = time.perf_counter()
+    for i, (dets, source, ts) in enumerate(requests):
+        t0 = time.perf_counter()
+        store.record(dets, source, ts)
+        call_times[i] = time.perf_counter() - t0
+    queued = time.perf_counter() - started
+    while store.stats["written"] < store.stats["recorded"]:
+        time.sleep(0.05)
+    drained = time.perf_counter() - started
+    rows = store.stats["written"]
+    print(f"[*] {rows} sightings from {len(requests)} record() calls")
+    print(f"    record() p50 {np.percentile(call_times, 50) * 1e6:.1f} us | p99 {np.percentile(call_times, 99) * 1e6:.1f} us "
+          f"| queued in {queued:.1f}s")
+    print(f"    writer drained everything after {drained:.1f}s ({rows / drained:,.0f} rows/s, "
+          f"{store.stats['flushes']} flushes, dropped {store.stats['dropped']})")
+
+    day = START + 45 * 86400
+    queries = [
+        ("per species per day (rollup)", lambda: store.counts("day")),
+        ("one species per day (rollup)", lambda: store.counts("day", species="Species 7")),
+        ("one camera per hour, 1 day", lambda: store.counts("hour", source="cam-2", start=day, end=day + 86400)),
+        ("one species, 1 day of rows", lambda: store.query("Species 7", start=day, end=day + 86400)),
+        ("latest 1000 rows, 1 hour", lambda: store.query(start=day, end=day + 3600)),
+    ]
+    for label, fn in queries:
+        ms, result = timed_ms(fn)
+        print(f"    {label:<30} {ms:8.2f} ms  ({len(result)} results)")
+
+    db = store._reader()
+    scan_ms, _ = timed_ms(lambda: db.execute(
+        "SELECT CAST(ts / 86400 AS INTEGER), species_id, COUNT(*) FROM sightings GROUP BY 1, 2"
+    ).fetchall(), repeats=1)
+    print(f"    {'per species per day (scan)':<30} {scan_ms:8.2f} ms")
+    store.stop()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,90 @@
+"""
+Check and time the species info cache against a local stand-in for the Wikipedia API.
+
+Starts a throwaway HTTP server, warms a fresh SQLite cache with synthetic species,
+then verifies that memory, disk and offline lookups make zero upstream requests.
+Run from the backend directory:
+    python -m benchmarks.bench_species_cache
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core import species_info
+
+NUM_SPECIES = 200
+UPSTREAM_DELAY = 0.02
+
+
+class FakeWikipedia(BaseHTTPRequestHandler):
+    requests_served = 0
+    delay = UPSTREAM_DELAY
+
+    def do_GET(self):
+        FakeWikipedia.requests_served += 1
+        time.sleep(self.delay)
+        title = self.path.rsplit("/", 1)[-1]
+        body = json.dumps({"extract": f"Stand-in summary for {title}."}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed_lookups(names):
+    t0 = time.perf_counter()
+    for name in names:
+        info = species_info.get_species_info(name)
+        assert "error" not in info, info
+    return (time.perf_counter() - t0) / len(names) * 1e6
+
+
+def start_fake_wikipedia():
+    """Serve FakeWikipedia on a free local port and point species_info at it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWikipedia)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    species_info.WIKIPEDIA_SUMMARY_URL = f"http://127.0.0.1:{server.server_port}/page/summary/"
+    return server
+
+
+def main():
+    server = start_fake_wikipedia()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "species_cache.sqlite3")
+    species_info.cache = species_info.SpeciesInfoCache(db_path)
+    names = [f"Synthetic Bird {i}" for i in range(NUM_SPECIES)]
+
+    t0 = time.perf_counter()
+    fetched = species_info.warm_cache(names)
+    print(f"[*] Warmed {fetched} species in {time.perf_counter() - t0:.2f}s "
+          f"({FakeWikipedia.requests_served} upstream requests)")
+
+    served = FakeWikipedia.requests_served
+    print(f"[*] Memory hit:  {timed_lookups(names):8.1f} us/lookup")
+
+    # A fresh process only has the SQLite snapshot
+    species_info.cache = species_info.SpeciesInfoCache(db_path)
+    print(f"[*] Disk hit:    {timed_lookups(names):8.1f} us/lookup")
+
+    # Expired entries are still served when offline
+    species_info.cache = species_info.SpeciesInfoCache(db_path, ttl=0)
+    species_info.OFFLINE = True
+    print(f"[*] Offline:     {timed_lookups(names):8.1f} us/lookup")
+    species_info.OFFLINE = False
+
+    assert FakeWikipedia.requests_served == served, "cached lookups must not reach the network"
+    print(f"[*] Upstream requests after warmup: {FakeWikipedia.requests_served - served}")
+    print(f"[*] Cache stats: {species_info.cache.snapshot()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
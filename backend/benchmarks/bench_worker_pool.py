@@ -0,0 +1,52 @@
+"""
+Scaling benchmark for the multi-process inference worker pool.
+
+Drives the pool with a synthetic dynamic-batch model at 1, 2, 4 and 8 workers
+(one intra-op thread each) and reports images per second and speedup over 1 worker.
+Run from the backend directory:
+    python -m benchmarks.bench_worker_pool [num_images]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+from core.worker_pool import InferenceWorkerPool
+
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def main(num_images=256):
+    model_path = os.path.join(tempfile.mkdtemp(), "synthetic.onnx")
+    build_synthetic_yolo(model_path)
+    classes = [f"class_{i}" for i in range(200)]
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8) for _ in range(16)]
+    print(f"[*] {os.cpu_count()} CPUs available")
+
+    baseline = None
+    for workers in WORKER_COUNTS:
+        pool = InferenceWorkerPool(model_path, classes, num_workers=workers, intra_op_threads=1,
+                                   max_batch_size=8, conf_threshold=0.4)
+        pool.start_sync()
+        # Warm every worker before timing
+        for future in [pool.submit_sync(images[0]) for _ in range(workers * 2)]:
+            future.result()
+
+        t0 = time.perf_counter()
+        futures = [pool.submit_sync(images[i % len(images)]) for i in range(num_images)]
+        for future in futures:
+            future.result()
+        throughput = num_images / (time.perf_counter() - t0)
+        pool.stop_sync()
+
+        baseline = baseline or throughput
+        print(f"[*] {workers} workers: {throughput:8.1f} img/s ({throughput / baseline:4.2f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
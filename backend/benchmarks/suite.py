@@ -0,0 +1,271 @@
+"""
+Reproducible latency/throughput benchmark for the inference and API path.
+
+Stages:
+    preprocess  YOLOv8ONNX.preprocess on synthetic images of mixed sizes
+    predict     YOLOv8ONNX.predict (preprocess + session.run + postprocess)
+    asgi        the full POST /predict/ handler through an in-process ASGI client
+    load        concurrent clients against a locally started uvicorn server
+
+Everything runs on a synthetic model and synthetic JPEGs, so no weights, dataset or
+network are needed. Results are written as JSON and can be diffed against a baseline:
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --baseline bench.json --tolerance 0.15
+
+Run from the backend directory. Exits with status 1 when a stage regresses past the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+
+NUM_CLASSES = 200
+IMAGE_SIZES = [(480, 640), (375, 500), (720, 1280), (1080, 1920)]
+STAGES = ["preprocess", "predict", "asgi", "load"]
+# Metrics compared against the baseline and which direction is worse
+COMPARED = {"p50_ms": "higher", "p95_ms": "higher", "p99_ms": "higher", "images_per_s": "lower"}
+
+
+def peak_rss_mb(pid=None) -> float:
+    """Peak resident set size of this process, or of `pid` via /proc (Linux)."""
+    if pid is None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def summarize(latencies, elapsed, rss_mb) -> dict:
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "count": int(latencies.size),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "images_per_s": latencies.size / elapsed,
+        "peak_rss_mb": rss_mb,
+    }
+
+
+def synthetic_images(count, seed=0):
+    """Smooth random BGR images in a mix of camera-like sizes, with their JPEG encodings."""
+    rng = np.random.default_rng(seed)
+    images, payloads = [], []
+    for i in range(count):
+        h, w = IMAGE_SIZES[i % len(IMAGE_SIZES)]
+        small = rng.integers(0, 255, size=(h // 16, w // 16, 3), dtype=np.uint8)
+        image = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+        images.append(image)
+        payloads.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images, payloads
+
+
+def time_calls(fn, items, warmup=3):
+    for item in items[:warmup]:
+        fn(item)
+    latencies = []
+    t0 = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - t0
+
+
+def bench_detector(model_path, images):
+    from core.inference import YOLOv8ONNX
+
+    detector = YOLOv8ONNX(model_path, [f"class_{i}" for i in range(NUM_CLASSES)])
+    results = {}
+    latencies, elapsed = time_calls(detector.preprocess, images)
+    results["preprocess"] = summarize(latencies, elapsed, peak_rss_mb())
+    latencies, elapsed = time_calls(lambda image: detector.predict(image, 0.4), images)
+    results["predict"] = summarize(latencies, elapsed, peak_rss_mb())
+    return results
+
+
+def server_env(model_path, workdir):
+    env = dict(os.environ)
+    env.update({
+        "BIRDBASE_MODEL_PATH": model_path,
+        "BIRDBASE_ORT_CACHE_DIR": os.path.join(workdir, "ort_cache"),
+        "BIRDBASE_SPECIES_CACHE": os.path.join(workdir, "species_cache.sqlite3"),
+        "BIRDBASE_OFFLINE": "1",
+        # Every request must reach the model, not the result cache
+        "BIRDBASE_RESULT_CACHE_ENTRIES": "0",
+    })
+    return env
+
+
+async def post_all(client, url, payloads, concurrency):
+    """Send every payload with `concurrency` clients; returns (latencies, elapsed)."""
+    latencies = []
+    queue = list(payloads)
+
+    async def worker():
+        while queue:
+            content = queue.pop()
+            start = time.perf_counter()
+            response = await client.post(url, files={"file": ("bird.jpg", content, "image/jpeg")},
+                                         params={"enrich": "none"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - t0
+
+
+async def bench_asgi(model_path, workdir, payloads, concurrency):
+    import httpx
+
+    # main.py reads its configuration from the environment at import time
+    os.environ.update(server_env(model_path, workdir))
+    sys.path.insert(0, os.path.join(os.getcwd(), "app"))
+    from main import app, registry
+
+    async with app.router.lifespan_context(app):
+        await registry.active_version.lifecycle.wait_ready()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await post_all(client, "/predict/", payloads[:3], 1)
+            latencies, elapsed = await post_all(client, "/predict/", payloads, concurrency)
+    return summarize(latencies, elapsed, peak_rss_mb())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench_load(model_path, workdir, payloads, concurrency, startup_timeout=60.0):
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "app", "--port", str(port), "--log-level", "warning"],
+        env=server_env(model_path, workdir),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                try:
+                    if (await client.get("/readyz")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Benchmark server failed to become ready")
+                await asyncio.sleep(0.2)
+
+            await post_all(client, "/predict/", payloads[:3], 1)
+            latencies, elapsed = await post_all(client, "/predict/", payloads, concurrency)
+        return summarize(latencies, elapsed, peak_rss_mb(server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def compare(results, baseline, tolerance):
+    """Print per-metric changes against a baseline; return the list of regressions."""
+    regressions = []
+    for stage, metrics in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        for metric, worse in COMPARED.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change > tolerance if worse == "higher" else change < -tolerance
+            flag = "  REGRESSION" if regressed else ""
+            print(f"    {stage:<10} {metric:<13} {old:10.2f} -> {new:10.2f} ({change:+.1%}){flag}")
+            if regressed:
+                regressions.append(f"{stage}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BirdBase inference/API benchmark suite")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {STAGES}")
+    parser.add_argument("--images", type=int, default=64, help="Synthetic images per stage")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients for asgi/load")
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before failing")
+    args = parser.parse_args()
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="birdbase-bench-")
+    model_path = os.path.join(workdir, "synthetic.onnx")
+    build_synthetic_yolo(model_path, num_classes=NUM_CLASSES, input_size=args.input_size)
+    images, payloads = synthetic_images(args.images)
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {"images": args.images, "concurrency": args.concurrency, "input_size": args.input_size},
+        "stages": {},
+    }
+    if "preprocess" in stages or "predict" in stages:
+        for stage, summary in bench_detector(model_path, images).items():
+            if stage in stages:
+                results["stages"][stage] = summary
+    # asgi imports the app (and its model) into this process, so it runs last
+    if "load" in stages:
+        results["stages"]["load"] = asyncio.run(bench_load(model_path, workdir, payloads, args.concurrency))
+    if "asgi" in stages:
+        results["stages"]["asgi"] = asyncio.run(bench_asgi(model_path, workdir, payloads, args.concurrency))
+
+    for stage in STAGES:
+        s = results["stages"].get(stage)
+        if s:
+            print(f"[*] {stage:<10} {s['images_per_s']:8.1f} img/s | p50 {s['p50_ms']:7.1f} ms | "
+                  f"p95 {s['p95_ms']:7.1f} ms | p99 {s['p99_ms']:7.1f} ms | peak RSS {s['peak_rss_mb']:6.0f} MB")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[*] Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print(f"[*] Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"[!] Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Build a tiny stand-in ONNX model with the same I/O contract as the exported YOLOv8:
+input [N, 3, S, S] float32, output [N, 4 + num_classes, anchors] with a dynamic batch axis.
+
+The weights are random, so it is only useful for timing and plumbing checks.
+"""
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+
+def build_synthetic_yolo(path, num_classes=200, input_size=640, dynamic_batch=True, seed=0):
+    rng = np.random.default_rng(seed)
+    channels = 4 + num_classes
+    batch_dim = "batch" if dynamic_batch else 1
+
+    nodes, inits, branches = [], [], []
+    for stride in (8, 16, 32):
+        grid = input_size // stride
+        weight = rng.normal(0, 0.5, size=(channels, 3, 1, 1)).astype(np.float32)
+        # Bias the class channels down so most anchors score well under typical thresholds
+        bias = np.concatenate([np.zeros(4), np.full(num_classes, -3.0)]).astype(np.float32)
+        inits.append(numpy_helper.from_array(weight, f"w{stride}"))
+        inits.append(numpy_helper.from_array(bias, f"b{stride}"))
+        inits.append(numpy_helper.from_array(np.array([0, channels, grid * grid], dtype=np.int64), f"shape{stride}"))
+        nodes += [
+            helper.make_node("AveragePool", ["images"], [f"pool{stride}"], kernel_shape=[stride, stride], strides=[stride, stride]),
+            helper.make_node("Conv", [f"pool{stride}", f"w{stride}", f"b{stride}"], [f"conv{stride}"]),
+            helper.make_node("Reshape", [f"conv{stride}", f"shape{stride}"], [f"flat{stride}"]),
+        ]
+        branches.append(f"flat{stride}")
+
+    nodes += [
+        helper.make_node("Concat", branches, ["concat"], axis=2),
+        helper.make_node("Sigmoid", ["concat"], ["sig"]),
+        # Scale the box channels to input pixels, leave class scores in [0, 1]
+        helper.make_node("Mul", ["sig", "scale"], ["output0"]),
+    ]
+    scale = np.ones((1, channels, 1), dtype=np.float32)
+    scale[0, :4, 0] = input_size
+    inits.append(numpy_helper.from_array(scale, "scale"))
+
+    graph = helper.make_graph(
+        nodes,
+        "synthetic_yolov8",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [batch_dim, 3, input_size, input_size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [batch_dim, channels, None])],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def build_blob_detector(path, input_size=640, cell=8, box_size=24, dynamic_batch=True):
+    """
+    A one-class stand-in detector that actually finds something: bright blobs.
+
+    Each `cell` x `cell` block of the input is one anchor whose score is high when the
+    block is mostly bright, and whose box is a `box_size` square on the block centre.
+    Like a real detector it needs a blob to cover a few model-input pixels, so objects
+    that shrink below a cell when the image is squashed to the input size are missed.
+    """
+    grid = input_size // cell
+    batch_dim = "batch" if dynamic_batch else 1
+    centres = (np.arange(grid, dtype=np.float32) + 0.5) * cell
+    cy, cx = np.meshgrid(centres, centres, indexing="ij")
+    boxes = np.stack([cx.ravel(), cy.ravel(), np.full(grid * grid, box_size), np.full(grid * grid, box_size)])
+
+    inits = [
+        numpy_helper.from_array(boxes[None].astype(np.float32), "boxes"),
+        numpy_helper.from_array(np.array([0, 1, grid * grid], dtype=np.int64), "shape"),
+        numpy_helper.from_array(np.array(0.6, dtype=np.float32), "level"),
+        numpy_helper.from_array(np.array(20.0, dtype=np.float32), "gain"),
+        numpy_helper.from_array(np.array(0.0, dtype=np.float32), "zero"),
+    ]
+    nodes = [
+        helper.make_node("AveragePool", ["images"], ["pool"], kernel_shape=[cell, cell], strides=[cell, cell]),
+        helper.make_node("ReduceMean", ["pool"], ["brightness"], axes=[1], keepdims=1),
+        helper.make_node("Sub", ["brightness", "level"], ["centred"]),
+        helper.make_node("Mul", ["centred", "gain"], ["logits"]),
+        helper.make_node("Sigmoid", ["logits"], ["grid_scores"]),
+        helper.make_node("Reshape", ["grid_scores", "shape"], ["scores"]),
+        # scores * 0 + boxes broadcasts the fixed anchor boxes to the batch size
+        helper.make_node("Mul", ["scores", "zero"], ["zeros"]),
+        helper.make_node("Add", ["zeros", "boxes"], ["batch_boxes"]),
+        helper.make_node("Concat", ["batch_boxes", "scores"], ["output0"], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "blob_detector",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [batch_dim, 3, input_size, input_size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [batch_dim, 5, grid * grid])],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+class TinyCaptioner:
+    """
+    CPU stand-in for core.cascade.Florence2Verifier with the same predict_batch contract
+    ((BGR crop, candidate names) pairs in, the chosen name per pair out).
+
+    A small conv encoder runs once per crop and a GRU decoder then steps greedily over the
+    whole batch, one token per step up to `max_new_tokens`, so its cost grows with crops x
+    caption length the way capped generation does. The weights are random; the answers are
+    not: the crop's species is the class indexed by its mean hue, and it is chosen when it
+    is a candidate. For a `generic_rate` share of crops (picked by a hash of the crop, so
+    answers are deterministic) it can't place the species and "bird" is chosen instead, as
+    it also is when the species isn't among the candidates or its caption needs more than
+    `max_new_tokens`.
+    """
+
+    model_id = "tiny-captioner"
+
+    def __init__(self, classes, generic_rate=0.5, hidden=1024, layers=2, max_new_tokens=20, seed=0):
+        import torch
+
+        torch.manual_seed(seed)
+        self.torch = torch
+        self.classes = classes
+        self.generic_rate = generic_rate
+        self.layers = layers
+        self.max_new_tokens = max_new_tokens
+        words = sorted({word for name in list(classes) + ["bird"] for word in f"a {name}".split()})
+        self.vocab = {word: i + 1 for i, word in enumerate(words)}  # 0 starts and ends a caption
+        nn = torch.nn
+        self.encoder = nn.Sequential(
+            nn.Conv2d(3, 32, 8, stride=8), nn.ReLU(),
+            nn.Conv2d(32, hidden, 4, stride=4), nn.AdaptiveAvgPool2d(1), nn.Flatten(),
+        ).eval()
+        self.embed = nn.Embedding(len(self.vocab) + 1, hidden)
+        self.decoder = nn.GRU(hidden, hidden, layers, batch_first=True).eval()
+        self.head = nn.Linear(hidden, len(self.vocab) + 1)
+
+    def species(self, crop) -> str:
+        import cv2
+
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        coloured = hsv[..., 0][(hsv[..., 1] > 60) & (hsv[..., 2] > 100)]
+        hue = float(coloured.mean()) if coloured.size else 0.0
+        return self.classes[min(len(self.classes) - 1, int(hue / 180 * len(self.classes)))]
+
+    def answer(self, crop, names) -> str:
+        import hashlib
+
+        digest = hashlib.blake2b(crop.tobytes(), digest_size=8).digest()
+        if int.from_bytes(digest, "big") / 2 ** 64 < self.generic_rate:
+            return "bird"
+        species = self.species(crop)
+        # Its caption plus the end token has to fit in the cap
+        fits = len(f"a {species}".split()) + 1 <= self.max_new_tokens
+        return species if species in names and fits else "bird"
+
+    def predict_batch(self, items: list, timings=None) -> list:
+        torch = self.torch
+        longest = max(len(f"a {name}".split()) for _, names in items for name in names)
+        with torch.inference_mode():
+            pixels = torch.from_numpy(np.stack([crop for crop, _ in items])).permute(0, 3, 1, 2).float() / 255
+            state = self.encoder(pixels).unsqueeze(0).repeat(self.layers, 1, 1).contiguous()
+            tokens = torch.zeros(len(items), 1, dtype=torch.long)
+            for _ in range(min(self.max_new_tokens, longest + 1)):
+                out, state = self.decoder(self.embed(tokens), state)
+                tokens = self.head(out).argmax(dim=-1)
+        return [self.answer(crop, names) for crop, names in items]
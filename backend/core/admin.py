@@ -0,0 +1,38 @@
+import secrets
+
+from fastapi import Header, HTTPException
+from starlette.middleware.cors import CORSMiddleware
+
+
+class AdminToken:
+    """
+    FastAPI dependency guarding the admin routes with a shared token, sent as
+    `Authorization: Bearer <token>`. With no token configured the routes are disabled.
+    """
+
+    def __init__(self, token: str):
+        self.token = token
+
+    def __call__(self, authorization: str = Header(None)):
+        if not self.token:
+            raise HTTPException(status_code=403, detail="The admin API is disabled (set BIRDBASE_ADMIN_TOKEN).")
+        scheme, _, supplied = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(supplied.encode(), self.token.encode()):
+            raise HTTPException(status_code=401, detail="Invalid or missing admin token.",
+                                headers={"WWW-Authenticate": "Bearer"})
+
+
+class PublicCORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware for the public API only. Requests under `private_prefixes` get no CORS
+    headers and no preflight answer, so browsers block cross-origin pages from calling them.
+    """
+
+    def __init__(self, app, private_prefixes=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.private_prefixes = tuple(private_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.private_prefixes):
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+
+from core.metrics import Gauge
+
+
+class Overloaded(RuntimeError):
+    """A request shed before or during inference; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, detail, status_code=503, retry_after=1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    One admitted request: its absolute deadline, whether it runs degraded, its place in line,
+    the model version it is expected to run on and how many requests were ahead on each version.
+    """
+
+    __slots__ = ("deadline", "degraded", "admitted_at", "ahead", "version", "mix")
+
+    def __init__(self, deadline, degraded, ahead, version=None, mix=None):
+        self.deadline = deadline
+        self.degraded = degraded
+        self.admitted_at = time.perf_counter()
+        self.ahead = ahead
+        self.version = version
+        self.mix = mix or {}
+
+
+class AdmissionController:
+    """
+    Bounded, deadline-aware admission in front of the detector.
+
+    At most `max_inflight` requests are admitted at once. Each request carries a
+    deadline (its own budget or `default_deadline_ms`); one whose projected wait would
+    already overrun it is rejected straight away instead of queueing for an answer
+    nobody will read, and one whose deadline passes while it waits for the model is
+    dropped from the batch queue. The projected wait is the time each request in flight
+    adds plus the new request's own, learnt from the time from admission to the model's
+    answer, so it follows the real cost of decode + batched inference on this machine.
+    Once more than `degrade_above` of the slots are taken, admitted requests are flagged
+    as degraded so the caller can take a cheaper path.
+    `headroom` is the fraction of each deadline kept back from the projection, for the
+    spread around that average and the response's trip back to the client.
+
+    The time per request is kept per model version (`slot_seconds`), since a degraded
+    model can cost a fraction of the full one while sharing the same CPU. `route(degraded)`
+    names the version a request admitted now would run on; the requests in flight count
+    at their own version's estimate and the new one at its version's (a version that
+    hasn't answered yet counts as the dearest one that has). Every answer is one equation
+    (wait = requests ahead on each version x its time, plus its own), and the estimates
+    take a normalised LMS step towards it; with a single version this is an EWMA of the
+    wait divided by the requests that were ahead.
+    """
+
+    def __init__(self, max_inflight=128, default_deadline_ms=5000.0, degrade_above=0.0, headroom=0.5,
+                 smoothing=0.05, route=None):
+        self.max_inflight = max_inflight
+        self.default_deadline_ms = default_deadline_ms
+        self.degrade_above = degrade_above
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.route = route
+
+        self.inflight = Gauge()
+        self.inflight_versions = {}
+        self.slot_seconds = {}
+        self.stats = {"admitted": 0, "rejected_full": 0, "rejected_deadline": 0, "expired": 0, "degraded": 0}
+
+    def deadline(self, budget_ms=None):
+        """Absolute perf_counter deadline for a request with `budget_ms` (or the default); None means no deadline."""
+        budget_ms = budget_ms if budget_ms is not None else self.default_deadline_ms
+        return time.perf_counter() + budget_ms / 1000.0 if budget_ms else None
+
+    def projected_wait(self, degraded=False, version=None) -> float:
+        """Wait projected for a request admitted now on `version` (by default, the one it is routed to)."""
+        if version is None and self.route is not None:
+            version = self.route(degraded)
+        ahead = sum(count * self.slot(name) for name, count in self.inflight_versions.items())
+        return ahead + self.slot(version)
+
+    def slot(self, version) -> float:
+        """Estimated time a request on `version` adds; the dearest known estimate until it has answered."""
+        if version in self.slot_seconds:
+            return self.slot_seconds[version]
+        return max(self.slot_seconds.values(), default=0.0)
+
+    @property
+    def pressure(self) -> float:
+        return self.inflight.value / self.max_inflight if self.max_inflight else 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degrade_above) and self.pressure >= self.degrade_above
+
+    @contextmanager
+    def admit(self, deadline=None):
+        """
+        Hold a slot for one request and yield its Ticket.
+        Raises Overloaded (503) when every slot is taken or the deadline can't be met.
+        """
+        if self.inflight.value >= self.max_inflight:
+            self.stats["rejected_full"] += 1
+            raise Overloaded(f"Server is at capacity ({self.max_inflight} requests in flight).")
+        degraded = self.degraded
+        version = self.route(degraded) if self.route is not None else None
+        projected = self.projected_wait(degraded, version)
+        now = time.perf_counter()
+        if deadline is not None and projected > (deadline - now) * (1 - self.headroom):
+            self.stats["rejected_deadline"] += 1
+            raise Overloaded(f"Projected wait of {projected * 1000:.0f} ms exceeds the request deadline.",
+                             retry_after=max(1, round(projected)))
+        ticket = Ticket(deadline, degraded, self.inflight.value, version, dict(self.inflight_versions))
+        self.inflight.inc()
+        self.inflight_versions[version] = self.inflight_versions.get(version, 0) + 1
+        self.stats["admitted"] += 1
+        self.stats["degraded"] += ticket.degraded
+        try:
+            yield ticket
+        finally:
+            self.inflight.dec()
+            self.inflight_versions[version] -= 1
+            if not self.inflight_versions[version]:
+                del self.inflight_versions[version]
+
+    def _observe(self, ticket, version):
+        waited = time.perf_counter() - ticket.admitted_at
+        counts = dict(ticket.mix)
+        counts[version] = counts.get(version, 0) + 1
+        if version not in self.slot_seconds:
+            self.slot_seconds[version] = waited / (ticket.ahead + 1)
+            return
+        error = waited - sum(count * self.slot(name) for name, count in counts.items())
+        norm = sum(count * count for count in counts.values())
+        for name, count in counts.items():
+            if name in self.slot_seconds:
+                self.slot_seconds[name] = max(0.0, self.slot_seconds[name] + self.smoothing * error * count / norm)
+
+    async def within(self, awaitable, ticket=None, version=None):
+        """
+        Await the model's answer for an admitted request, giving up with Overloaded (504)
+        once its deadline passes; the cancellation takes a request still waiting for a
+        batch out of the queue. Either way the wait feeds the projected-wait estimates;
+        `version` is the model version the request ran on (by default the one it was routed to).
+        """
+        if ticket is None:
+            return await awaitable
+        try:
+            if ticket.deadline is None:
+                return await awaitable
+            remaining = ticket.deadline - time.perf_counter()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            self.stats["expired"] += 1
+            raise Overloaded("Request deadline passed before inference finished.", status_code=504) from None
+        finally:
+            self._observe(ticket, version if version is not None else ticket.version)
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            inflight=self.inflight.value,
+            max_inflight=self.max_inflight,
+            pressure=self.pressure,
+            degraded_now=self.degraded,
+            slot_ms={str(version): seconds * 1000 for version, seconds in self.slot_seconds.items()},
+            projected_wait_ms=self.projected_wait(self.degraded) * 1000,
+            default_deadline_ms=self.default_deadline_ms,
+            degrade_above=self.degrade_above,
+        )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that admits requests to `paths` through an AdmissionController as they
+    arrive, before the body is read or parsed, so a shed request costs almost nothing.
+
+    The client's budget comes from the `X-Request-Deadline-Ms` header and is counted from
+    arrival. Admitted requests find their deadline, degraded flag and queue position in
+    `request.state.admission` (a Ticket); the slot is held until the response has been sent.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") not in self.paths:
+            return await self.app(scope, receive, send)
+
+        budget_ms = None
+        header = dict(scope["headers"]).get(b"x-request-deadline-ms")
+        if header is not None:
+            try:
+                budget_ms = float(header)
+            except ValueError:
+                pass
+        deadline = self.controller.deadline(budget_ms if budget_ms and budget_ms > 0 else None)
+
+        admitted = False
+        try:
+            with self.controller.admit(deadline) as ticket:
+                admitted = True
+                scope["state"] = dict(scope.get("state") or {}, admission=ticket)
+                await self.app(scope, receive, send)
+        except Overloaded as e:
+            if admitted:
+                raise
+            await self._reject(send, e)
+
+    @staticmethod
+    async def _reject(send, error: Overloaded):
+        body = json.dumps({"detail": str(error)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(error.retry_after).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
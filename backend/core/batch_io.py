@@ -0,0 +1,97 @@
+import os
+import tarfile
+import zipfile
+import zlib
+
+from core.ingest import probe_dimensions
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+ZIP_TYPES = {"application/zip", "application/x-zip-compressed"}
+TAR_TYPES = {"application/x-tar", "application/gzip", "application/x-gzip", "application/x-gtar"}
+# Enough of an image to find its dimensions in the header without reading the rest
+HEADER_BYTES = 64 * 1024
+# A truncated or corrupt archive can fail in the container or in the decompressor underneath
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error, OSError)
+
+
+def is_archive(filename: str, content_type: str) -> bool:
+    name = (filename or "").lower()
+    return (
+        content_type in ZIP_TYPES or content_type in TAR_TYPES
+        or name.endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+    )
+
+
+def _is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _too_large(size, max_bytes):
+    if max_bytes and size > max_bytes:
+        return f"Image is {size / 1024 / 1024:.1f} MB, over the {max_bytes / 1024 / 1024:.0f} MB limit."
+    return None
+
+
+def _read_member(name, size, open_member, max_bytes, max_pixels):
+    """
+    (name, bytes, None) for one archive member, or (name, None, reason) when its uncompressed
+    size or the pixel count in its header is over the limits; either is checked before the
+    member is decompressed in full, so a small archive can't expand into a huge read.
+    """
+    error = _too_large(size, max_bytes)
+    if error:
+        return name, None, error
+    with open_member() as f:
+        content = f.read(HEADER_BYTES)
+        dimensions = probe_dimensions(content)
+        if dimensions is not None and max_pixels and dimensions[0] * dimensions[1] > max_pixels:
+            return name, None, (f"Image is {dimensions[0]}x{dimensions[1]}, "
+                                f"over the {max_pixels / 1e6:.0f} MP limit.")
+        # Both formats stop at the member's declared size, so this is bounded by the check above
+        content += f.read()
+    return name, content, None
+
+
+def iter_archive(fileobj, filename: str, max_bytes=None, max_pixels=None):
+    """
+    Yield (member name, bytes, error) for every image inside a zip or (compressed) tar archive,
+    one at a time. Members over `max_bytes` uncompressed or `max_pixels` come back with no bytes
+    and the reason in `error`.
+    """
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image_name(info.filename):
+                    yield _read_member(info.filename, info.file_size, lambda: archive.open(info), max_bytes, max_pixels)
+        return
+
+    fileobj.seek(0)
+    # Stream mode reads members sequentially without seeking back through the archive
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and _is_image_name(member.name):
+                yield _read_member(member.name, member.size, lambda: archive.extractfile(member), max_bytes, max_pixels)
+
+
+def iter_uploads(uploads, max_bytes=None, max_pixels=None):
+    """
+    Flatten a list of FastAPI UploadFiles into (name, bytes, error) triples.
+    Plain image uploads yield themselves, archives yield each image they contain,
+    and an image over `max_bytes` or `max_pixels` or an unreadable (e.g. truncated)
+    archive yields no bytes and the reason. Reads are blocking, so iterate this
+    from a worker thread.
+    """
+    for upload in uploads:
+        if is_archive(upload.filename, upload.content_type):
+            try:
+                yield from iter_archive(upload.file, upload.filename, max_bytes, max_pixels)
+            except ARCHIVE_ERRORS:
+                yield upload.filename, None, "Unreadable archive."
+        else:
+            error = _too_large(upload.size or 0, max_bytes)
+            if error:
+                yield upload.filename, None, error
+                continue
+            upload.file.seek(0)
+            yield upload.filename, upload.file.read(), None
@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.metrics import Histogram
+
+
+class BatchScheduler:
+    """
+    Collects concurrent predict requests into micro-batches for a YOLOv8ONNX detector.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images or the oldest
+    request has waited `max_wait_ms`. Inference runs in a dedicated worker thread so
+    the event loop stays free, and each caller gets back only its own detections.
+    """
+
+    def __init__(self, detector, max_batch_size=16, max_wait_ms=5.0, **predict_kwargs):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.predict_kwargs = predict_kwargs
+
+        self._pending = collections.deque()
+        self._wakeup = None
+        self._task = None
+        self._executor = None
+
+        self.queue_depth = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64])
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-infer")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while self._pending:
+            _, future, _, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(RuntimeError("Batch scheduler stopped"))
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, image, timings=None):
+        """
+        Queue one decoded BGR image and wait for its detections.
+        If `timings` is a dict, the time spent queued and the batch's stage durations are added to it.
+        """
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue_depth.observe(len(self._pending))
+        self._pending.append((image, future, timings, time.perf_counter()))
+        self._wakeup.set()
+        return await future
+
+    async def submit_tiled(self, image, timings=None):
+        """
+        Run tiled detection on one large image. Its tiles already form a batch, so it
+        skips the queue but runs on the same inference thread as the batches.
+        """
+        if self._task is None:
+            await self.start()
+        call = functools.partial(self.detector.predict_tiled, image, timings=timings, **self.predict_kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth_now": len(self._pending),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        deadline = loop.time() + self.max_wait
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        batch = []
+        while self._pending and len(batch) < self.max_batch_size:
+            item = self._pending.popleft()
+            # Callers that disconnected while queued don't need a result
+            if not item[1].cancelled():
+                batch.append(item)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batch_size.observe(len(batch))
+
+            images = [item[0] for item in batch]
+            # Only time the batch when at least one caller asked for timings
+            batch_timings = {} if any(item[2] is not None for item in batch) else None
+            dispatched = time.perf_counter()
+            call = functools.partial(self.detector.predict_batch, images, timings=batch_timings, **self.predict_kwargs)
+            try:
+                results = await loop.run_in_executor(self._executor, call)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, timings, queued_at), detections in zip(batch, results):
+                if timings is not None:
+                    timings["queue"] = timings.get("queue", 0.0) + dispatched - queued_at
+                    timings.update(batch_timings)
+                if not future.done():
+                    future.set_result(detections)
@@ -0,0 +1,275 @@
+import asyncio
+import collections
+import hashlib
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from core.batching import BatchScheduler
+from core.metrics import LATENCY_BUCKETS, Histogram, add_timing
+
+
+# The "none of these" answer every crop is also offered, so a crop the verifier can't
+# place gets the generic caption instead of the least bad species
+GENERIC = "bird"
+
+
+def caption_constraint(captions: list, start_ids, eos_id):
+    """
+    A prefix_allowed_tokens_fn for Hugging Face generate that only lets batch item i spell
+    out one of the token sequences in captions[i] and then end it with `eos_id`. Leading
+    decoder start/BOS tokens (`start_ids`) are skipped, and BOS is still allowed before the
+    caption so a forced BOS step isn't masked out.
+    """
+    start_ids = set(start_ids)
+    bos_ids = [t for t in start_ids if t != eos_id]
+    tries = []
+    for options in captions:
+        root = {}
+        for tokens in options:
+            node = root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[None] = {}  # a caption ends here
+        tries.append(root)
+
+    def allowed(batch_id, input_ids):
+        ids = input_ids.tolist()
+        start = 0
+        while start < len(ids) and ids[start] in start_ids:
+            start += 1
+        node = tries[batch_id]
+        for token in ids[start:]:
+            node = node.get(token)
+            if node is None:
+                return [eos_id]
+        tokens = [t for t in node if t is not None] + ([eos_id] if None in node else [])
+        if start == len(ids) and not any(t in bos_ids for t in ids):
+            tokens += bos_ids
+        return tokens or [eos_id]
+    return allowed
+
+
+class Florence2Verifier:
+    """
+    Florence-2 as a second opinion on detector crops (needs torch and transformers).
+
+    Free captioning rarely names a CUB species, so generation is constrained: under the
+    `task` prompt the decoder may only write one of the crop's candidate captions
+    ("A Blue Jay.", ..., "A bird."), chosen greedily token by token and capped at
+    `max_new_tokens`. Only the public processor and generate API is used, so the crops of
+    a batch share one generate call. Exposes the predict_batch interface BatchScheduler
+    expects: (BGR crop, candidate names) pairs in, the chosen name per pair out (GENERIC
+    if no caption was finished within the cap).
+
+    A hub checkpoint runs its repository's own modelling code, so it is only loaded at a
+    pinned `revision`; a local directory is loaded as it is.
+    """
+
+    def __init__(self, model_id="microsoft/Florence-2-base", revision=None, task="<CAPTION>", caption="A {}.",
+                 max_new_tokens=20, device=None):
+        if not revision and not os.path.isdir(model_id):
+            raise ValueError(f"{model_id} is not pinned; set BIRDBASE_CASCADE_REVISION to a commit of the model repo")
+        import torch
+        from transformers import AutoModelForCausalLM, AutoProcessor
+
+        self.model_id = f"{model_id}@{revision}" if revision else model_id
+        self.task = task
+        self.caption = caption
+        self.max_new_tokens = max_new_tokens
+        self.device = device or ("cuda:0" if torch.cuda.is_available() else "cpu")
+        self.torch_dtype = torch.float16 if self.device.startswith("cuda") else torch.float32
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_id, revision=revision, torch_dtype=self.torch_dtype, trust_remote_code=True
+        ).to(self.device).eval()
+        self.processor = AutoProcessor.from_pretrained(model_id, revision=revision, trust_remote_code=True)
+        tokenizer = self.processor.tokenizer
+        decoder_start = getattr(self.model.generation_config, "decoder_start_token_id", None)
+        self._start_ids = {t for t in (decoder_start, tokenizer.bos_token_id, tokenizer.eos_token_id) if t is not None}
+        self._eos_id = tokenizer.eos_token_id
+        self._torch = torch
+
+    def predict_batch(self, items: list, timings=None) -> list:
+        tokenizer = self.processor.tokenizer
+        # Crops are BGR like every other image in the backend
+        images = [np.ascontiguousarray(crop[:, :, ::-1]) for crop, _ in items]
+        captions = [{self.caption.format(name): name for name in names} for _, names in items]
+        allowed = caption_constraint(
+            [[tokenizer(text, add_special_tokens=False)["input_ids"] for text in options] for options in captions],
+            self._start_ids, self._eos_id,
+        )
+        inputs = self.processor(text=[self.task] * len(images), images=images, return_tensors="pt")
+        with self._torch.inference_mode():
+            generated = self.model.generate(
+                input_ids=inputs["input_ids"].to(self.device),
+                pixel_values=inputs["pixel_values"].to(self.device, self.torch_dtype),
+                max_new_tokens=self.max_new_tokens,
+                num_beams=1,
+                do_sample=False,
+                prefix_allowed_tokens_fn=allowed,
+            )
+        texts = self.processor.batch_decode(generated, skip_special_tokens=True)
+        return [options.get(text.strip(), GENERIC) for options, text in zip(captions, texts)]
+
+
+class CropCascade:
+    """
+    Confidence-gated second stage: detections under `threshold` are cropped and verified.
+
+    The verifier is loaded in the background by `load_model` and runs behind its own
+    BatchScheduler, so crops from concurrent requests share one batched generate call.
+    It picks for each crop between the detection's "candidates" (the detector's top-k
+    classes, or just its class) and the generic "bird"; answers are cached by a hash of
+    the resized crop and the candidates. When a species wins, the detection is verified
+    and takes that class, with the detector's label kept in "detector_class"; when the
+    generic caption wins it stays as it was, unverified. Until a model is loaded (or if
+    it fails to load) detections pass through unchanged.
+    """
+
+    def __init__(self, load_model=None, threshold=0.6, max_batch_size=8, max_wait_ms=10.0, crop_size=384,
+                 padding=0.1, cache_entries=4096):
+        self.load_model = load_model
+        self.threshold = threshold
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.crop_size = crop_size
+        self.padding = padding
+        self.cache_entries = cache_entries
+
+        self.state = "disabled" if load_model is None else "starting"
+        self.error = None
+        self.model = None
+        self.model_id = None
+        self.scheduler = None
+        self._task = None
+        self._cache = collections.OrderedDict()  # (crop hash, candidates) -> winning name
+        self._lock = threading.Lock()
+
+        self.added_latency = Histogram(LATENCY_BUCKETS)
+        self.stats = {"requests": 0, "escalated_requests": 0, "crops": 0, "cache_hits": 0, "verified": 0,
+                      "relabelled": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.state == "ready"
+
+    async def start(self):
+        """Begin loading the verifier in the background; returns immediately."""
+        if self.load_model is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.scheduler is not None:
+            await self.scheduler.stop()
+
+    async def _run(self):
+        try:
+            self.state = "loading"
+            self.model = await asyncio.to_thread(self.load_model)
+            self.model_id = getattr(self.model, "model_id", type(self.model).__name__)
+            self.scheduler = BatchScheduler(self.model, max_batch_size=self.max_batch_size, max_wait_ms=self.max_wait_ms)
+            await self.scheduler.start()
+            self.state = "ready"
+            print(f"[*] Cascade verifier ready ({self.model_id}, below {self.threshold:.2f} confidence)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"[!] Warning: Cascade verifier failed to load, detections are not verified. ({e})")
+
+    def crop(self, image: np.ndarray, bbox) -> np.ndarray:
+        """Padded crop around an [x_min, y_min, w, h] box, resized to crop_size x crop_size."""
+        img_h, img_w = image.shape[:2]
+        x, y, w, h = bbox
+        pad_x, pad_y = w * self.padding, h * self.padding
+        x0, y0 = max(0, int(x - pad_x)), max(0, int(y - pad_y))
+        x1, y1 = min(img_w, int(np.ceil(x + w + pad_x))), min(img_h, int(np.ceil(y + h + pad_y)))
+        region = image[y0:max(y1, y0 + 1), x0:max(x1, x0 + 1)]
+        return cv2.resize(region, (self.crop_size, self.crop_size), interpolation=cv2.INTER_AREA)
+
+    def _cache_get(self, key):
+        with self._lock:
+            answer = self._cache.get(key)
+            if answer is not None:
+                self._cache.move_to_end(key)
+            return answer
+
+    def _cache_put(self, key, answer):
+        with self._lock:
+            self._cache[key] = answer
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    async def _choose(self, crop: np.ndarray, candidates: tuple) -> str:
+        """The verifier's pick of `candidates` and GENERIC for this crop."""
+        names = candidates + (GENERIC,)
+        key = (hashlib.blake2b(crop.tobytes(), digest_size=16).hexdigest(), candidates)
+        answer = self._cache_get(key)
+        if answer is not None:
+            self.stats["cache_hits"] += 1
+            return answer
+        answer = await self.scheduler.submit((crop, names))
+        if answer not in names:
+            answer = GENERIC
+        self._cache_put(key, answer)
+        return answer
+
+    async def verify(self, image: np.ndarray, detections: list, timings=None) -> list:
+        """
+        Return `detections` with every one under the threshold checked by the verifier.
+        Boxes must be in `image` pixels. Escalated detections gain "verified" and "verifier_class"
+        (the winning species, or None when the generic caption won).
+        """
+        if not self.enabled:
+            return detections
+        self.stats["requests"] += 1
+        escalate = [i for i, d in enumerate(detections) if d["confidence"] < self.threshold]
+        if not escalate:
+            return detections
+
+        started = time.perf_counter()
+        self.stats["escalated_requests"] += 1
+        self.stats["crops"] += len(escalate)
+        crops = [self.crop(image, detections[i]["bbox"]) for i in escalate]
+        answers = await asyncio.gather(*[
+            self._choose(crop, tuple(detections[i].get("candidates") or [detections[i]["class"]]))
+            for i, crop in zip(escalate, crops)
+        ])
+
+        detections = list(detections)
+        for i, answer in zip(escalate, answers):
+            species = None if answer == GENERIC else answer
+            det = dict(detections[i], verified=species is not None, verifier_class=species)
+            self.stats["verified"] += species is not None
+            if species is not None and species != det["class"]:
+                det["detector_class"] = det["class"]
+                det["class"] = species
+                self.stats["relabelled"] += 1
+            detections[i] = det
+        self.added_latency.observe(time.perf_counter() - started)
+        add_timing(timings, "verify", started)
+        return detections
+
+    def snapshot(self) -> dict:
+        requests = self.stats["requests"]
+        return dict(
+            self.stats,
+            state=self.state,
+            error=self.error,
+            model=self.model_id,
+            threshold=self.threshold,
+            escalated_fraction=self.stats["escalated_requests"] / requests if requests else 0.0,
+            cache_entries=len(self._cache),
+            added_latency_seconds=self.added_latency.snapshot(),
+            batch_size=self.scheduler.stats()["batch_size"] if self.scheduler is not None else None,
+        )
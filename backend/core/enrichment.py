@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+
+from core import species_info
+from core.species_info import cache_response, normalize_name, parse_summary, summary_url
+
+
+class SpeciesEnricher:
+    """
+    Non-blocking species info lookups for the async API handlers.
+
+    Shares one pooled httpx.AsyncClient, coalesces concurrent lookups of the same
+    species into a single in-flight fetch, and lets each caller bound how long it
+    is willing to wait. A fetch that outlives its caller's deadline keeps running
+    and still fills the species cache for the next request.
+    """
+
+    def __init__(self, max_connections=20, timeout=5.0):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client = None
+        self._inflight = {}
+        self.stats = {"coalesced": 0, "fetches": 0, "deadline_misses": 0}
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, species_name: str, deadline: float = None):
+        """
+        Return the species info dict, or None if it is not ready within `deadline` seconds.
+        Without a deadline the call waits for the fetch (bounded by the HTTP timeout).
+        """
+        key = normalize_name(species_name)
+        cached, fresh = species_info.cache.get(key, disk=False)
+        if cached is None:
+            # Not in memory: the SQLite read can wait on a commit, so keep it off the event loop
+            cached, fresh = await asyncio.to_thread(species_info.cache.get, key)
+        if fresh:
+            return dict(cached, name=species_name)
+        if species_info.OFFLINE:
+            return dict(cached, name=species_name) if cached is not None else species_info._unavailable(species_name)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(species_name, key, cached))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        try:
+            # shield: a caller giving up must not cancel the fetch other callers share
+            info = await asyncio.wait_for(asyncio.shield(task), deadline)
+        except asyncio.TimeoutError:
+            self.stats["deadline_misses"] += 1
+            return None
+        return dict(info, name=species_name)
+
+    async def _fetch(self, species_name, key, cached):
+        self.stats["fetches"] += 1
+        species_info.cache.record("fetches")
+        try:
+            response = await self._http().get(summary_url(species_name))
+            data = response.json() if response.status_code == 200 else {}
+            info = parse_summary(species_name, response.status_code, data)
+        except Exception as e:
+            info = {"error": str(e), "name": species_name}
+        if "error" in info:
+            if cached is not None:
+                # Network trouble or Wikipedia refusing (e.g. 429): an old snapshot is better than nothing
+                species_info.cache.record("stale_hits")
+                return cached
+            return info
+
+        # The SQLite write can fsync, keep it off the event loop
+        await asyncio.to_thread(cache_response, key, info, response.status_code)
+        return info
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, inflight=len(self._inflight))
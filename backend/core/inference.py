@@ -1,81 +1,372 @@
+import math
+import os
+import threading
+import time
+from typing import NamedTuple
+
 import cv2
 import numpy as np
-import onnxruntime as ort
+
+from core.metrics import add_timing
+from core.model_loader import create_session, load_session_config
+
+# Tiled inference: fraction of overlap between neighbouring tiles and the most views one image may use
+TILE_OVERLAP = float(os.environ.get("BIRDBASE_TILE_OVERLAP", "0.2"))
+MAX_TILES = int(os.environ.get("BIRDBASE_MAX_TILES", "16"))
+
+
+class Letterbox(NamedTuple):
+    """How an original image was placed inside the square model input."""
+    scale: float
+    pad_x: int
+    pad_y: int
+    height: int
+    width: int
+
+
+class LetterboxPreprocessor:
+    """
+    Letterboxes BGR images into reusable float32 NCHW buffers.
+
+    Each thread owns a uint8 canvas and a batch tensor that are allocated once and
+    grown only when a larger batch is requested, so steady-state preprocessing does
+    not allocate. The resize writes straight into the canvas, and BGR->RGB, the
+    HWC->CHW layout change and the /255 scaling happen in one pass per channel.
+    """
+
+    def __init__(self, input_size: int = 640, pad_value: int = 114):
+        self.input_size = input_size
+        self.pad_value = pad_value
+        self._local = threading.local()
+
+    def _canvas(self) -> np.ndarray:
+        canvas = getattr(self._local, "canvas", None)
+        if canvas is None:
+            canvas = np.empty((self.input_size, self.input_size, 3), dtype=np.uint8)
+            self._local.canvas = canvas
+        return canvas
+
+    def batch_buffer(self, batch_size: int) -> np.ndarray:
+        """Return this thread's [batch_size, 3, S, S] float32 tensor (a view, reused across calls)."""
+        buffer = getattr(self._local, "batch", None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = np.empty((batch_size, 3, self.input_size, self.input_size), dtype=np.float32)
+            self._local.batch = buffer
+        return buffer[:batch_size]
+
+    def letterbox_into(self, image: np.ndarray, out: np.ndarray) -> Letterbox:
+        """Letterbox `image` into the [3, S, S] float32 array `out` and return the placement."""
+        size = self.input_size
+        img_h, img_w = image.shape[:2]
+        scale = min(size / img_h, size / img_w)
+        new_w = min(size, int(round(img_w * scale)))
+        new_h = min(size, int(round(img_h * scale)))
+        pad_x = (size - new_w) // 2
+        pad_y = (size - new_h) // 2
+
+        canvas = self._canvas()
+        canvas[:pad_y] = self.pad_value
+        canvas[pad_y + new_h:] = self.pad_value
+        canvas[pad_y:pad_y + new_h, :pad_x] = self.pad_value
+        canvas[pad_y:pad_y + new_h, pad_x + new_w:] = self.pad_value
+        roi = canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        if (new_h, new_w) == (img_h, img_w):
+            roi[...] = image
+        else:
+            cv2.resize(image, (new_w, new_h), dst=roi, interpolation=cv2.INTER_LINEAR)
+
+        # OpenCV loads in BGR, YOLOv8 expects RGB: channel c of the tensor is canvas channel 2 - c
+        inv = np.float32(1.0 / 255.0)
+        for c in range(3):
+            np.multiply(canvas[:, :, 2 - c], inv, out=out[c], dtype=np.float32)
+
+        return Letterbox(scale, pad_x, pad_y, img_h, img_w)
+
+
+def xywh2xyxy(boxes: np.ndarray) -> np.ndarray:
+    """Convert [xc, yc, w, h] boxes to [x1, y1, x2, y2]."""
+    out = np.empty_like(boxes)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    out[:, 0] = boxes[:, 0] - half_w
+    out[:, 1] = boxes[:, 1] - half_h
+    out[:, 2] = boxes[:, 0] + half_w
+    out[:, 3] = boxes[:, 1] + half_h
+    return out
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy Non-Maximum Suppression on [x1, y1, x2, y2] boxes.
+    Returns the indices of the kept boxes, highest score first.
+    """
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+
+        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def class_aware_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """NMS that never suppresses across classes, by shifting each class's boxes into its own region."""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    span = float(boxes.max() - boxes.min()) + 1
+    offsets = class_ids[:, None].astype(boxes.dtype) * span
+    return nms(boxes + offsets, scores, iou_threshold)
+
+
+def _tile_starts(length: int, size: int, count: int) -> list:
+    if count == 1:
+        return [0]
+    return [round(i * (length - size) / (count - 1)) for i in range(count)]
+
+
+def tile_grid(width: int, height: int, tile_size: int = 640, overlap: float = 0.2, max_tiles: int = 16,
+              include_full: bool = True) -> list:
+    """
+    Overlapping crops (x, y, w, h) covering a width x height image.
+
+    Tiles are `tile_size` pixels, i.e. native model resolution, unless that would need
+    more than `max_tiles` views; then they grow (and get downscaled into the model input)
+    until the grid fits. With `include_full` the whole image is one extra view, counted
+    toward `max_tiles`, so birds cut by tile borders are also seen whole.
+    """
+    budget = max_tiles - 1 if include_full else max_tiles
+    if budget < 1 or (width <= tile_size and height <= tile_size):
+        return [(0, 0, width, height)]
+
+    size = tile_size
+    while True:
+        step = max(1, int(size * (1 - overlap)))
+        nx = 1 if width <= size else math.ceil((width - size) / step) + 1
+        ny = 1 if height <= size else math.ceil((height - size) / step) + 1
+        if nx * ny <= budget:
+            break
+        size = int(size * 1.25)
+
+    tile_w, tile_h = min(size, width), min(size, height)
+    tiles = [
+        (x, y, tile_w, tile_h)
+        for y in _tile_starts(height, tile_h, ny)
+        for x in _tile_starts(width, tile_w, nx)
+    ]
+    if len(tiles) == 1:
+        return tiles
+    if include_full:
+        tiles.append((0, 0, width, height))
+    return tiles
+
 
 class YOLOv8ONNX:
-    def __init__(self, onnx_model_path: str, classes: list):
+    def __init__(self, onnx_model_path: str, classes: list, input_size: int = 640, intra_op_threads: int = None,
+                 session_config: dict = None):
         self.model_path = onnx_model_path
         self.classes = classes
+        self.input_size = input_size
+        self.preprocessor = LetterboxPreprocessor(input_size)
         self.session = None
         self.input_name = None
-        
+        # Set when the exported model has a static batch axis (e.g. 1); None means dynamic
+        self.fixed_batch = None
+        self.load_seconds = None
+
+        started = time.perf_counter()
         try:
             # Try loading the model if it exists
-            self.session = ort.InferenceSession(self.model_path, providers=['CPUExecutionProvider'])
+            config = dict(session_config or load_session_config())
+            if intra_op_threads:
+                config["intra_op_num_threads"] = intra_op_threads
+            self.session = create_session(self.model_path, config)
             inputs = self.session.get_inputs()
             if inputs and len(inputs) > 0:
                 self.input_name = inputs[0].name
+                if isinstance(inputs[0].shape[0], int):
+                    self.fixed_batch = inputs[0].shape[0]
+                # A model exported at a fixed resolution (e.g. a 320 px model for degraded mode) sets its own size
+                if len(inputs[0].shape) == 4 and isinstance(inputs[0].shape[2], int) and inputs[0].shape[2] != input_size:
+                    self.input_size = inputs[0].shape[2]
+                    self.preprocessor = LetterboxPreprocessor(self.input_size)
+            self.load_seconds = time.perf_counter() - started
             print(f"[*] ONNX Model loaded from: {self.model_path}")
         except Exception as e:
             print(f"[!] Warning: Could not load ONNX model. Predict will return mock data. ({e})")
-            
+
     def preprocess(self, image: np.ndarray):
-        # OpenCV loads in BGR, YOLOv8 expects RGB
-        input_img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        # Resize, normalize and transpose image to fit YOLOv8 requirements
-        input_img = cv2.resize(input_img, (640, 640))
-        input_img = input_img.transpose(2, 0, 1)  # HWC to CHW
-        input_img = np.expand_dims(input_img, axis=0) # Add batch dimension
-        input_img = input_img.astype('float32') / 255.0 # Normalize 0-1
-        return input_img
-
-    def predict(self, image: np.ndarray, conf_threshold=0.5):
+        """
+        Letterbox one image into this thread's reusable input buffer.
+        Returns the [1, 3, S, S] tensor view and its Letterbox placement; the
+        tensor is overwritten by the next preprocess call on the same thread.
+        """
+        tensor = self.preprocessor.batch_buffer(1)
+        letterbox = self.preprocessor.letterbox_into(image, tensor[0])
+        return tensor, letterbox
+
+    def postprocess(self, output: np.ndarray, letterbox: Letterbox, conf_threshold=0.5, iou_threshold=0.45, max_det=100,
+                    top_k=0):
+        """
+        Decode one raw YOLOv8 output of shape [4 + num_classes, 8400] into detections.
+
+        Thresholding, class selection and box conversion run on the whole
+        anchor matrix at once, followed by class-aware NMS. Boxes are
+        returned as [x_min, y_min, w, h] in original image coordinates.
+        With `top_k` each detection also lists its `top_k` best class names
+        as "candidates", for the cascade verifier to choose between.
+        """
+        return self.to_results(*self.decode(output, letterbox, conf_threshold, iou_threshold, max_det, top_k))
+
+    def decode(self, output: np.ndarray, letterbox: Letterbox, conf_threshold=0.5, iou_threshold=0.45, max_det=100,
+               top_k=0):
+        """
+        Array form of postprocess: returns ([n, 4] x1y1x2y2 boxes in original image
+        coordinates, [n] confidences, [n] class ids, [n, top_k] best class ids) after
+        class-aware NMS.
+        """
+        # Transpose to [8400, 4 + num_classes]
+        preds = output.T
+        class_scores = preds[:, 4:]
+
+        confidences = class_scores.max(axis=1)
+        mask = confidences >= conf_threshold
+        if not mask.any():
+            return (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64),
+                    np.zeros((0, top_k), dtype=np.int64))
+
+        preds = preds[mask]
+        confidences = confidences[mask]
+        class_scores = class_scores[mask]
+        class_ids = class_scores.argmax(axis=1)
+        boxes = xywh2xyxy(preds[:, :4])
+
+        keep = class_aware_nms(boxes, confidences, class_ids, iou_threshold)[:max_det]
+
+        # YOLOv8 boxes are relative to the letterboxed input; undo the padding and scale
+        img_h, img_w = letterbox.height, letterbox.width
+        boxes = boxes[keep]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - letterbox.pad_x) / letterbox.scale).clip(0, img_w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - letterbox.pad_y) / letterbox.scale).clip(0, img_h)
+        # Only the kept boxes are ranked; the best class is always first
+        candidates = np.argsort(-class_scores[keep], axis=1, kind="stable")[:, :top_k]
+        return boxes, confidences[keep], class_ids[keep], candidates
+
+    def _name(self, class_id) -> str:
+        return self.classes[class_id] if class_id < len(self.classes) else "Unknown"
+
+    def to_results(self, boxes, confidences, class_ids, candidates=None) -> list:
+        """Detection dicts with [x_min, y_min, w, h] boxes from the arrays returned by decode."""
+        results = []
+        for i, (box, confidence, class_id) in enumerate(zip(boxes, confidences, class_ids)):
+            x_min, y_min, x_max, y_max = box
+            result = {
+                "class": self._name(class_id),
+                "confidence": float(confidence),
+                "bbox": [float(x_min), float(y_min), float(x_max - x_min), float(y_max - y_min)]
+            }
+            if candidates is not None and candidates.shape[1]:
+                result["candidates"] = [self._name(c) for c in candidates[i]]
+            results.append(result)
+        return results
+
+    def run(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        Run the session on an [N, 3, H, W] batch and return the first output.
+        Models exported with a static batch axis are fed in chunks of that size.
+        """
+        if self.fixed_batch is None or input_tensor.shape[0] == self.fixed_batch:
+            return self.session.run(None, {self.input_name: input_tensor})[0]
+
+        outputs = []
+        for start in range(0, input_tensor.shape[0], self.fixed_batch):
+            chunk = input_tensor[start:start + self.fixed_batch]
+            size = chunk.shape[0]
+            if size < self.fixed_batch:
+                pad = np.zeros((self.fixed_batch - size,) + chunk.shape[1:], dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, pad])
+            outputs.append(self.session.run(None, {self.input_name: chunk})[0][:size])
+        return np.concatenate(outputs)
+
+    def predict_batch(self, images: list, conf_threshold=0.5, iou_threshold=0.45, max_det=100, top_k=0, timings=None):
+        """
+        Run a single batched inference over several images and return one detection list per image.
+        If `timings` is a dict, the preprocess/inference/postprocess durations of the batch are added to it.
+        """
         if self.session is None or self.input_name is None:
             # Mock return for demonstration when model file is missing
-            return [{"class": self.classes[0], "confidence": 0.95, "bbox": [100, 100, 300, 300]}]
-
-        input_tensor = self.preprocess(image)
-        outputs = self.session.run(None, {self.input_name: input_tensor})
-        
-        # Output shape is typically [1, 4 + num_classes, 8400]
-        output = outputs[0]
-        
-        # Squeeze batch dimension: [4 + num_classes, 8400]
-        output = np.squeeze(output)
-        
-        # Transpose to get [8400, 4 + num_classes] for easier iteration
-        output = output.transpose()
-        
-        results = []
-        
-        # Iterate through predictions
-        for row in output:
-            # First 4 are bounding box coords (xc, yc, w, h)
-            # Rest are class scores
-            class_scores = row[4:]
-            _, _, _, max_idx = cv2.minMaxLoc(class_scores)
-            class_id = max_idx[1]
-            confidence = class_scores[class_id]
-            
-            if confidence >= conf_threshold:
-                xc, yc, w, h = row[0], row[1], row[2], row[3]
-                
-                # Convert center to min max coords
-                x_min = xc - w / 2
-                y_min = yc - h / 2
-                
-                # YOLOv8 ONNX output is relative to the internal 640x640 size.
-                # In a full app, scale these back to the original image dimensions.
-                # We normalize them relative to 640x640 input for the API format.
-                results.append({
-                    "class": self.classes[class_id] if class_id < len(self.classes) else "Unknown",
-                    "confidence": float(confidence),
-                    "bbox": [float(x_min), float(y_min), float(w), float(h)]
-                })
-        
-        # Note: A true production implementation would apply Non-Maximum Suppression (NMS) here.
-        # But for this demo, we'll sort by confidence and return the highest confident box.
-        results.sort(key=lambda x: x["confidence"], reverse=True)
-        return [results[0]] if len(results) > 0 else []
-        
+            return [[{"class": self.classes[0], "confidence": 0.95, "bbox": [100, 100, 300, 300]}] for _ in images]
+
+        started = time.perf_counter()
+        input_tensor = self.preprocessor.batch_buffer(len(images))
+        letterboxes = [self.preprocessor.letterbox_into(image, out) for image, out in zip(images, input_tensor)]
+        add_timing(timings, "preprocess", started)
+
+        # Output shape is typically [N, 4 + num_classes, 8400]
+        started = time.perf_counter()
+        outputs = self.run(input_tensor)
+        add_timing(timings, "inference", started)
+
+        started = time.perf_counter()
+        results = [
+            self.postprocess(output, letterbox, conf_threshold, iou_threshold, max_det, top_k)
+            for output, letterbox in zip(outputs, letterboxes)
+        ]
+        add_timing(timings, "postprocess", started)
         return results
+
+    def predict_tiled(self, image: np.ndarray, conf_threshold=0.5, iou_threshold=0.45, max_det=100, top_k=0,
+                      overlap=TILE_OVERLAP, max_tiles=MAX_TILES, timings=None):
+        """
+        Detect on overlapping tiles of a large image so small, distant birds keep enough pixels.
+        All tiles run through the model as one batch; their boxes are shifted back to image
+        coordinates and merged with a class-aware NMS across tiles.
+        """
+        if self.session is None or self.input_name is None:
+            return self.predict_batch([image], conf_threshold, iou_threshold, max_det, top_k)[0]
+
+        img_h, img_w = image.shape[:2]
+        tiles = tile_grid(img_w, img_h, self.input_size, overlap, max_tiles)
+
+        started = time.perf_counter()
+        input_tensor = self.preprocessor.batch_buffer(len(tiles))
+        letterboxes = [
+            self.preprocessor.letterbox_into(image[y:y + h, x:x + w], out)
+            for (x, y, w, h), out in zip(tiles, input_tensor)
+        ]
+        add_timing(timings, "preprocess", started)
+
+        started = time.perf_counter()
+        outputs = self.run(input_tensor)
+        add_timing(timings, "inference", started)
+
+        started = time.perf_counter()
+        boxes, confidences, class_ids, candidates = [], [], [], []
+        for (x, y, _, _), output, letterbox in zip(tiles, outputs, letterboxes):
+            tile_boxes, tile_conf, tile_ids, tile_candidates = self.decode(
+                output, letterbox, conf_threshold, iou_threshold, max_det, top_k,
+            )
+            boxes.append(tile_boxes + np.array([x, y, x, y], dtype=tile_boxes.dtype))
+            confidences.append(tile_conf)
+            class_ids.append(tile_ids)
+            candidates.append(tile_candidates)
+        boxes, confidences, class_ids = np.concatenate(boxes), np.concatenate(confidences), np.concatenate(class_ids)
+        candidates = np.concatenate(candidates)
+        keep = class_aware_nms(boxes, confidences, class_ids, iou_threshold)[:max_det]
+        results = self.to_results(boxes[keep], confidences[keep], class_ids[keep], candidates[keep])
+        add_timing(timings, "postprocess", started)
+        return results
+
+    def predict(self, image: np.ndarray, conf_threshold=0.5, iou_threshold=0.45, max_det=100, top_k=0):
+        return self.predict_batch([image], conf_threshold, iou_threshold, max_det, top_k)[0]
@@ -0,0 +1,183 @@
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+# JPEG start-of-frame markers carry the image size (C4, C8 and CC are other segment types)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale, skipping most of the IDCT work and memory
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+class UploadRejected(ValueError):
+    """An upload refused before or during decoding; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, detail, status_code=413):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class DecodedImage(NamedTuple):
+    """A decoded BGR image plus the factors mapping its pixel coordinates back to the original photo."""
+    image: np.ndarray
+    scale_x: float
+    scale_y: float
+
+
+def is_jpeg(content) -> bool:
+    return content[:3] == b"\xff\xd8\xff"
+
+
+def probe_dimensions(content):
+    """Return (width, height) from a JPEG or PNG header without decoding, or None for other/broken data."""
+    if content[:8] == PNG_SIGNATURE and content[12:16] == b"IHDR":
+        return int.from_bytes(content[16:20], "big"), int.from_bytes(content[20:24], "big")
+    if not is_jpeg(content):
+        return None
+
+    i, n = 2, len(content)
+    while i + 9 < n:
+        if content[i] != 0xFF:
+            return None
+        marker = content[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length field
+            i += 2
+            continue
+        if marker in SOF_MARKERS:
+            height = int.from_bytes(content[i + 5:i + 7], "big")
+            width = int.from_bytes(content[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(content[i + 2:i + 4], "big")
+    return None
+
+
+def reduced_decode_flag(width: int, height: int, target_size: int) -> int:
+    """Largest JPEG reduction that still leaves the long side at least `target_size` pixels."""
+    for factor, flag in REDUCED_FLAGS:
+        if max(width, height) // factor >= target_size:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_upload(content: bytes, target_size: int = None, max_pixels: int = None):
+    """
+    Decode raw upload bytes into a DecodedImage, or return None if they are not a readable image.
+
+    The header is checked against `max_pixels` before any pixels are decoded. JPEGs larger
+    than needed for a `target_size` model input are decoded at reduced resolution, so decode
+    time and memory follow the model size rather than the photo size.
+    Raises UploadRejected when the image is too large.
+    """
+    # OpenCV raises on an empty buffer rather than returning None
+    if not content:
+        return None
+    size = probe_dimensions(content)
+    if size is not None and max_pixels and size[0] * size[1] > max_pixels:
+        raise UploadRejected(f"Image is {size[0]}x{size[1]}, over the {max_pixels / 1e6:.0f} MP limit.")
+
+    flag = cv2.IMREAD_COLOR
+    if size is not None and target_size and is_jpeg(content):
+        flag = reduced_decode_flag(size[0], size[1], target_size)
+
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), flag)
+    if image is None:
+        return None
+    img_h, img_w = image.shape[:2]
+    if size is None:
+        if max_pixels and img_w * img_h > max_pixels:
+            raise UploadRejected(f"Image is {img_w}x{img_h}, over the {max_pixels / 1e6:.0f} MP limit.")
+        return DecodedImage(image, 1.0, 1.0)
+
+    width, height = size
+    # EXIF rotation is applied during decode, so the header size may be transposed
+    if (img_w > img_h) != (width > height):
+        width, height = height, width
+    return DecodedImage(image, width / img_w, height / img_h)
+
+
+def resize_factors(content, original_width: int, original_height: int):
+    """
+    (scale_x, scale_y) from a client-downscaled upload's pixels back to the photo it was made from,
+    or None if the upload isn't a readable image. The upload's size is read from its header when possible.
+    """
+    if not content:
+        return None
+    size = probe_dimensions(content)
+    if size is None:
+        image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        size = image.shape[1], image.shape[0]
+    width, height = size
+    # As in decode_upload: boxes follow the EXIF-rotated image, the header doesn't
+    if (width > height) != (original_width > original_height):
+        width, height = height, width
+    return original_width / width, original_height / height
+
+
+def scale_detections(detections, scale_x: float, scale_y: float):
+    """Map [x_min, y_min, w, h] boxes from decoded-image pixels back to the original photo."""
+    if scale_x == 1.0 and scale_y == 1.0:
+        return detections
+    return [
+        dict(d, bbox=[d["bbox"][0] * scale_x, d["bbox"][1] * scale_y, d["bbox"][2] * scale_x, d["bbox"][3] * scale_y])
+        for d in detections
+    ]
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that caps request body size per path while the body streams in.
+
+    Requests announcing a larger Content-Length are refused immediately; chunked or
+    mislabelled bodies are cut off as soon as they cross the limit, before the
+    multipart parser spools them. Either way the client gets a 413.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    await self._reject(send, limit)
+                    # Looks like a disconnect to the app, which then abandons the request
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    @staticmethod
+    async def _reject(send, limit):
+        body = f'{{"detail":"Upload exceeds the {limit / (1024 * 1024):.0f} MB limit."}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
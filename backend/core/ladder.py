@@ -0,0 +1,101 @@
+import json
+import os
+from typing import NamedTuple, Optional
+
+
+class Rung(NamedTuple):
+    """One model of the ladder: its input size, file, the registry version serving it, and what it costs."""
+
+    size: int
+    path: str
+    version: Optional[str]
+    latency_ms: dict
+    map50_95: Optional[float]
+    top1: Optional[float]
+
+
+class ModelLadder:
+    """
+    The same detector exported at several input sizes, and the policy picking one per request.
+
+    ai_model/scripts/export.py writes the models with a ladder.json manifest holding each
+    one's measured CPU latency and val accuracy. Every factor can only step a request
+    down from the largest rung:
+        image size   the smallest rung that covers the image's long side, since a larger
+                     input only upsamples pixels that aren't there
+        client hint  the largest rung no bigger than the `input_size` the client asked for
+        server load  one rung down for each `step_down_above` admission pressure crossed,
+                     and the smallest rung for degraded requests
+    Rungs whose `version` is None are the server's main model and go through the registry's
+    normal routing (so hot-swaps and A/B splits still apply to full-size traffic).
+    """
+
+    def __init__(self, rungs, step_down_above=(0.5, 0.75)):
+        if not rungs:
+            raise ValueError("A model ladder needs at least one rung")
+        self.rungs = sorted(rungs, key=lambda rung: rung.size)
+        self.step_down_above = sorted(step_down_above)
+        self.picks = {rung.size: 0 for rung in self.rungs}
+
+    @classmethod
+    def from_manifest(cls, manifest_path, main_model_path=None, quantized=False, **kwargs):
+        """
+        Read ladder.json; rung paths are relative to it. With `quantized` the INT8 copy of each
+        rung is served where the export wrote one. The rung at `main_model_path` is the main model.
+        """
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        base = os.path.dirname(os.path.abspath(manifest_path))
+        main = os.path.abspath(main_model_path) if main_model_path else None
+        rungs = []
+        for entry in manifest["rungs"]:
+            name = entry.get("int8_path") if quantized else None
+            path = os.path.join(base, name or entry["path"])
+            size = int(entry["size"])
+            rungs.append(Rung(
+                size=size,
+                path=path,
+                version=None if os.path.abspath(path) == main else f"ladder-{size}",
+                latency_ms=entry.get("int8_latency_ms" if name else "latency_ms") or {},
+                map50_95=entry.get("map50_95"),
+                top1=entry.get("top1"),
+            ))
+        return cls(rungs, **kwargs)
+
+    @property
+    def sizes(self) -> list:
+        return [rung.size for rung in self.rungs]
+
+    def pick(self, image_size=None, hint=None, pressure=0.0, degraded=False, available=None) -> Rung:
+        """
+        The rung for one request. `image_size` is the upload's long side, `hint` the client's
+        requested input size and `pressure` the admission controller's. `available(rung)` says
+        whether a rung can serve right now; the nearest available one is used otherwise.
+        """
+        top = len(self.rungs) - 1
+        index = top
+        if image_size:
+            index = next((i for i, rung in enumerate(self.rungs) if rung.size >= image_size), top)
+        if hint:
+            index = min(index, max(0, sum(rung.size <= hint for rung in self.rungs) - 1))
+        if degraded:
+            index = 0
+        index = max(0, index - sum(pressure >= threshold for threshold in self.step_down_above))
+
+        if available is not None:
+            # Prefer a smaller rung over a larger one when the chosen one isn't loaded yet
+            order = sorted(range(len(self.rungs)), key=lambda i: (abs(i - index), i > index))
+            index = next((i for i in order if available(self.rungs[i])), top)
+        rung = self.rungs[index]
+        self.picks[rung.size] += 1
+        return rung
+
+    def snapshot(self) -> dict:
+        return {
+            "step_down_above": self.step_down_above,
+            "rungs": [
+                {"size": rung.size, "version": rung.version, "path": rung.path, "latency_ms": rung.latency_ms,
+                 "map50_95": rung.map50_95, "top1": rung.top1, "picks": self.picks[rung.size]}
+                for rung in self.rungs
+            ],
+        }
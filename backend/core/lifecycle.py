@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import numpy as np
+
+from core.batching import BatchScheduler
+from core.inference import YOLOv8ONNX
+from core.model_loader import model_version
+from core.worker_pool import InferenceWorkerPool
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+class ModelLifecycle:
+    """
+    Loads the detector in the background after the server has bound, then warms it up.
+
+    State moves starting -> loading -> warming -> ready, or to failed. Warmup pushes
+    dummy frames through the real scheduler at each configured batch size and repeats
+    a batch size until two consecutive rounds are within `warmup_tolerance` of each
+    other, so ONNX Runtime's first-run allocations and kernel selection are paid
+    before the instance reports ready. A model that fell back to mock mode loads
+    but is only reported ready when `allow_mock` is set.
+    """
+
+    def __init__(self, model_path, load_classes, input_size=640, inference_workers=0, intra_op_threads=0,
+                 max_batch_size=16, max_wait_ms=5.0, warmup_batch_sizes=(1,), warmup_max_rounds=10, warmup_tolerance=0.1,
+                 allow_mock=False, **predict_kwargs):
+        self.model_path = model_path
+        self.load_classes = load_classes
+        self.input_size = input_size
+        self.inference_workers = inference_workers
+        self.intra_op_threads = intra_op_threads
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.warmup_batch_sizes = [min(size, max_batch_size) for size in warmup_batch_sizes]
+        self.warmup_max_rounds = warmup_max_rounds
+        self.warmup_tolerance = warmup_tolerance
+        self.allow_mock = allow_mock
+        self.predict_kwargs = predict_kwargs
+
+        self.state = "starting"
+        self.error = None
+        self.classes = None
+        self.model_version = None
+        self.detector = None
+        self.scheduler = None
+        self.mock = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.warmup = {}
+        self._task = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.state in ("warming", "ready")
+
+    @property
+    def ready(self) -> bool:
+        # A worker pool that lost workers it couldn't respawn is no longer ready
+        healthy = getattr(self.scheduler, "healthy", True)
+        return self.state == "ready" and (not self.mock or self.allow_mock) and healthy
+
+    def require_loaded(self):
+        if not self.loaded:
+            raise ModelNotReady(f"Model is {self.state}" + (f": {self.error}" if self.error else ""))
+        return self.scheduler
+
+    async def start(self):
+        """Begin loading in the background; returns immediately."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_ready(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.scheduler is not None:
+            await self.scheduler.stop()
+
+    async def _run(self):
+        try:
+            self.state = "loading"
+            started = time.perf_counter()
+            await asyncio.to_thread(self._build)
+            await self.scheduler.start()
+            self.mock = not (self.scheduler.model_loaded if self.detector is None else self.detector.session is not None)
+            self.load_seconds = time.perf_counter() - started
+
+            self.state = "warming"
+            started = time.perf_counter()
+            if not self.mock:
+                await self._warmup()
+            self.warmup_seconds = time.perf_counter() - started
+            self.state = "ready"
+            print(f"[*] Model ready in {self.load_seconds + self.warmup_seconds:.2f}s "
+                  f"(load {self.load_seconds:.2f}s, warmup {self.warmup_seconds:.2f}s, mock={self.mock})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"[!] Error: Model failed to load ({e})")
+
+    def _build(self):
+        """Blocking part of the load: class names, model hash and the ONNX session(s)."""
+        self.classes = self.load_classes()
+        self.model_version = model_version(self.model_path)
+        if self.inference_workers > 0:
+            # start_sync waits for every worker to load its own session
+            self.scheduler = InferenceWorkerPool(
+                self.model_path, self.classes, num_workers=self.inference_workers, intra_op_threads=self.intra_op_threads,
+                input_size=self.input_size, max_batch_size=self.max_batch_size, **self.predict_kwargs,
+            )
+            self.scheduler.start_sync()
+        else:
+            self.detector = YOLOv8ONNX(
+                self.model_path, self.classes, input_size=self.input_size, intra_op_threads=self.intra_op_threads or None,
+            )
+            self.scheduler = BatchScheduler(
+                self.detector, max_batch_size=self.max_batch_size, max_wait_ms=self.max_wait_ms, **self.predict_kwargs,
+            )
+
+    async def _warmup(self):
+        frame = np.full((480, 640, 3), 114, dtype=np.uint8)
+        for batch_size in self.warmup_batch_sizes:
+            rounds, previous = [], None
+            for _ in range(self.warmup_max_rounds):
+                started = time.perf_counter()
+                await asyncio.gather(*[self.scheduler.submit(frame) for _ in range(batch_size)])
+                elapsed = time.perf_counter() - started
+                rounds.append(round(elapsed * 1000, 2))
+                if previous is not None and abs(elapsed - previous) <= self.warmup_tolerance * previous:
+                    break
+                previous = elapsed
+            self.warmup[batch_size] = rounds
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "mock": self.mock,
+            "model_path": self.model_path,
+            "model_version": self.model_version,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_round_ms": self.warmup,
+            "error": self.error or getattr(self.scheduler, "error", None),
+        }
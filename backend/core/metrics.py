@@ -0,0 +1,130 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Cumulative bucketed histogram, cheap enough to update on every request."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets + ["+Inf"], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "sum": total, "count": count}
+
+
+# BIRDBASE_METRICS=0 turns per-request stage timing off entirely
+METRICS_ENABLED = os.environ.get("BIRDBASE_METRICS", "1") == "1"
+# Seconds; spans a sub-millisecond decode up to a slow enrichment call
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class Gauge:
+    """Thread-safe up/down counter for things like in-flight requests."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    @contextmanager
+    def track(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class StageMetrics:
+    """
+    One latency histogram per request stage (read, decode, queue, preprocess, ...).
+
+    Hot paths fill a plain dict of stage -> seconds for their request and hand it to
+    `observe` once at the end, which keeps the per-request cost to a few dict writes
+    and one histogram update per stage. When disabled, `new_timings` returns None and
+    every code path skips its timing calls.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def new_timings(self):
+        return {} if self.enabled else None
+
+    def observe(self, timings):
+        if not timings:
+            return
+        for stage, seconds in timings.items():
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                with self._lock:
+                    histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+            histogram.observe(seconds)
+
+
+def add_timing(timings, stage, started):
+    """Add the time since `started` (a perf_counter value) to `stage`; a no-op when timings is None."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def server_timing_header(timings) -> str:
+    """Format timings as a Server-Timing header value, e.g. 'decode;dur=3.10, inference;dur=21.52'."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+
+
+def prometheus_histogram(name, help_text, snapshots) -> list:
+    """Prometheus text lines for histograms given as [(labels, Histogram.snapshot()), ...]."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, snapshot in snapshots:
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+def prometheus_gauge(name, help_text, value, kind="gauge") -> list:
+    return prometheus_samples(name, help_text, [({}, value)], kind)
+
+
+def prometheus_samples(name, help_text, samples, kind="gauge") -> list:
+    """Prometheus text lines for one gauge/counter with several label sets, given as [(labels, value), ...]."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_labels(labels)} {float(value)}" for labels, value in samples]
+    return lines
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import onnxruntime as ort
+
+# Optional JSON file overriding DEFAULT_SESSION_CONFIG, e.g. {"intra_op_num_threads": 4}
+SESSION_CONFIG_PATH = os.environ.get("BIRDBASE_ORT_CONFIG")
+
+DEFAULT_SESSION_CONFIG = {
+    "providers": ["CPUExecutionProvider"],
+    # disable | basic | extended | all
+    "graph_optimization_level": "all",
+    # 0 lets ONNX Runtime pick based on the machine
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    # sequential | parallel
+    "execution_mode": "sequential",
+    "enable_mem_pattern": True,
+    "enable_cpu_mem_arena": True,
+    # Directory for serialized optimized graphs so warm starts skip graph optimization; None disables it
+    "optimized_model_dir": os.environ.get("BIRDBASE_ORT_CACHE_DIR", "../ai_model/weights/.ort_cache"),
+}
+
+OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def load_session_config(path=None, **overrides) -> dict:
+    """Merge the defaults, an optional JSON config file and keyword overrides (None values are ignored)."""
+    config = dict(DEFAULT_SESSION_CONFIG)
+    path = path or SESSION_CONFIG_PATH
+    if path:
+        with open(path, "r") as f:
+            config.update(json.load(f))
+    config.update({k: v for k, v in overrides.items() if v is not None})
+
+    unknown = set(config) - set(DEFAULT_SESSION_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown ONNX Runtime session options: {sorted(unknown)}")
+    if config["graph_optimization_level"] not in OPTIMIZATION_LEVELS:
+        raise ValueError(f"graph_optimization_level must be one of {sorted(OPTIMIZATION_LEVELS)}")
+    if config["execution_mode"] not in EXECUTION_MODES:
+        raise ValueError(f"execution_mode must be one of {sorted(EXECUTION_MODES)}")
+    return config
+
+
+def build_session_options(config: dict) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[config["graph_optimization_level"]]
+    options.intra_op_num_threads = int(config["intra_op_num_threads"])
+    options.inter_op_num_threads = int(config["inter_op_num_threads"])
+    options.execution_mode = EXECUTION_MODES[config["execution_mode"]]
+    options.enable_mem_pattern = bool(config["enable_mem_pattern"])
+    options.enable_cpu_mem_arena = bool(config["enable_cpu_mem_arena"])
+    return options
+
+
+# (path, size, mtime) -> sha1 hex digest, so reloading an unchanged file doesn't hash it again
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _digests_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def model_version(model_path: str) -> str:
+    """Short content hash identifying a model file, or 'missing' when it doesn't exist."""
+    if not os.path.exists(model_path):
+        return "missing"
+    return file_digest(model_path)[:12]
+
+
+def _cached_level(config: dict) -> str:
+    # 'all' adds layout transforms (e.g. NCHWc) tuned to the CPU the session runs on, which
+    # ONNX Runtime warns are not portable; the cache stops at 'extended' and 'all' is applied on load
+    return "extended" if config["graph_optimization_level"] == "all" else config["graph_optimization_level"]
+
+
+def optimized_model_path(model_path: str, config: dict):
+    """
+    Where the optimized graph for this model file is cached, or None if caching is off.
+    The name changes whenever the model bytes, the cached optimization level or the ORT version change.
+    """
+    cache_dir = config.get("optimized_model_dir")
+    if not cache_dir:
+        return None
+    digest = hashlib.sha1(f"{file_digest(model_path)}|{_cached_level(config)}|{ort.__version__}".encode())
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{digest.hexdigest()[:16]}.opt.onnx")
+
+
+def write_optimized_model(model_path: str, cached: str, config: dict):
+    """
+    Optimize the graph up to 'extended' and serialize it to `cached`. Each process writes
+    its own temporary file and renames it into place, so a concurrent reader (another
+    inference worker starting up) never sees a half-written graph.
+    """
+    options = build_session_options(config)
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[_cached_level(config)]
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    partial = f"{cached[:-len('.onnx')]}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp.onnx"
+    options.optimized_model_filepath = partial
+    try:
+        ort.InferenceSession(model_path, sess_options=options, providers=config["providers"])
+        os.replace(partial, cached)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+
+def create_session(model_path: str, config: dict = None) -> ort.InferenceSession:
+    """
+    Build an InferenceSession from a session config.
+
+    The first load optimizes the graph and serializes it to the cache directory; later
+    loads read the cached graph, which skips that work. At the 'all' level only the
+    hardware-specific layout optimizations still run when the cached graph is loaded.
+    """
+    config = config or load_session_config()
+    options = build_session_options(config)
+    providers = config["providers"]
+
+    level = config["graph_optimization_level"]
+    cached = optimized_model_path(model_path, config) if level != "disable" else None
+    if cached and not os.path.exists(cached):
+        try:
+            write_optimized_model(model_path, cached, config)
+        except Exception as e:
+            print(f"[!] Warning: Could not cache the optimized model at {cached} ({e})")
+    if cached and os.path.exists(cached):
+        if level != "all":
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached, sess_options=options, providers=providers)
+        except Exception as e:
+            print(f"[!] Warning: Ignoring unreadable optimized model cache {cached} ({e})")
+            options.graph_optimization_level = OPTIMIZATION_LEVELS[level]
+
+    return ort.InferenceSession(model_path, sess_options=options, providers=providers)
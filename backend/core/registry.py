@@ -0,0 +1,258 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+
+from core.lifecycle import ModelNotReady
+from core.metrics import LATENCY_BUCKETS, Gauge, Histogram
+
+
+class RegistryError(ValueError):
+    """A registry operation that can't be applied; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, detail, status_code=409):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class ModelVersion:
+    """One named model version: its ModelLifecycle plus the traffic it has served."""
+
+    def __init__(self, name, lifecycle):
+        self.name = name
+        self.lifecycle = lifecycle
+        self.role = "serving"  # or "draining" once it is being unloaded
+        self.inflight = Gauge()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.stats = {"requests": 0, "errors": 0, "shadow_requests": 0, "shadow_agreed": 0, "shadow_errors": 0}
+
+    async def submit(self, image, timings=None, tiled=False):
+        """Run one image through this version's scheduler, recording its inference latency."""
+        scheduler = self.lifecycle.require_loaded()
+        started = time.perf_counter()
+        try:
+            if tiled:
+                detections = await scheduler.submit_tiled(image, timings)
+            else:
+                detections = await scheduler.submit(image, timings)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self.latency.observe(time.perf_counter() - started)
+        self.stats["requests"] += 1
+        return detections
+
+    def status(self) -> dict:
+        shadowed = self.stats["shadow_requests"]
+        return dict(
+            self.lifecycle.status(),
+            name=self.name,
+            role=self.role,
+            inflight=self.inflight.value,
+            stats=dict(self.stats, shadow_agreement=self.stats["shadow_agreed"] / shadowed if shadowed else None),
+            latency_seconds=self.latency.snapshot(),
+        )
+
+
+class ModelRegistry:
+    """
+    Named ONNX model versions loaded side by side, with atomic switch-over and traffic splitting.
+
+    `make_lifecycle(model_path, classes_path)` builds a ModelLifecycle for each version,
+    so a new version loads and warms up in the background with the same settings as the
+    first. `active` is switched with a single assignment once the new version is ready;
+    requests already holding the old version finish on it, and the old version is only
+    stopped after its in-flight count drains to zero (or `drain_timeout` passes).
+
+    Traffic goes to the active version unless `weights` split it between ready versions
+    (A/B). `shadow` versions additionally receive a sampled copy of requests in the
+    background; their answers are only compared with the served one and counted.
+    """
+
+    def __init__(self, make_lifecycle, drain_timeout=30.0, max_shadow_inflight=32):
+        self.make_lifecycle = make_lifecycle
+        self.drain_timeout = drain_timeout
+        self.max_shadow_inflight = max_shadow_inflight
+        self.versions = {}
+        self.active = None
+        self.weights = {}
+        self.shadow = {}
+        self._tasks = set()
+        self._shadow_inflight = 0
+        self._rng = random.Random()
+        self.stats = {"switches": 0, "shadow_skipped": 0}
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def get(self, name) -> ModelVersion:
+        version = self.versions.get(name)
+        if version is None:
+            raise RegistryError(f"Unknown model version '{name}'.", status_code=404)
+        return version
+
+    @property
+    def active_version(self) -> ModelVersion:
+        version = self.versions.get(self.active)
+        if version is None:
+            raise ModelNotReady("No model version loaded")
+        return version
+
+    def require_loaded(self):
+        """The active version's scheduler; raises ModelNotReady until it has loaded."""
+        return self.active_version.lifecycle.require_loaded()
+
+    @property
+    def ready(self) -> bool:
+        return self.active in self.versions and self.versions[self.active].lifecycle.ready
+
+    async def load(self, name, model_path, classes_path=None, activate=True):
+        """
+        Start loading a version in the background; returns immediately. The first version
+        becomes active straight away (and serves once loaded), later ones switch over
+        when their warmup has finished if `activate` is set.
+        """
+        if name in self.versions:
+            raise RegistryError(f"Model version '{name}' already exists.")
+        version = ModelVersion(name, self.make_lifecycle(model_path, classes_path))
+        self.versions[name] = version
+        await version.lifecycle.start()
+        if self.active is None:
+            self.active = name
+        elif activate:
+            self._spawn(self._activate_when_ready(version))
+        return version
+
+    async def _activate_when_ready(self, version):
+        await version.lifecycle.wait_ready()
+        if version.lifecycle.ready and self.versions.get(version.name) is version:
+            await self.activate(version.name)
+        else:
+            print(f"[!] Warning: Model version '{version.name}' is {version.lifecycle.state}, not switching to it")
+
+    async def activate(self, name, keep_previous=False):
+        """Make a ready version the active one; the previous one is drained and unloaded unless kept."""
+        version = self.get(name)
+        if not version.lifecycle.ready:
+            raise RegistryError(f"Model version '{name}' is {version.lifecycle.state}, not ready.")
+        previous, self.active = self.active, name
+        # A/B weights were set against the old active version; all traffic now goes to the new one
+        self.weights = {}
+        self.shadow.pop(name, None)
+        self.stats["switches"] += 1
+        print(f"[*] Switched active model version to '{name}' ({version.lifecycle.model_version})")
+        if previous is not None and previous != name and not keep_previous:
+            await self.unload(previous)
+
+    async def unload(self, name):
+        """Stop routing to a version and unload it once its in-flight requests have drained."""
+        version = self.get(name)
+        if name == self.active:
+            raise RegistryError(f"Model version '{name}' is active; activate another version first.")
+        self.weights.pop(name, None)
+        self.shadow.pop(name, None)
+        if version.role != "draining":
+            version.role = "draining"
+            self._spawn(self._drain(version))
+
+    async def _drain(self, version):
+        deadline = time.monotonic() + self.drain_timeout
+        while version.inflight.value > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if version.inflight.value > 0:
+            print(f"[!] Warning: Unloading model version '{version.name}' with {version.inflight.value} requests in flight")
+        await version.lifecycle.stop()
+        if self.versions.get(version.name) is version:
+            del self.versions[version.name]
+        print(f"[*] Unloaded model version '{version.name}'")
+
+    def set_routing(self, weights=None, shadow=None):
+        """
+        `weights` maps version -> relative share of traffic (empty sends everything to the active
+        version); `shadow` maps version -> fraction of requests mirrored to it in the background.
+        """
+        weights, shadow = dict(weights or {}), dict(shadow or {})
+        for name in list(weights) + list(shadow):
+            version = self.get(name)
+            if version.role == "draining":
+                raise RegistryError(f"Model version '{name}' is being unloaded.")
+        if any(w < 0 for w in weights.values()) or (weights and not sum(weights.values()) > 0):
+            raise RegistryError("Weights must be non-negative with a positive total.", status_code=400)
+        if any(not 0 <= f <= 1 for f in shadow.values()):
+            raise RegistryError("Shadow fractions must be between 0 and 1.", status_code=400)
+        self.weights, self.shadow = weights, shadow
+
+    def _pick(self) -> ModelVersion:
+        candidates = [
+            (self.versions[name], weight) for name, weight in self.weights.items()
+            if weight > 0 and name in self.versions and self.versions[name].lifecycle.loaded
+        ]
+        if not candidates:
+            return self.active_version
+        versions, weights = zip(*candidates)
+        return self._rng.choices(versions, weights)[0]
+
+    @contextmanager
+    def route(self, name=None):
+        """
+        Pick the version for one request (by A/B weights unless `name` is given) and hold it
+        for the duration of the block, so an unload waits for the request to finish.
+        """
+        version = self.get(name) if name is not None else self._pick()
+        version.lifecycle.require_loaded()
+        version.inflight.inc()
+        try:
+            yield version
+        finally:
+            version.inflight.dec()
+
+    async def submit(self, image, timings=None):
+        """Detect on one frame with the active version (streams stay on it rather than being split)."""
+        with self.route(self.active) as version:
+            return await version.submit(image, timings)
+
+    def mirror(self, served: ModelVersion, image, detections, tiled=False):
+        """Send a sampled copy of a served request to each shadow version, without waiting for it."""
+        for name, fraction in self.shadow.items():
+            version = self.versions.get(name)
+            if version is None or version is served or not version.lifecycle.loaded:
+                continue
+            if self._rng.random() >= fraction:
+                continue
+            if self._shadow_inflight >= self.max_shadow_inflight:
+                self.stats["shadow_skipped"] += 1
+                continue
+            # Counted here, not when the task starts: one finished batch resumes many requests in the same tick
+            self._shadow_inflight += 1
+            self._spawn(self._shadow(version, image, detections, tiled))
+
+    async def _shadow(self, version, image, served_detections, tiled):
+        try:
+            with self.route(version.name):
+                detections = await version.submit(image, tiled=tiled)
+            version.stats["shadow_requests"] += 1
+            served_top = served_detections[0]["class"] if served_detections else None
+            shadow_top = detections[0]["class"] if detections else None
+            version.stats["shadow_agreed"] += served_top == shadow_top
+        except Exception:
+            version.stats["shadow_errors"] += 1
+        finally:
+            self._shadow_inflight -= 1
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for version in list(self.versions.values()):
+            await version.lifecycle.stop()
+
+    def status(self) -> dict:
+        return dict(
+            self.stats,
+            active=self.active,
+            weights=self.weights,
+            shadow=self.shadow,
+            versions={name: version.status() for name, version in self.versions.items()},
+        )
@@ -0,0 +1,127 @@
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    """
+    Detection results keyed by a hash of the raw upload bytes, the model version and
+    the confidence threshold, so repeated uploads skip decoding and inference.
+
+    The in-process LRU is bounded by entry count and by the serialized size of the
+    stored results. An optional SQLite file lets several worker processes on one host
+    share results; it is trimmed to `max_entries`, oldest first. SQLite is only touched
+    outside the memory lock, so a write in progress never holds up a memory lookup.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024, disk_path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self._memory = collections.OrderedDict()  # key -> (size, detections)
+        self._bytes = 0
+        self._lock = threading.Lock()  # the LRU and stats
+        self._db_lock = threading.Lock()  # the shared SQLite connection
+        self._db = None
+        self._puts_since_trim = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key(content: bytes, model_version: str, conf_threshold: float) -> str:
+        # blake2b is among the fastest hashes in the standard library
+        digest = hashlib.blake2b(content, digest_size=16)
+        digest.update(f"|{model_version}|{conf_threshold:.4f}".encode())
+        return digest.hexdigest()
+
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=5)
+            # WAL lets other worker processes read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, created_at REAL NOT NULL, detections TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, size, detections):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= old[0]
+        self._memory[key] = (size, detections)
+        self._bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._bytes > self.max_bytes):
+            _, (evicted_size, _) = self._memory.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def get(self, key, disk=True):
+        """
+        Return cached detections for `key`, or None. On a memory miss with `disk` this reads
+        SQLite, so call it off the event loop; `disk=False` only checks memory (and leaves the
+        miss uncounted when there is a disk store, for a caller that goes on to look there).
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            if not self.disk_path:
+                self.stats["misses"] += 1
+                return None
+        if not disk:
+            return None
+
+        with self._db_lock:
+            row = self._conn().execute("SELECT detections FROM results WHERE key = ?", (key,)).fetchone()
+        detections = json.loads(row[0]) if row is not None else None
+        with self._lock:
+            if detections is None:
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, len(row[0]), detections)
+            self.stats["disk_hits"] += 1
+            return detections
+
+    def put(self, key, detections):
+        """Store detections; with a disk store this writes to SQLite, so call it off the event loop."""
+        payload = json.dumps(detections)
+        with self._lock:
+            self._remember(key, len(payload), detections)
+            if not self.disk_path:
+                return
+            self._puts_since_trim += 1
+            trim = self._puts_since_trim >= 256
+            if trim:
+                self._puts_since_trim = 0
+
+        with self._db_lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, created_at, detections) VALUES (?, ?, ?)",
+                (key, time.time(), payload),
+            )
+            if trim:
+                db.execute(
+                    "DELETE FROM results WHERE key NOT IN "
+                    "(SELECT key FROM results ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+            db.commit()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return dict(
+                self.stats,
+                entries=len(self._memory),
+                bytes=self._bytes,
+                hit_rate=hits / lookups if lookups else 0.0,
+            )
@@ -0,0 +1,286 @@
+import collections
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# Rollup tables kept up to date on every flush: bucket name -> (table, seconds per bucket)
+BUCKETS = {"hour": ("hourly_counts", 3600), "day": ("daily_counts", 86400)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS species (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS sightings (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    species_id INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    x REAL, y REAL, w REAL, h REAL,
+    source TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS sightings_species_ts ON sightings (species_id, ts);
+CREATE INDEX IF NOT EXISTS sightings_ts ON sightings (ts);
+"""
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    bucket INTEGER NOT NULL,
+    species_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (bucket, species_id, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {table}_species ON {table} (species_id, bucket);
+"""
+
+
+def parse_time(value):
+    """Epoch seconds from a number, a numeric string or an ISO 8601 string (naive means UTC); None passes through."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class SightingsStore:
+    """
+    Embedded, append-only store of every detection served, with species/time indexes.
+
+    `record` only appends to an in-memory queue, so it never blocks the request path; a
+    writer thread drains the queue every `flush_interval` seconds (or once `flush_rows`
+    are waiting) and inserts the whole batch in one transaction. Species names are
+    dictionary-encoded to integer ids to keep rows narrow, and each flush also adds the
+    batch to hourly and daily (bucket, species, source) rollups, so "per species per day"
+    reads pre-aggregated rows instead of scanning millions of sightings. When
+    more than `max_pending` rows are waiting, new ones are dropped and counted.
+    A flush that fails (database locked, disk full) is logged and its rows are retried
+    with the next one, up to `max_attempts` times before they are dropped as failed.
+    """
+
+    def __init__(self, path="sightings.sqlite3", flush_interval=1.0, flush_rows=5000, max_pending=200_000,
+                 max_attempts=3):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._retry = []
+        self._attempts = 0
+        self.last_error = None
+        self._queue = queue.SimpleQueue()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._writer = None
+        self._species = {}
+        self._local = threading.local()
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0, "flush_errors": 0,
+                      "last_flush_ms": 0.0}
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        # WAL lets the query endpoints read while the writer appends
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    def start(self):
+        if self._writer is not None:
+            return
+        db = self._connect()
+        db.executescript(SCHEMA + "".join(ROLLUP_SCHEMA.format(table=table) for table, _ in BUCKETS.values()))
+        db.commit()
+        self._species = dict(db.execute("SELECT name, id FROM species"))
+        self._stopping = False
+        self._writer = threading.Thread(target=self._run, args=(db,), name="sightings-writer", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        """Flush whatever is queued and stop the writer thread."""
+        if self._writer is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._writer.join()
+        self._writer = None
+
+    def record(self, detections: list, source: str = None, ts: float = None):
+        """Queue one request's detections; returns immediately."""
+        if self._writer is None or not detections:
+            return
+        pending = self._queue.qsize() + len(self._retry)
+        if pending + len(detections) > self.max_pending:
+            self.stats["dropped"] += len(detections)
+            return
+        ts = time.time() if ts is None else ts
+        source = source or ""
+        for det in detections:
+            x, y, w, h = det["bbox"]
+            self._queue.put((ts, det["class"], det["confidence"], x, y, w, h, source))
+        self.stats["recorded"] += len(detections)
+        if pending + len(detections) >= self.flush_rows:
+            self._wakeup.set()
+
+    def _run(self, db):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            stopping = self._stopping
+            rows, self._retry = self._retry, []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    self._flush(db, rows)
+                    self._attempts = 0
+                    self.last_error = None
+                except Exception as e:
+                    self._flush_failed(db, rows, e)
+            if stopping:
+                db.close()
+                return
+
+    def _flush_failed(self, db, rows, error):
+        """Roll back a failed flush and keep its rows for the next one, or drop them after max_attempts."""
+        try:
+            db.rollback()
+        except sqlite3.Error:
+            pass
+        # Species ids inserted by the rolled-back transaction are gone again; look names up afresh
+        self._species = {}
+        self._attempts += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.stats["flush_errors"] += 1
+        if self._attempts < self.max_attempts and not self._stopping:
+            self._retry = rows
+            print(f"[!] Warning: Could not write {len(rows)} sightings ({self.last_error}); retrying")
+        else:
+            self._attempts = 0
+            self.stats["failed"] += len(rows)
+            print(f"[!] Warning: Dropping {len(rows)} sightings after {self.max_attempts} failed writes ({self.last_error})")
+
+    def _flush(self, db, rows):
+        started = time.perf_counter()
+
+        for name in {row[1] for row in rows} - self._species.keys():
+            db.execute("INSERT OR IGNORE INTO species (name) VALUES (?)", (name,))
+            self._species[name] = db.execute("SELECT id FROM species WHERE name = ?", (name,)).fetchone()[0]
+        encoded = [(ts, self._species[name], conf, x, y, w, h, source) for ts, name, conf, x, y, w, h, source in rows]
+
+        with db:
+            db.executemany(
+                "INSERT INTO sightings (ts, species_id, confidence, x, y, w, h, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                encoded,
+            )
+            for table, size in BUCKETS.values():
+                rollup = collections.defaultdict(lambda: [0, 0.0])
+                for ts, species_id, conf, *_, source in encoded:
+                    totals = rollup[(int(ts // size) * size, species_id, source)]
+                    totals[0] += 1
+                    totals[1] += conf
+                db.executemany(
+                    f"INSERT INTO {table} (bucket, species_id, source, count, confidence_sum) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (bucket, species_id, source) DO UPDATE SET "
+                    "count = count + excluded.count, confidence_sum = confidence_sum + excluded.confidence_sum",
+                    [key + tuple(totals) for key, totals in rollup.items()],
+                )
+        self.stats["written"] += len(rows)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def _species_id(self, db, name):
+        row = db.execute("SELECT id FROM species WHERE name = ? COLLATE NOCASE", (name,)).fetchone()
+        return row[0] if row else None
+
+    def query(self, species=None, source=None, start=None, end=None, min_confidence=None, limit=1000) -> list:
+        """Sightings in [start, end), newest first, optionally for one species and/or source."""
+        db = self._reader()
+        clauses, params = [], []
+        if species is not None:
+            species_id = self._species_id(db, species)
+            if species_id is None:
+                return []
+            clauses.append("s.species_id = ?")
+            params.append(species_id)
+        for clause, value in (("s.ts >= ?", start), ("s.ts < ?", end), ("s.source = ?", source),
+                              ("s.confidence >= ?", min_confidence)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = db.execute(
+            "SELECT s.ts, sp.name, s.confidence, s.x, s.y, s.w, s.h, s.source "
+            f"FROM sightings s JOIN species sp ON sp.id = s.species_id{where} ORDER BY s.ts DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [
+            {"ts": ts, "species": name, "confidence": conf, "bbox": [x, y, w, h], "source": source or None}
+            for ts, name, conf, x, y, w, h, source in rows
+        ]
+
+    def counts(self, bucket="day", species=None, source=None, start=None, end=None) -> list:
+        """
+        Sighting counts and mean confidence per (bucket, species) from the rollup tables.
+        Buckets are aligned to UTC and counted whole: `start` is rounded down and `end` up to a
+        bucket boundary, so every bucket overlapping [start, end) is included.
+        """
+        table, size = BUCKETS[bucket]
+        db = self._reader()
+        clauses, params = [], []
+        if species is not None:
+            species_id = self._species_id(db, species)
+            if species_id is None:
+                return []
+            clauses.append("c.species_id = ?")
+            params.append(species_id)
+        if start is not None:
+            clauses.append("c.bucket >= ?")
+            params.append(int(start // size) * size)
+        if end is not None:
+            clauses.append("c.bucket < ?")
+            params.append(-(-end // size) * size)
+        if source is not None:
+            clauses.append("c.source = ?")
+            params.append(source)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = db.execute(
+            f"SELECT c.bucket, c.species_id, SUM(c.count), SUM(c.confidence_sum) FROM {table} c{where} "
+            "GROUP BY c.bucket, c.species_id",
+            params,
+        ).fetchall()
+        # Names are mapped here rather than joined, which would make SQLite sort every rollup row
+        names = dict(db.execute("SELECT id, name FROM species"))
+        counts = [
+            {"bucket": bucket_start, "species": names[species_id], "count": n, "mean_confidence": conf_sum / n}
+            for bucket_start, species_id, n, conf_sum in rows
+        ]
+        counts.sort(key=lambda row: (row["bucket"], row["species"]))
+        return counts
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            pending=self._queue.qsize() + len(self._retry),
+            species=len(self._species),
+            path=self.path,
+            writer_alive=self._writer is not None and self._writer.is_alive(),
+            last_error=self.last_error,
+        )
@@ -1,31 +1,235 @@
+import argparse
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
 import requests
 
-def get_species_info(species_name: str) -> dict:
-    """Retrieve detailed information about a bird species from Wikipedia."""
+WIKIPEDIA_SUMMARY_URL = os.environ.get("BIRDBASE_WIKIPEDIA_URL", "https://en.wikipedia.org/api/rest_v1/page/summary/")
+# Persistent snapshot of species info so nodes without internet access can still serve /species/
+CACHE_PATH = os.environ.get("BIRDBASE_SPECIES_CACHE", "species_cache.sqlite3")
+CACHE_TTL = float(os.environ.get("BIRDBASE_SPECIES_CACHE_TTL", str(30 * 24 * 3600)))
+# A page Wikipedia doesn't have is remembered for this long; other non-200 answers are never cached
+NOT_FOUND_TTL = float(os.environ.get("BIRDBASE_SPECIES_NOT_FOUND_TTL", str(24 * 3600)))
+# When set, never call Wikipedia; serve only what is in the cache
+OFFLINE = os.environ.get("BIRDBASE_OFFLINE", "0") == "1"
+CLASSES_PATH = "../ai_model/data/CUB_200_2011/CUB_200_2011/classes.txt"
+
+
+def normalize_name(species_name: str) -> str:
+    """Cache key for a species: 'Black_footed  Albatross' -> 'black footed albatross'."""
+    return " ".join(species_name.replace("_", " ").split()).lower()
+
+
+class SpeciesInfoCache:
+    """
+    Two-level species info cache: an in-process LRU in front of a SQLite table.
+    Entries expire after `ttl` seconds but are kept on disk so they can still be
+    served as a stale fallback when Wikipedia is unreachable. SQLite is only touched
+    outside the memory lock, so a commit in progress never holds up a memory lookup.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=512):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = collections.OrderedDict()  # key -> (fetched_at, info)
+        self._lock = threading.Lock()  # the LRU and stats
+        self._db_lock = threading.Lock()  # the shared SQLite connection
+        self._db = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0}
+
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS species_info "
+                "(key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, info TEXT NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, fetched_at, info):
+        self._memory[key] = (fetched_at, info)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key, disk=True):
+        """
+        Return (info, fresh) for `key`, or (None, False) when it was never cached.
+        Expired entries are returned with fresh=False so callers can fall back to them.
+        On a memory miss with `disk` this reads SQLite, so call it off the event loop;
+        `disk=False` only checks memory and leaves a miss uncounted, for a caller that
+        goes on to look on disk.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return self._count(entry, "memory_hits")
+        if not disk:
+            return None, False
+
+        with self._db_lock:
+            row = self._conn().execute("SELECT fetched_at, info FROM species_info WHERE key = ?", (key,)).fetchone()
+        entry = (row[0], json.loads(row[1])) if row is not None else None
+        with self._lock:
+            # A put that landed while SQLite was read is newer than the row
+            if entry is not None and key not in self._memory:
+                self._remember(key, *entry)
+            return self._count(entry, "disk_hits")
+
+    def _count(self, entry, source):
+        """(info, fresh) for an entry found in `source`, counted as a hit or a miss. Call under _lock."""
+        if entry is not None and time.time() - entry[0] <= self.ttl:
+            self.stats[source] += 1
+            return entry[1], True
+        self.stats["misses"] += 1
+        return (entry[1], False) if entry is not None else (None, False)
+
+    def record(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def put(self, key, info, fetched_at=None):
+        """Store `info`; this writes to SQLite, so call it off the event loop."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            self._remember(key, fetched_at, info)
+        with self._db_lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO species_info (key, fetched_at, info) VALUES (?, ?, ?)",
+                (key, fetched_at, json.dumps(info)),
+            )
+            db.commit()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return dict(self.stats, memory_entries=len(self._memory), hit_rate=hits / lookups if lookups else 0.0)
+
+
+cache = SpeciesInfoCache()
+_session = requests.Session()
+
+
+def _unavailable(species_name: str) -> dict:
+    return {
+        "name": species_name,
+        "scientific_name": "Unknown",
+        "habitat": "Unknown",
+        "lifespan": "Unknown",
+        "description": f"Detailed information for {species_name} is not available locally."
+    }
+
+
+def summary_url(species_name: str) -> str:
     # Clean the name (e.g., 'Black footed Albatross' -> 'Black-footed Albatross' or similar)
     search_query = species_name.title()
-    
-    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{search_query}"
-    
+    return f"{WIKIPEDIA_SUMMARY_URL}{search_query}"
+
+
+def parse_summary(species_name: str, status_code: int, data: dict) -> dict:
+    """
+    Turn a Wikipedia page summary response into our species info dict. A missing page (404)
+    gives the placeholder; any other failure (429, 5xx, 403, ...) gives {"error": ...} like a network error.
+    """
+    if status_code == 200:
+        return {
+            "name": species_name,
+            "scientific_name": "Scientific name usually in Wikipedia text",
+            "habitat": "Refer to Wikipedia",
+            "lifespan": "Refer to Wikipedia",
+            "description": data.get("extract", "Description not found on Wikipedia.")
+        }
+    if status_code == 404:
+        return _unavailable(species_name)
+    return {"error": f"Wikipedia answered HTTP {status_code}", "name": species_name}
+
+
+def cache_response(key: str, info: dict, status_code: int):
+    """Store a parsed answer: a page for the cache TTL, a missing page for NOT_FOUND_TTL, nothing else."""
+    if status_code == 200:
+        cache.put(key, info)
+    elif status_code == 404:
+        # Backdated so it turns stale after NOT_FOUND_TTL rather than the full TTL
+        cache.put(key, info, fetched_at=time.time() - max(0.0, cache.ttl - NOT_FOUND_TTL))
+
+
+def fetch_species_info(species_name: str, session=None):
+    """
+    Retrieve detailed information about a bird species from Wikipedia (always hits the network).
+    Returns (info, status_code); the status is None when the request itself failed.
+    """
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "name": species_name,
-                "scientific_name": "Scientific name usually in Wikipedia text",
-                "habitat": "Refer to Wikipedia",
-                "lifespan": "Refer to Wikipedia",
-                "description": data.get("extract", "Description not found on Wikipedia.")
-            }
-        else:
-            return {
-                "name": species_name,
-                "scientific_name": "Unknown",
-                "habitat": "Unknown",
-                "lifespan": "Unknown",
-                "description": f"Detailed information for {species_name} is not available locally."
-            }
+        response = (session or _session).get(summary_url(species_name), timeout=5)
+        data = response.json() if response.status_code == 200 else {}
+        return parse_summary(species_name, response.status_code, data), response.status_code
     except Exception as e:
-        return {"error": str(e), "name": species_name}
+        return {"error": str(e), "name": species_name}, None
+
+
+def get_species_info(species_name: str) -> dict:
+    """Retrieve detailed information about a bird species, served from the cache when possible."""
+    key = normalize_name(species_name)
+    cached, fresh = cache.get(key)
+    if fresh:
+        return dict(cached, name=species_name)
+
+    if OFFLINE:
+        info = _unavailable(species_name)
+    else:
+        cache.record("fetches")
+        info, status_code = fetch_species_info(species_name)
+        if "error" not in info:
+            cache_response(key, info, status_code)
+            return info
+
+    # Offline, network trouble or Wikipedia refusing (e.g. 429): an old snapshot is better than nothing
+    if cached is not None:
+        cache.record("stale_hits")
+        return dict(cached, name=species_name)
+    return info
+
+
+def load_class_names(classes_path=CLASSES_PATH) -> list:
+    """Read CUB classes.txt ('1 001.Black_footed_Albatross') into display names."""
+    with open(classes_path, "r") as f:
+        return [line.strip().split(".", 1)[1].replace("_", " ") for line in f if line.strip()]
+
+
+def warm_cache(names, force=False) -> int:
+    """Fetch and store species info for every name not already fresh in the cache."""
+    fetched = 0
+    for name in names:
+        key = normalize_name(name)
+        if not force and cache.get(key)[1]:
+            continue
+        info, status_code = fetch_species_info(name)
+        if "error" in info:
+            print(f"[!] Warning: Could not fetch {name}: {info['error']}")
+            continue
+        cache_response(key, info, status_code)
+        fetched += 1
+    return fetched
+
+
+if __name__ == "__main__":
+    # Pre-warm the on-disk cache so the API can run without network access, e.g.
+    #   python -m core.species_info --classes ../ai_model/data/CUB_200_2011/CUB_200_2011/classes.txt
+    parser = argparse.ArgumentParser(description="Pre-warm the species info cache from CUB classes.txt")
+    parser.add_argument("--classes", default=CLASSES_PATH)
+    parser.add_argument("--force", action="store_true", help="Refetch entries that are still fresh")
+    args = parser.parse_args()
 
+    names = load_class_names(args.classes)
+    print(f"[*] Warming species cache at {cache.path} with {len(names)} species...")
+    fetched = warm_cache(names, force=args.force)
+    print(f"[*] Fetched {fetched} species, {len(names) - fetched} already cached or failed.")
+    print(f"[*] Cache stats: {cache.snapshot()}")
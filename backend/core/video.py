@@ -0,0 +1,197 @@
+import asyncio
+import itertools
+import shutil
+import tempfile
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from core.ingest import scale_detections
+
+
+class Frame(NamedTuple):
+    """One frame to analyse; scale_x/scale_y map its pixels back to the source resolution."""
+    index: int
+    time: float
+    image: np.ndarray
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+
+
+def save_to_temp(fileobj, suffix=".mp4") -> str:
+    """Copy an uploaded file object to a named temp file (OpenCV can only open paths); caller deletes it."""
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as out:
+        shutil.copyfileobj(fileobj, out, 1 << 20)
+    return out.name
+
+
+class VideoFrames:
+    """
+    Sampled frames of a video file, read with OpenCV.
+    Keeps roughly `sample_fps` frames per second of video (all frames when None).
+    Reads are blocking, so call read_chunk from a worker thread.
+    """
+
+    def __init__(self, path: str, sample_fps: float = None):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError("Unreadable video file.")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.stride = max(1, int(round(self.fps / sample_fps))) if sample_fps else 1
+        self._index = 0
+
+    def read_chunk(self, size: int) -> list:
+        chunk = []
+        while len(chunk) < size:
+            # grab() skips frames without decoding them
+            if not self.capture.grab():
+                break
+            index = self._index
+            self._index += 1
+            if index % self.stride:
+                continue
+            ok, image = self.capture.retrieve()
+            if ok:
+                chunk.append(Frame(index, index / self.fps, image))
+        return chunk
+
+    def close(self):
+        self.capture.release()
+
+
+class FrameDiffFilter:
+    """
+    Flags frames that barely differ from the last frame that was actually analysed.
+
+    Both frames are shrunk to a small grayscale thumbnail, and a frame counts as changed
+    when more than `threshold` of the thumbnail pixels moved by over `pixel_delta` grey
+    levels. Counting changed pixels rather than averaging the difference keeps a small
+    bird entering the frame from being drowned out by the static background.
+    """
+
+    def __init__(self, threshold=0.002, pixel_delta=20, thumb_size=(160, 90)):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.thumb_size = thumb_size
+        self._reference = None
+
+    def is_duplicate(self, image: np.ndarray) -> bool:
+        thumb = cv2.cvtColor(cv2.resize(image, self.thumb_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self._reference is not None:
+            changed = np.count_nonzero(cv2.absdiff(thumb, self._reference) > self.pixel_delta)
+            if changed < self.threshold * thumb.size:
+                return True
+        self._reference = thumb
+        return False
+
+
+def box_iou(a, b) -> float:
+    """IoU of two [x_min, y_min, w, h] boxes."""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IoUTracker:
+    """
+    Greedy IoU tracker. Each detection joins the live track of the same species it
+    overlaps most (at least `iou_threshold`), otherwise it starts a new track. A track
+    ends once it has gone unmatched for `max_missed` analysed frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._step = 0
+
+    def update(self, frame: Frame, detections: list):
+        """Tag each detection with a track_id; returns (started tracks, ended tracks)."""
+        self._step += 1
+        started, matched = [], set()
+        for det in sorted(detections, key=lambda d: d["confidence"], reverse=True):
+            best, best_iou = None, self.iou_threshold
+            for track_id, track in self.tracks.items():
+                if track_id in matched or track["class"] != det["class"]:
+                    continue
+                overlap = box_iou(track["bbox"], det["bbox"])
+                if overlap >= best_iou:
+                    best, best_iou = track_id, overlap
+            if best is None:
+                best = next(self._ids)
+                self.tracks[best] = {
+                    "track_id": best, "class": det["class"], "confidence": det["confidence"], "bbox": det["bbox"],
+                    "first_frame": frame.index, "last_frame": frame.index, "hits": 1, "_step": self._step,
+                }
+                started.append(self.tracks[best])
+            else:
+                track = self.tracks[best]
+                track.update(bbox=det["bbox"], last_frame=frame.index, hits=track["hits"] + 1, _step=self._step,
+                             confidence=max(track["confidence"], det["confidence"]))
+            matched.add(best)
+            det["track_id"] = best
+
+        ended = [t for t in self.tracks.values() if self._step - t["_step"] > self.max_missed]
+        for track in ended:
+            del self.tracks[track["track_id"]]
+        return started, ended
+
+    def finish(self) -> list:
+        ended = list(self.tracks.values())
+        self.tracks = {}
+        return ended
+
+
+def public_track(track: dict) -> dict:
+    return {k: v for k, v in track.items() if not k.startswith("_")}
+
+
+class VideoAnalyzer:
+    """
+    Turns a sequence of frames into detection and track events.
+
+    Near-duplicate frames reuse the previous detections instead of running the model.
+    The remaining frames of a chunk are submitted together, so the scheduler can batch
+    them, and their detections are linked into tracks in frame order. Events are dicts
+    with type "frame", "track_start" or "track_end".
+    """
+
+    def __init__(self, detect, diff_threshold=0.002, iou_threshold=0.3, max_missed=5):
+        self.detect = detect
+        self.diff = FrameDiffFilter(diff_threshold)
+        self.tracker = IoUTracker(iou_threshold, max_missed)
+        self._last = []
+        self.stats = {"frames": 0, "analysed": 0, "reused": 0, "tracks": 0}
+
+    async def process_chunk(self, frames: list) -> list:
+        duplicate = [self.diff.is_duplicate(frame.image) for frame in frames]
+        fresh = [frame for frame, dup in zip(frames, duplicate) if not dup]
+        results = iter(await asyncio.gather(*[self.detect(frame.image) for frame in fresh]))
+
+        events = []
+        for frame, dup in zip(frames, duplicate):
+            self.stats["frames"] += 1
+            if dup:
+                self.stats["reused"] += 1
+                detections = self._last
+            else:
+                self.stats["analysed"] += 1
+                detections = scale_detections(next(results), frame.scale_x, frame.scale_y)
+                started, ended = self.tracker.update(frame, detections)
+                self.stats["tracks"] += len(started)
+                events += [{"type": "track_end", "track": public_track(t)} for t in ended]
+                events += [{"type": "track_start", "track": public_track(t)} for t in started]
+                self._last = detections
+            events.append({
+                "type": "frame", "frame": frame.index, "time": round(frame.time, 3),
+                "reused": dup, "detections": detections,
+            })
+        return events
+
+    def finish(self) -> list:
+        return [{"type": "track_end", "track": public_track(t)} for t in self.tracker.finish()]
@@ -0,0 +1,330 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.metrics import Histogram
+
+
+def _worker_main(index, model_path, classes, input_size, intra_op_threads, max_batch_size, predict_kwargs, tasks,
+                 results):
+    """Worker process: own ONNX session, reads frames out of shared memory, returns detections."""
+    from core.inference import YOLOv8ONNX
+
+    detector = YOLOv8ONNX(model_path, classes, input_size=input_size, intra_op_threads=intra_op_threads)
+    results.put(("ready", index, detector.session is not None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        batch = [task]
+        # Opportunistically pick up whatever else is already queued
+        while len(batch) < max_batch_size:
+            try:
+                task = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is None:
+                tasks.put(None)  # leave the stop signal for this worker's next loop
+                break
+            batch.append(task)
+        # Lets the pool fail exactly these jobs if this process dies while running them
+        results.put(("taken", index, [task[0] for task in batch]))
+
+        segments, images = [], []
+        try:
+            for _, shm_name, shape, _ in batch:
+                shm = shared_memory.SharedMemory(name=shm_name)
+                segments.append(shm)
+                images.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+
+            # Tiled jobs are a batch of their own; the rest share one batched call
+            plain = [i for i, task in enumerate(batch) if not task[3]]
+            timings = {}
+            outputs = detector.predict_batch([images[i] for i in plain], timings=timings, **predict_kwargs) if plain else []
+            for i, detections in zip(plain, outputs):
+                results.put((batch[i][0], detections, None, timings))
+            for i, task in enumerate(batch):
+                if task[3]:
+                    tile_timings = {}
+                    detections = detector.predict_tiled(images[i], timings=tile_timings, **predict_kwargs)
+                    results.put((task[0], detections, None, tile_timings))
+        except Exception as e:
+            for job_id, _, _, _ in batch:
+                results.put((job_id, None, str(e), None))
+        finally:
+            del images
+            for shm in segments:
+                shm.close()
+
+
+def _settle(future, detections=None, error=None):
+    """Resolve a job's future, unless its caller already gave up on it (a disconnect or an admission timeout)."""
+    if not future.set_running_or_notify_cancel():
+        return
+    if error is not None:
+        future.set_exception(RuntimeError(error))
+    else:
+        future.set_result(detections)
+
+
+class _SegmentPool:
+    """Recycles shared memory segments so steady-state transfers don't create new ones."""
+
+    def __init__(self, max_free=32):
+        self.max_free = max_free
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes) -> shared_memory.SharedMemory:
+        with self._lock:
+            fits = [shm for shm in self._free if shm.size >= nbytes]
+            if fits:
+                shm = min(fits, key=lambda s: s.size)
+                self._free.remove(shm)
+                return shm
+        # Round up to 1 MB so slightly different frame sizes can share segments
+        size = -(-nbytes // (1 << 20)) * (1 << 20)
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def release(self, shm):
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(shm)
+                return
+        shm.close()
+        shm.unlink()
+
+    def clear(self):
+        with self._lock:
+            for shm in self._free:
+                shm.close()
+                shm.unlink()
+            self._free.clear()
+
+
+class InferenceWorkerPool:
+    """
+    Runs YOLOv8ONNX in `num_workers` processes, each with its own ONNX session.
+
+    Decoded frames are copied once into shared memory and only the segment name
+    travels over the task queue, so arrays are never pickled. Idle workers pull
+    from one shared queue and batch whatever is waiting. Exposes the same
+    start/stop/submit/stats interface as BatchScheduler.
+
+    Workers that die (OOM, a crash inside ONNX Runtime) are noticed within
+    `health_interval` seconds: the jobs they had taken fail with an error and the
+    worker is respawned, up to `max_restarts` times over the pool's life. Past that
+    the pool reports itself unhealthy, which takes the model out of /readyz.
+    """
+
+    def __init__(self, model_path, classes, num_workers=2, intra_op_threads=1, input_size=640,
+                 max_batch_size=16, max_restarts=3, health_interval=1.0, **predict_kwargs):
+        self.model_path = model_path
+        self.classes = classes
+        self.num_workers = num_workers
+        self.intra_op_threads = intra_op_threads
+        self.input_size = input_size
+        self.max_batch_size = max_batch_size
+        self.max_restarts = max_restarts
+        self.health_interval = health_interval
+        self.predict_kwargs = predict_kwargs
+
+        self._ctx = mp.get_context("spawn")
+        self._segments = _SegmentPool(max_free=num_workers * max_batch_size)
+        self._jobs = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._processes = []
+        self._owners = {}  # job id -> index of the worker running it
+        self._dead = set()  # workers that exited and were not respawned
+        self._stopping = False
+        self._collector = None
+        self.model_loaded = None
+        self.load_seconds = None
+        self.restarts = 0
+        self.error = None
+
+        self.inflight = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128, 256])
+
+    @property
+    def healthy(self) -> bool:
+        # Without the result collector every job would wait forever
+        collecting = not self._processes or (self._collector is not None and self._collector.is_alive())
+        return self.error is None and collecting
+
+    def _spawn(self, index):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.model_path, self.classes, self.input_size, self.intra_op_threads,
+                  self.max_batch_size, self.predict_kwargs, self._tasks, self._results),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start_sync(self):
+        if self._processes:
+            return
+        started = time.perf_counter()
+        self._stopping = False
+        self._dead.clear()
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes = [self._spawn(index) for index in range(self.num_workers)]
+
+        # Wait until every worker has loaded its model, failing fast if one dies on the way
+        loaded = {}
+        while len(loaded) < self.num_workers:
+            try:
+                _, index, ok = self._results.get(timeout=self.health_interval)
+            except queue.Empty:
+                dead = [p for i, p in enumerate(self._processes) if i not in loaded and not p.is_alive()]
+                if dead:
+                    for process in self._processes:
+                        process.terminate()
+                    self._processes = []
+                    raise RuntimeError(f"Inference worker exited with code {dead[0].exitcode} while loading the model")
+                continue
+            loaded[index] = ok
+        self.model_loaded = all(loaded.values())
+        self.load_seconds = time.perf_counter() - started
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+        self._collector.start()
+        print(f"[*] Inference worker pool ready: {self.num_workers} workers, {self.intra_op_threads} intra-op threads each")
+
+    def stop_sync(self):
+        if not self._processes:
+            return
+        self._stopping = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._results.put(None)
+        self._collector.join(timeout=5)
+
+        with self._lock:
+            jobs, self._jobs = self._jobs, {}
+        for future, shm, _, _ in jobs.values():
+            self._segments.release(shm)
+            _settle(future, error="Inference worker pool stopped")
+        self._segments.clear()
+
+    async def start(self):
+        await asyncio.to_thread(self.start_sync)
+
+    async def stop(self):
+        await asyncio.to_thread(self.stop_sync)
+
+    def submit_sync(self, image: np.ndarray, timings=None, tiled=False):
+        """
+        Hand one BGR frame to the pool; returns a concurrent.futures.Future of its detections.
+        If `timings` is a dict, the worker's stage durations and the remaining round trip ("queue") are added to it.
+        With `tiled` the worker runs YOLOv8ONNX.predict_tiled on it instead of batching it with other frames.
+        """
+        if self._processes and not any(p.is_alive() for p in self._processes):
+            raise RuntimeError(f"No inference workers alive ({self.error or 'all workers exited'})")
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        shm = self._segments.acquire(image.nbytes)
+        np.ndarray(image.shape, dtype=np.uint8, buffer=shm.buf)[...] = image
+
+        future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            self.inflight.observe(len(self._jobs))
+            self._jobs[job_id] = (future, shm, timings, time.perf_counter())
+        self._tasks.put((job_id, shm.name, image.shape, tiled))
+        return future
+
+    async def submit(self, image: np.ndarray, timings=None):
+        if not self._processes:
+            await self.start()
+        return await asyncio.wrap_future(self.submit_sync(image, timings))
+
+    async def submit_tiled(self, image: np.ndarray, timings=None):
+        if not self._processes:
+            await self.start()
+        return await asyncio.wrap_future(self.submit_sync(image, timings, tiled=True))
+
+    def _finish(self, job_id, detections=None, error=None, worker_timings=None):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            self._owners.pop(job_id, None)
+        if job is None:
+            return
+        future, shm, timings, submitted_at = job
+        self._segments.release(shm)
+        if timings is not None and worker_timings:
+            # Whatever the worker didn't spend on its stages was queueing and transfer
+            elapsed = time.perf_counter() - submitted_at
+            timings["queue"] = timings.get("queue", 0.0) + max(0.0, elapsed - sum(worker_timings.values()))
+            timings.update(worker_timings)
+        _settle(future, detections, error)
+
+    def _check_workers(self):
+        """Fail the jobs of workers that died and respawn them, or mark the pool unhealthy."""
+        for index, process in enumerate(self._processes):
+            if self._stopping or process.is_alive() or index in self._dead:
+                continue
+            with self._lock:
+                lost = [job_id for job_id, owner in self._owners.items() if owner == index]
+            reason = f"Inference worker {index} exited with code {process.exitcode}"
+            print(f"[!] Warning: {reason}; failing {len(lost)} in-flight jobs")
+            for job_id in lost:
+                self._finish(job_id, error=reason)
+            if self.restarts < self.max_restarts:
+                self.restarts += 1
+                self._processes[index] = self._spawn(index)
+            else:
+                self._dead.add(index)
+                if self.error is None:
+                    self.error = f"{reason} and the restart limit ({self.max_restarts}) is used up"
+                    print(f"[!] Error: {self.error}")
+
+    def _collect(self):
+        checked_at = time.monotonic()
+        while True:
+            try:
+                message = self._results.get(timeout=self.health_interval)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if time.monotonic() - checked_at >= self.health_interval or not message:
+                self._check_workers()
+                checked_at = time.monotonic()
+            if not message:
+                continue
+            if message[0] == "taken":
+                _, index, job_ids = message
+                with self._lock:
+                    self._owners.update((job_id, index) for job_id in job_ids if job_id in self._jobs)
+            elif message[0] == "ready":
+                _, index, ok = message
+                if not ok and self.error is None:
+                    self.error = f"Inference worker {index} could not load the model after a restart"
+                    print(f"[!] Error: {self.error}")
+            else:
+                self._finish(*message)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.num_workers,
+            "alive": sum(p.is_alive() for p in self._processes),
+            "restarts": self.restarts,
+            "error": self.error,
+            "intra_op_threads": self.intra_op_threads,
+            "inflight_now": len(self._jobs),
+            "inflight": self.inflight.snapshot(),
+        }
@@ -1,12 +1,78 @@
+import sys
+import time
+
+import cv2
+import numpy as np
 import requests
 
 url = "http://localhost:8000/predict/"
-file_path = "/Users/dogayucel/.gemini/antigravity/brain/69f1f323-e141-4865-9eb1-badc4100382a/sample_eagle_1771577662056.png"
+MODEL_INPUT_SIZE = 640
+
+
+def downscale(content):
+    """What the web and Android clients do before uploading: shrink to the model input size, re-encode as JPEG."""
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+    height, width = image.shape[:2]
+    scale = MODEL_INPUT_SIZE / max(width, height)
+    if scale >= 1:
+        return content, None
+    small = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    resized = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    return resized, {"original_width": width, "original_height": height}
+
+
+def post(content, params=None):
+    files = {"file": ("sample.jpg", content, "image/jpeg")}
+    return requests.post(url, files=files, params=dict(params or {}, enrich="none"))
 
+
+def compare(content, repeats, uplink_mbps=10.0):
+    """Upload bytes and latency for the full photo vs the client-downscaled one."""
+    results = {}
+    for name in ("full", "downscaled"):
+        resize_times, request_times, cached = [], [], 0
+        for _ in range(repeats):
+            started = time.perf_counter()
+            payload, params = (content, None) if name == "full" else downscale(content)
+            resize_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            response = post(payload, params)
+            request_times.append(time.perf_counter() - started)
+            response.raise_for_status()
+            cached += response.json().get("cached", False)
+        results[name] = response.json()
+        # Localhost uploads are nearly free, so also show what the bytes cost on a phone-like uplink
+        transfer_ms = len(payload) * 8 / (uplink_mbps * 1e6) * 1000
+        print(f"{name:<11} upload {len(payload) / 1024:8.1f} KiB | client resize p50 {np.median(resize_times) * 1000:6.1f} ms "
+              f"| request p50 {np.median(request_times) * 1000:6.1f} ms | + {transfer_ms:6.0f} ms at {uplink_mbps:g} Mbit/s "
+              f"| cached {cached}/{repeats}")
+    boxes = [[d["bbox"] for d in results[name].get("detections", [])[:1]] for name in ("full", "downscaled")]
+    print("Top box, full vs downscaled (original pixels):", *boxes)
+
+
+# python test_api.py [image] [--compare [repeats]]; without an image a synthetic one is posted so this runs anywhere.
+# --compare uploads the photo as is and client-downscaled; run the server with BIRDBASE_RESULT_CACHE_ENTRIES=0.
 try:
-    with open(file_path, "rb") as image_file:
-        files = {"file": ("sample_eagle.png", image_file, "image/png")}
-        response = requests.post(url, files=files)
+    args = sys.argv[1:]
+    repeats = 0
+    if "--compare" in args:
+        i = args.index("--compare")
+        count = args[i + 1] if i + 1 < len(args) and args[i + 1].isdigit() else None
+        repeats = int(count) if count else 10
+        del args[i:i + (2 if count else 1)]
+    if args:
+        with open(args[0], "rb") as image_file:
+            content = image_file.read()
+    else:
+        # Phone-camera sized when comparing, so there is something to downscale
+        size = (4032, 3024) if repeats else (640, 480)
+        image = cv2.resize(np.random.default_rng(0).integers(0, 255, (30, 40, 3), dtype=np.uint8), size)
+        content = cv2.imencode(".jpg", image)[1].tobytes()
+
+    if repeats:
+        compare(content, repeats)
+    else:
+        response = requests.post(url, files={"file": ("sample.jpg", content, "image/jpeg")})
         print("Status Code:", response.status_code)
         print("Response JSON:")
         print(response.json())
@@ -0,0 +1,97 @@
+"""
+Shared fixtures: a local stand-in for the Wikipedia summary API and the FastAPI app on a
+synthetic blob-detector model, so the tests need no weights, dataset or network.
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND, os.path.join(BACKEND, "app")]
+
+from benchmarks.synthetic_model import build_blob_detector  # noqa: E402
+from core import species_info  # noqa: E402
+
+# The class the blob detector's single output is named after
+BLOB_CLASS = "Cardinal"
+
+
+class StandInWikipedia(BaseHTTPRequestHandler):
+    """Answers /page/summary/<title> like the Wikipedia REST API, with `status` as the HTTP status."""
+
+    status = 200
+    delay = 0.0
+    requests_served = 0
+
+    def do_GET(self):
+        StandInWikipedia.requests_served += 1
+        time.sleep(self.delay)
+        title = unquote(self.path.rsplit("/", 1)[-1])
+        body = json.dumps({"extract": f"Stand-in summary for {title}."} if self.status == 200 else {}).encode()
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def wikipedia(monkeypatch, tmp_path):
+    """The stand-in server, with species_info pointed at it and a fresh species cache."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInWikipedia)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StandInWikipedia.status, StandInWikipedia.delay, StandInWikipedia.requests_served = 200, 0.0, 0
+
+    monkeypatch.setattr(species_info, "WIKIPEDIA_SUMMARY_URL", f"http://127.0.0.1:{server.server_port}/page/summary/")
+    monkeypatch.setattr(species_info, "cache", species_info.SpeciesInfoCache(str(tmp_path / "species.sqlite3")))
+    monkeypatch.setattr(species_info, "OFFLINE", False)
+    yield StandInWikipedia
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """app/main.py configured for the tests; it reads its settings from the environment at import time."""
+    workdir = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "BIRDBASE_MODEL_PATH": build_blob_detector(workdir / "blobs.onnx"),
+        "BIRDBASE_ORT_CACHE_DIR": str(workdir / "ort_cache"),
+        "BIRDBASE_SIGHTINGS_PATH": "",
+        "BIRDBASE_RESULT_CACHE_ENTRIES": "0",
+        "BIRDBASE_WARMUP_MAX_ROUNDS": "0",
+    })
+    import main
+
+    classes_path = workdir / "classes.txt"
+    classes_path.write_text(f"1 001.{BLOB_CLASS}\n")
+    main.CLASSES_PATH = str(classes_path)
+    # Enrichment never reaches the real Wikipedia; tests that want lookups use the `wikipedia` fixture
+    species_info.cache = species_info.SpeciesInfoCache(str(workdir / "species.sqlite3"))
+    species_info.OFFLINE = True
+    return main
+
+
+@pytest.fixture(scope="session")
+def api(main_module):
+    """A TestClient on the running app, once the model is ready."""
+    from fastapi.testclient import TestClient
+
+    with TestClient(main_module.app) as client:
+        deadline = time.monotonic() + 60
+        while client.get("/readyz").status_code != 200:
+            assert time.monotonic() < deadline, client.get("/readyz").json()
+            time.sleep(0.1)
+        yield client
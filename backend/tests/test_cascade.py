@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.bench_cascade import CLASSES, DIM, blob_colour
+from benchmarks.synthetic_model import TinyCaptioner
+from core.cascade import CropCascade, Florence2Verifier, caption_constraint
+
+
+def blob_image(species, x=160, y=96):
+    """A dark image with one dim 16px square whose hue TinyCaptioner reads as CLASSES[species]."""
+    image = np.random.default_rng(species).integers(0, 40, size=(480, 640, 3), dtype=np.uint8)
+    image[y:y + 16, x:x + 16] = blob_colour(species, DIM)
+    return image
+
+
+def detection(candidates, confidence=0.5):
+    return {"class": candidates[0], "confidence": confidence, "bbox": [160.0, 96.0, 16.0, 16.0],
+            "candidates": candidates}
+
+
+def verified(cascade, image, detections, repeats=1):
+    """Start `cascade`, verify `detections` on `image` `repeats` times in a row, and stop it."""
+    async def run():
+        await cascade.start()
+        await cascade._task
+        try:
+            return [await cascade.verify(image, detections) for _ in range(repeats)]
+        finally:
+            await cascade.stop()
+    return asyncio.run(run())
+
+
+def test_cascade_relabels_keeps_and_caches():
+    cascade = CropCascade(lambda: TinyCaptioner(CLASSES, generic_rate=0, hidden=64), threshold=0.6)
+    detections = [
+        detection(["Cardinal", "Green Jay", "Finch"]),
+        detection(["Cardinal", "Finch"]),
+        detection(["Cardinal", "Finch"], confidence=0.9),
+    ]
+    first, again = verified(cascade, blob_image(CLASSES.index("Green Jay")), detections, repeats=2)
+    relabelled, generic, confident = first
+    assert relabelled["class"] == "Green Jay" and relabelled["detector_class"] == "Cardinal"
+    assert relabelled["verified"] and relabelled["verifier_class"] == "Green Jay"
+    # The crop's species isn't a candidate, so the generic caption wins and the label stays
+    assert generic["class"] == "Cardinal" and not generic["verified"] and generic["verifier_class"] is None
+    assert "verified" not in confident
+    assert again == first
+    assert cascade.stats["crops"] == 4 and cascade.stats["cache_hits"] == 2
+    assert cascade.stats["relabelled"] == 2 and cascade.stats["escalated_requests"] == 2
+
+
+def test_captions_longer_than_the_token_cap_are_generic():
+    # "a green jay" and the end token need 4 steps
+    cascade = CropCascade(lambda: TinyCaptioner(CLASSES, generic_rate=0, hidden=64, max_new_tokens=3), threshold=0.6)
+    [(result,)] = verified(cascade, blob_image(CLASSES.index("Green Jay")), [detection(["Cardinal", "Green Jay"])])
+    assert not result["verified"] and result["class"] == "Cardinal"
+
+
+def test_unpinned_hub_model_is_refused():
+    with pytest.raises(ValueError, match="BIRDBASE_CASCADE_REVISION"):
+        Florence2Verifier("microsoft/Florence-2-base")
+
+    cascade = CropCascade(functools.partial(Florence2Verifier, "microsoft/Florence-2-base"))
+    detections = [detection(["Cardinal"])]
+    assert verified(cascade, blob_image(0), detections) == [detections]
+    assert cascade.state == "failed" and "BIRDBASE_CASCADE_REVISION" in cascade.error
+
+
+def test_caption_constraint_limits_generate_to_the_candidates():
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    # Florence-2's decoder is BART: decoding starts with </s> (2) and BOS (0) is forced next
+    config = transformers.BartConfig(
+        vocab_size=40, d_model=32, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2,
+        decoder_attention_heads=2, encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=64,
+        bos_token_id=0, eos_token_id=2, pad_token_id=1, decoder_start_token_id=2, forced_bos_token_id=0,
+    )
+    model = transformers.BartForConditionalGeneration(config).eval()
+    captions = [[[10, 11, 12], [10, 13], [20]], [[30, 31], [5]], [[7, 8, 9, 6, 5, 4]]]
+    allowed = caption_constraint(captions, {0, 2}, 2)
+
+    def generate(max_new_tokens):
+        out = model.generate(inputs_embeds=torch.randn(3, 4, 32), attention_mask=torch.ones(3, 4, dtype=torch.long),
+                             max_new_tokens=max_new_tokens, num_beams=1, do_sample=False,
+                             prefix_allowed_tokens_fn=allowed)
+        return [[t for t in row if t not in (0, 1, 2)] for row in out.tolist()]
+
+    assert all(row in options for row, options in zip(generate(20), captions))
+    # Cut off by the cap, the long caption is left unfinished and so matches no candidate
+    assert generate(4)[2] not in captions[2]
+
+
+def test_predict_verifies_low_confidence_detections(api, main_module, monkeypatch):
+    cascade = CropCascade(lambda: TinyCaptioner(CLASSES, generic_rate=0, hidden=64), threshold=0.6)
+    monkeypatch.setattr(main_module, "cascade", cascade)
+    api.portal.call(cascade.start)
+    deadline = time.monotonic() + 30
+    while not cascade.enabled:
+        assert time.monotonic() < deadline and cascade.state != "failed", cascade.snapshot()
+        time.sleep(0.05)
+
+    try:
+        results = {}
+        for species in (CLASSES.index("Cardinal"), CLASSES.index("Blue Jay")):
+            ok, png = cv2.imencode(".png", blob_image(species))
+            response = api.post("/predict/", files={"file": ("blob.png", png.tobytes(), "image/png")},
+                                params={"enrich": "none"})
+            assert response.status_code == 200, response.text
+            results[CLASSES[species]] = response.json()["detections"]
+    finally:
+        api.portal.call(cascade.stop)
+
+    assert results["Cardinal"] and results["Blue Jay"]
+    for det in results["Cardinal"]:
+        assert det["confidence"] < 0.6 and det["verified"] and det["verifier_class"] == "Cardinal"
+    # The one-class detector only offers "Cardinal", which a blue crop isn't
+    for det in results["Blue Jay"]:
+        assert not det["verified"] and det["class"] == "Cardinal"
+    stats = api.get("/stats/cascade").json()
+    assert stats["state"] == "ready" and stats["escalated_fraction"] == 1.0
+    assert stats["crops"] == len(results["Cardinal"]) + len(results["Blue Jay"])
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+from core import species_info
+from core.enrichment import SpeciesEnricher
+
+NAMES = [f"Synthetic Bird {i % 5}" for i in range(50)]
+
+
+async def lookups(names, deadline=None):
+    enricher = SpeciesEnricher()
+    try:
+        return await asyncio.gather(*[enricher.get(name, deadline) for name in names]), enricher.snapshot()
+    finally:
+        await enricher.aclose()
+
+
+def test_concurrent_lookups_share_one_fetch_per_species(wikipedia):
+    wikipedia.delay = 0.1
+    results, stats = asyncio.run(lookups(NAMES))
+    assert all(r["description"].startswith("Stand-in summary") for r in results)
+    assert wikipedia.requests_served == 5
+    assert stats["coalesced"] == len(NAMES) - 5
+
+
+def test_missed_deadline_returns_none_and_still_fills_the_cache(wikipedia):
+    wikipedia.delay = 0.3
+
+    async def run():
+        enricher = SpeciesEnricher()
+        started = time.perf_counter()
+        missed = await enricher.get(NAMES[0], deadline=0.05)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        await enricher.aclose()
+        return missed, elapsed, enricher.stats["deadline_misses"]
+
+    missed, elapsed, misses = asyncio.run(run())
+    assert missed is None and misses == 1
+    assert elapsed < 0.25
+    assert species_info.cache.get(species_info.normalize_name(NAMES[0]))[1]
+
+
+def test_sqlite_work_never_holds_up_memory_lookups_or_the_loop(wikipedia):
+    on_disk, in_memory = "synthetic bird 0", "synthetic bird 1"
+    species_info.cache.put(on_disk, {"name": on_disk, "description": "from disk"})
+    species_info.cache = species_info.SpeciesInfoCache(species_info.cache.path)
+    species_info.cache.put(in_memory, {"name": in_memory, "description": "from memory"})
+
+    # Stands in for a slow commit in another thread
+    species_info.cache._db_lock.acquire()
+    threading.Timer(0.3, species_info.cache._db_lock.release).start()
+
+    async def run():
+        enricher = SpeciesEnricher()
+        started = time.perf_counter()
+        disk = asyncio.create_task(enricher.get(on_disk))
+        memory = await enricher.get(in_memory)
+        memory_elapsed = time.perf_counter() - started
+        # The loop keeps running while the disk lookup waits for the lock
+        await asyncio.sleep(0.01)
+        loop_elapsed = time.perf_counter() - started
+        result = await disk
+        await enricher.aclose()
+        return memory, memory_elapsed, loop_elapsed, result
+
+    memory, memory_elapsed, loop_elapsed, disk = asyncio.run(run())
+    assert memory["description"] == "from memory" and memory_elapsed < 0.1
+    assert loop_elapsed < 0.1
+    assert disk["description"] == "from disk"
+    assert species_info.cache.stats["disk_hits"] == 1
+    assert wikipedia.requests_served == 0
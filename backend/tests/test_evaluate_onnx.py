@@ -0,0 +1,74 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_model import build_blob_detector
+from conftest import BACKEND
+
+sys.path.insert(0, os.path.join(os.path.dirname(BACKEND), "ai_model", "scripts"))
+import evaluate_onnx  # noqa: E402
+from packed_dataset import PackedDataset, pack_split  # noqa: E402
+
+# Bright 8px cells on a dark 640x640 image; the blob detector answers each with a 24px box on the cell centre
+BIRDS = [[(80, 80)], [(320, 200), (480, 400)], [(160, 560)], []]
+# Image 3 has a labelled bird the detector cannot see, so recall is 4/5
+MISSED = (200, 200)
+
+
+@pytest.fixture(scope="module")
+def split(tmp_path_factory):
+    root = tmp_path_factory.mktemp("cub_yolo")
+    image_dir, label_dir = root / "images" / "val", root / "labels" / "val"
+    image_dir.mkdir(parents=True)
+    label_dir.mkdir(parents=True)
+    for i, birds in enumerate(BIRDS):
+        image = np.full((640, 640, 3), 30, dtype=np.uint8)
+        labels = []
+        for x, y in birds:
+            image[y:y + 8, x:x + 8] = 255
+            labels.append(f"0 {(x + 4) / 640} {(y + 4) / 640} {24 / 640} {24 / 640}")
+        if not birds:
+            labels.append(f"0 {(MISSED[0] + 4) / 640} {(MISSED[1] + 4) / 640} {24 / 640} {24 / 640}")
+        cv2.imwrite(str(image_dir / f"val_{i}.jpg"), image)
+        (label_dir / f"val_{i}.txt").write_text("\n".join(labels) + "\n")
+    pack_split(image_dir, label_dir, root / "packed")
+    return root
+
+
+@pytest.fixture
+def scores(split, tmp_path, monkeypatch):
+    model_path = build_blob_detector(tmp_path / "blobs.onnx")
+    # The ORT cache goes to ../weights/.ort_cache, relative to the scripts directory
+    (tmp_path / "scripts").mkdir()
+    monkeypatch.chdir(tmp_path / "scripts")
+
+    def score(dataset):
+        return evaluate_onnx.evaluate_onnx(model_path, dataset, ["Cardinal"], batch_size=3, workers=2)
+    return score
+
+
+def test_evaluate_onnx_scores_a_known_split(split, scores):
+    result = scores(evaluate_onnx.LooseSplit(split))
+    assert result["images"] == len(BIRDS)
+    assert result["map50"] == pytest.approx(0.8, abs=0.01)
+    assert result["map50_95"] == pytest.approx(0.8, abs=0.01)
+    # Image 3 has no detection at all, so its top-1 is a miss
+    assert result["top1"] == pytest.approx(3 / 4)
+    assert result["per_class"]["Cardinal"]["instances"] == 5
+
+
+def test_packed_and_loose_splits_score_the_same(split, scores):
+    loose = scores(evaluate_onnx.LooseSplit(split))
+    packed = scores(PackedDataset(split / "packed"))
+    for key in ("images", "map50", "map50_95", "top1", "per_class"):
+        assert packed[key] == loose[key]
+
+
+def test_match_predictions_pairs_each_box_once():
+    gt = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    preds = np.array([[0, 0, 10, 10], [1, 1, 10, 10]], dtype=np.float32)
+    correct = evaluate_onnx.match_predictions(preds, np.array([0, 0]), gt, np.array([0]))
+    assert correct[:, 0].tolist() == [True, False]
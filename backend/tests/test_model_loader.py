@@ -0,0 +1,77 @@
+import multiprocessing as mp
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+from core import model_loader
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    return build_synthetic_yolo(tmp_path_factory.mktemp("loader") / "synthetic.onnx", num_classes=5, input_size=320)
+
+
+def run(session):
+    image = np.random.default_rng(0).random((1, 3, 320, 320), dtype=np.float32)
+    return session.run(None, {session.get_inputs()[0].name: image})[0]
+
+
+def load(model_path, cache_dir, level="all"):
+    config = model_loader.load_session_config(optimized_model_dir=str(cache_dir), graph_optimization_level=level)
+    return model_loader.create_session(model_path, config)
+
+
+def _load_in_child(model_path, cache_dir, results):
+    try:
+        results.put(run(load(model_path, cache_dir)).sum())
+    except Exception as e:
+        results.put(repr(e))
+
+
+@pytest.mark.parametrize("level", ["all", "extended", "basic"])
+def test_cached_graph_gives_the_same_outputs(model_path, tmp_path, level):
+    config = model_loader.load_session_config(optimized_model_dir=None, graph_optimization_level=level)
+    expected = run(model_loader.create_session(model_path, config))
+
+    cold = run(load(model_path, tmp_path, level))
+    cached = model_loader.optimized_model_path(model_path, model_loader.load_session_config(
+        optimized_model_dir=str(tmp_path), graph_optimization_level=level,
+    ))
+    assert os.listdir(tmp_path) == [os.path.basename(cached)]
+    warm = run(load(model_path, tmp_path, level))
+    np.testing.assert_allclose(cold, expected, rtol=1e-5)
+    np.testing.assert_allclose(warm, expected, rtol=1e-5)
+
+
+def test_all_level_caches_the_portable_extended_graph(model_path, tmp_path):
+    all_path = model_loader.optimized_model_path(model_path, {"optimized_model_dir": str(tmp_path),
+                                                              "graph_optimization_level": "all"})
+    extended_path = model_loader.optimized_model_path(model_path, {"optimized_model_dir": str(tmp_path),
+                                                                   "graph_optimization_level": "extended"})
+    assert all_path == extended_path
+
+
+def test_concurrent_first_loads_never_read_a_partial_graph(model_path, tmp_path):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    children = [ctx.Process(target=_load_in_child, args=(model_path, tmp_path, results)) for _ in range(4)]
+    for child in children:
+        child.start()
+    sums = [results.get(timeout=60) for _ in children]
+    for child in children:
+        child.join()
+    assert all(isinstance(s, np.floating) for s in sums), sums
+    assert len(set(float(s) for s in sums)) == 1
+    assert [name for name in os.listdir(tmp_path) if ".tmp." in name] == []
+
+
+def test_model_file_is_hashed_once_per_change(model_path, monkeypatch):
+    model_loader.file_digest(model_path)
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda path, *a, **k: opened.append(path) or real_open(path, *a, **k))
+    model_loader.model_version(model_path)
+    model_loader.optimized_model_path(model_path, {"optimized_model_dir": "cache", "graph_optimization_level": "all"})
+    assert opened == []
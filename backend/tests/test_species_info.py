@@ -0,0 +1,66 @@
+from core import species_info
+
+NAMES = [f"Synthetic Bird {i}" for i in range(5)]
+
+
+def test_warm_cache_serves_memory_disk_and_offline_without_the_network(wikipedia, tmp_path):
+    assert species_info.warm_cache(NAMES) == len(NAMES)
+    assert wikipedia.requests_served == len(NAMES)
+    # Already fresh: nothing to fetch
+    assert species_info.warm_cache(NAMES) == 0
+
+    for name in NAMES:
+        assert species_info.get_species_info(name)["description"] == f"Stand-in summary for {name.title()}."
+    assert species_info.cache.stats["memory_hits"] >= len(NAMES)
+
+    # A new process only has the SQLite snapshot
+    path = species_info.cache.path
+    species_info.cache = species_info.SpeciesInfoCache(path)
+    assert species_info.get_species_info("synthetic_bird  0")["name"] == "synthetic_bird  0"
+    assert species_info.cache.stats["disk_hits"] == 1
+
+    # Expired entries are still served when offline
+    species_info.cache = species_info.SpeciesInfoCache(path, ttl=0)
+    species_info.OFFLINE = True
+    assert "error" not in species_info.get_species_info(NAMES[1])
+    assert species_info.cache.stats["stale_hits"] == 1
+    assert wikipedia.requests_served == len(NAMES)
+
+
+def test_failures_are_not_cached_over_good_entries(wikipedia):
+    wikipedia.status = 503
+    assert "error" in species_info.get_species_info(NAMES[0])
+    assert species_info.cache.get(species_info.normalize_name(NAMES[0])) == (None, False)
+
+    wikipedia.status = 200
+    good = species_info.get_species_info(NAMES[0])
+    species_info.cache.ttl = 0
+    wikipedia.status = 429
+    assert species_info.get_species_info(NAMES[0]) == good
+    assert species_info.cache.get(species_info.normalize_name(NAMES[0]))[0]["description"] == good["description"]
+
+
+def test_missing_page_is_cached_as_unavailable(wikipedia):
+    wikipedia.status = 404
+    info = species_info.get_species_info(NAMES[0])
+    assert info["scientific_name"] == "Unknown"
+    assert species_info.get_species_info(NAMES[0]) == info
+    assert wikipedia.requests_served == 1
+
+
+def test_load_class_names(tmp_path):
+    path = tmp_path / "classes.txt"
+    path.write_text("1 001.Black_footed_Albatross\n2 002.Laysan_Albatross\n\n")
+    assert species_info.load_class_names(str(path)) == ["Black footed Albatross", "Laysan Albatross"]
+
+
+def test_species_endpoint(api, wikipedia):
+    response = api.get("/species/Synthetic Bird 0")
+    assert response.status_code == 200
+    assert response.json()["description"] == "Stand-in summary for Synthetic Bird 0."
+    assert api.get("/species/synthetic_bird_0").json()["description"] == response.json()["description"]
+    assert wikipedia.requests_served == 1
+    assert api.get("/stats/species_cache").json()["memory_hits"] >= 1
+
+    wikipedia.status = 500
+    assert api.get("/species/Synthetic Bird 1").status_code == 404
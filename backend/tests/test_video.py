@@ -0,0 +1,72 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+FPS = 10
+SIZE = (640, 480)
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """Two birds cross a dim, static background at t=1-3s and t=6-8s; nothing moves otherwise."""
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 120, (SIZE[1], SIZE[0], 3), dtype=np.uint8), (21, 21), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, SIZE)
+    for i in range(10 * FPS):
+        frame = background.copy()
+        t = i / FPS
+        for start, y in [(1.0, 120), (6.0, 240)]:
+            if start <= t < start + 2:
+                # A dim body big enough for the frame-diff filter's thumbnail, and one bright 8px
+                # cell the blob detector sees as a single box, moving a cell per frame
+                x = 8 * (5 + round((t - start) * FPS))
+                frame[y - 16:y + 24, x - 16:x + 24] = 130
+                frame[y:y + 8, x:x + 8] = 255
+        writer.write(frame)
+    writer.release()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def post_clip(api, clip, **params):
+    response = api.post("/predict/video", files={"file": ("clip.avi", clip, "video/x-msvideo")},
+                        params=dict({"sample_fps": FPS, "emit": "tracks"}, **params))
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("threshold", [0.0, None])
+def test_video_tracks_each_bird_once(api, main_module, monkeypatch, clip, threshold):
+    if threshold is not None:
+        monkeypatch.setattr(main_module, "VIDEO_DIFF_THRESHOLD", threshold)
+    events = post_clip(api, clip)
+    summary = events[-1]
+    assert summary["type"] == "summary"
+    assert summary["frames"] == 10 * FPS
+    if threshold == 0.0:
+        assert summary["analysed"] == summary["frames"] and summary["reused"] == 0
+    else:
+        # The motionless stretches reuse the previous frame's detections
+        assert summary["reused"] > summary["frames"] // 2
+
+    ends = [e["track"] for e in events if e["type"] == "track_end"]
+    assert summary["tracks"] == len(ends) == 2
+    assert all(track["class"] == "Cardinal" for track in ends)
+    assert [e["type"] for e in events].count("frame") == 0
+    # Species info comes once per track, not once per frame
+    infos = [e for e in events if e["type"] == "track_info"]
+    assert sorted(e["track_id"] for e in infos) == sorted(t["track_id"] for t in ends)
+
+
+def test_video_frames_and_no_enrichment(api, clip):
+    events = post_clip(api, clip, emit="frames", enrich="false")
+    assert [e["type"] for e in events].count("frame") == events[-1]["frames"]
+    assert not any(e["type"] == "track_info" for e in events)
+
+
+def test_video_rejects_undecodable_upload(api):
+    response = api.post("/predict/video", files={"file": ("clip.avi", b"not a video", "video/x-msvideo")})
+    assert response.status_code == 400
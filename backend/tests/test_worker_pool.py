@@ -0,0 +1,47 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_model import build_synthetic_yolo
+from core.worker_pool import InferenceWorkerPool
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    return build_synthetic_yolo(tmp_path_factory.mktemp("pool") / "synthetic.onnx", num_classes=5, input_size=320)
+
+
+def test_a_caller_giving_up_does_not_stall_later_jobs(model_path):
+    pool = InferenceWorkerPool(model_path, ["a", "b", "c", "d", "e"], num_workers=1, input_size=320,
+                               health_interval=0.2)
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    async def run():
+        await pool.start()
+        try:
+            # Cancels the wrapped future before the worker answers, like a disconnect or an admission 504
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.submit(image), 0.001)
+            await asyncio.sleep(0.5)
+            detections = await asyncio.wait_for(pool.submit(image), 10)
+            return detections, pool.healthy
+        finally:
+            await pool.stop()
+
+    detections, healthy = asyncio.run(run())
+    assert isinstance(detections, list)
+    assert healthy
+
+
+def test_a_dead_collector_makes_the_pool_unhealthy(model_path):
+    pool = InferenceWorkerPool(model_path, ["a", "b", "c", "d", "e"], num_workers=1, input_size=320)
+    pool.start_sync()
+    try:
+        assert pool.healthy
+        pool._results.put(None)  # stops the collector, as an exception escaping it would
+        pool._collector.join(timeout=5)
+        assert not pool.healthy
+    finally:
+        pool.stop_sync()
+    assert pool.healthy
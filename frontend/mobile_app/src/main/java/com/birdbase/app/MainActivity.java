@@ -2,6 +2,13 @@ package com.birdbase.app;
 
 import android.content.Intent;
 import android.graphics.Bitmap;
+import android.graphics.BitmapFactory;
+import android.graphics.Canvas;
+import android.graphics.Color;
+import android.graphics.Matrix;
+import android.graphics.Paint;
+import android.media.ExifInterface;
+import android.net.Uri;
 import android.os.Bundle;
 import android.provider.MediaStore;
 import android.widget.Button;
@@ -10,15 +17,57 @@ import android.widget.TextView;
 import android.widget.Toast;
 import androidx.annotation.Nullable;
 import androidx.appcompat.app.AppCompatActivity;
+import androidx.core.content.FileProvider;
+
+import org.json.JSONArray;
+import org.json.JSONException;
+import org.json.JSONObject;
+
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.net.HttpURLConnection;
+import java.net.URL;
+import java.nio.charset.StandardCharsets;
+import java.util.Locale;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
 
 /**
  * Skeleton code for Android App integrating with the BirdBase FastAPI.
+ *
+ * The camera writes the full-resolution photo to a cache file shared through a FileProvider
+ * (authority "<package>.fileprovider", paths in res/xml/file_paths.xml), since the
+ * ACTION_IMAGE_CAPTURE "data" extra is only a thumbnail.
  */
 public class MainActivity extends AppCompatActivity {
 
     private static final int REQUEST_IMAGE_CAPTURE = 1;
+    private static final String API_URL = "http://10.0.2.2:8000/predict/";
+    // The model sees at most this many pixels on the long side, so larger photos are shrunk before upload
+    private static final int MODEL_INPUT_SIZE = 640;
+    private static final int UPLOAD_JPEG_QUALITY = 90;
+    private static final String BOUNDARY = "birdbase-upload";
+
+    private final ExecutorService network = Executors.newSingleThreadExecutor();
     private ImageView imageView;
     private TextView resultText;
+    private File photoFile;
+
+    /** The photo as uploaded, with the size of the photo it was made from. */
+    static final class Photo {
+        final Bitmap bitmap;
+        final int originalWidth;
+        final int originalHeight;
+
+        Photo(Bitmap bitmap, int originalWidth, int originalHeight) {
+            this.bitmap = bitmap;
+            this.originalWidth = originalWidth;
+            this.originalHeight = originalHeight;
+        }
+    }
 
     @Override
     protected void onCreate(Bundle savedInstanceState) {
@@ -34,28 +83,205 @@ public class MainActivity extends AppCompatActivity {
 
     private void dispatchTakePictureIntent() {
         Intent takePictureIntent = new Intent(MediaStore.ACTION_IMAGE_CAPTURE);
-        if (takePictureIntent.resolveActivity(getPackageManager()) != null) {
-            startActivityForResult(takePictureIntent, REQUEST_IMAGE_CAPTURE);
+        if (takePictureIntent.resolveActivity(getPackageManager()) == null) {
+            return;
+        }
+        try {
+            File dir = new File(getCacheDir(), "photos");
+            if (!dir.isDirectory() && !dir.mkdirs()) {
+                throw new IOException("Cannot create " + dir);
+            }
+            photoFile = File.createTempFile("capture", ".jpg", dir);
+        } catch (IOException e) {
+            Toast.makeText(this, "Cannot save a photo: " + e.getMessage(), Toast.LENGTH_LONG).show();
+            return;
         }
+        Uri photoUri = FileProvider.getUriForFile(this, getPackageName() + ".fileprovider", photoFile);
+        takePictureIntent.putExtra(MediaStore.EXTRA_OUTPUT, photoUri);
+        takePictureIntent.addFlags(Intent.FLAG_GRANT_WRITE_URI_PERMISSION);
+        startActivityForResult(takePictureIntent, REQUEST_IMAGE_CAPTURE);
     }
 
     @Override
     protected void onActivityResult(int requestCode, int resultCode, @Nullable Intent data) {
         super.onActivityResult(requestCode, resultCode, data);
-        if (requestCode == REQUEST_IMAGE_CAPTURE && resultCode == RESULT_OK) {
-            Bundle extras = data.getExtras();
-            Bitmap imageBitmap = (Bitmap) extras.get("data");
-            imageView.setImageBitmap(imageBitmap);
-
-            // TODO: Convert Bitmap to File/ByteArray and send via POST to FastAPI /predict
-            analyzeImage(imageBitmap);
+        if (requestCode != REQUEST_IMAGE_CAPTURE || photoFile == null) {
+            return;
+        }
+        File file = photoFile;
+        photoFile = null;
+        if (resultCode == RESULT_OK) {
+            analyzeImage(file);
+        } else {
+            file.delete();
         }
     }
 
-    private void analyzeImage(Bitmap bitmap) {
-        // Placeholder for network call
+    private void analyzeImage(File file) {
         resultText.setText("Analyzing image via backend...");
-        // Call Retrofit or OkHttp to POST to http://<API_IP>:8000/predict/
-        // Update resultText on response.
+        network.execute(() -> {
+            Photo photo = null;
+            String result;
+            try {
+                photo = loadForUpload(file);
+                Bitmap preview = photo.bitmap;
+                runOnUiThread(() -> imageView.setImageBitmap(preview));
+                result = upload(photo);
+            } catch (IOException e) {
+                result = photo == null ? "Cannot read the photo: " + e.getMessage()
+                        : "Failed to reach the backend: " + e.getMessage();
+            } finally {
+                file.delete();
+            }
+            String text = result;
+            runOnUiThread(() -> resultText.setText(text));
+        });
+    }
+
+    /**
+     * Decodes the captured photo at the smallest power-of-two reduction that still covers the
+     * model input size, applies its EXIF rotation and shrinks it to the model input size, so
+     * the full-resolution photo is never held in memory.
+     */
+    static Photo loadForUpload(File file) throws IOException {
+        BitmapFactory.Options options = new BitmapFactory.Options();
+        options.inJustDecodeBounds = true;
+        BitmapFactory.decodeFile(file.getPath(), options);
+        int width = options.outWidth;
+        int height = options.outHeight;
+        if (width <= 0 || height <= 0) {
+            throw new IOException("not an image");
+        }
+
+        options.inJustDecodeBounds = false;
+        options.inSampleSize = 1;
+        while (Math.max(width, height) / (options.inSampleSize * 2) >= MODEL_INPUT_SIZE) {
+            options.inSampleSize *= 2;
+        }
+        Bitmap bitmap = BitmapFactory.decodeFile(file.getPath(), options);
+        if (bitmap == null) {
+            throw new IOException("cannot decode the photo");
+        }
+
+        int degrees = rotationDegrees(file);
+        if (degrees != 0) {
+            Matrix matrix = new Matrix();
+            matrix.postRotate(degrees);
+            bitmap = Bitmap.createBitmap(bitmap, 0, 0, bitmap.getWidth(), bitmap.getHeight(), matrix, true);
+            if (degrees % 180 != 0) {
+                int swap = width;
+                width = height;
+                height = swap;
+            }
+        }
+        return new Photo(downscaleForUpload(bitmap), width, height);
+    }
+
+    private static int rotationDegrees(File file) throws IOException {
+        switch (new ExifInterface(file.getPath()).getAttributeInt(
+                ExifInterface.TAG_ORIENTATION, ExifInterface.ORIENTATION_NORMAL)) {
+            case ExifInterface.ORIENTATION_ROTATE_90:
+                return 90;
+            case ExifInterface.ORIENTATION_ROTATE_180:
+                return 180;
+            case ExifInterface.ORIENTATION_ROTATE_270:
+                return 270;
+            default:
+                return 0;
+        }
+    }
+
+    /**
+     * Shrinks the photo to the model input size, so only the pixels the model uses are sent.
+     * Returns the bitmap itself when it is already small enough.
+     */
+    static Bitmap downscaleForUpload(Bitmap bitmap) {
+        int longSide = Math.max(bitmap.getWidth(), bitmap.getHeight());
+        if (longSide <= MODEL_INPUT_SIZE) {
+            return bitmap;
+        }
+        float scale = (float) MODEL_INPUT_SIZE / longSide;
+        int width = Math.max(1, Math.round(bitmap.getWidth() * scale));
+        int height = Math.max(1, Math.round(bitmap.getHeight() * scale));
+        return Bitmap.createScaledBitmap(bitmap, width, height, true);
+    }
+
+    /** POSTs the downscaled photo as JPEG with its original size, so boxes come back in original pixels. */
+    private String upload(Photo photo) throws IOException {
+        Bitmap bitmap = photo.bitmap;
+        ByteArrayOutputStream jpeg = new ByteArrayOutputStream();
+        bitmap.compress(Bitmap.CompressFormat.JPEG, UPLOAD_JPEG_QUALITY, jpeg);
+
+        boolean resized = bitmap.getWidth() != photo.originalWidth || bitmap.getHeight() != photo.originalHeight;
+        String query = resized
+                ? "?original_width=" + photo.originalWidth + "&original_height=" + photo.originalHeight : "";
+        HttpURLConnection connection = (HttpURLConnection) new URL(API_URL + query).openConnection();
+        try {
+            connection.setDoOutput(true);
+            connection.setRequestMethod("POST");
+            connection.setRequestProperty("Content-Type", "multipart/form-data; boundary=" + BOUNDARY);
+            byte[] head = ("--" + BOUNDARY + "\r\n"
+                    + "Content-Disposition: form-data; name=\"file\"; filename=\"upload.jpg\"\r\n"
+                    + "Content-Type: image/jpeg\r\n\r\n").getBytes(StandardCharsets.UTF_8);
+            byte[] tail = ("\r\n--" + BOUNDARY + "--\r\n").getBytes(StandardCharsets.UTF_8);
+            connection.setFixedLengthStreamingMode(head.length + jpeg.size() + tail.length);
+            try (OutputStream out = connection.getOutputStream()) {
+                out.write(head);
+                jpeg.writeTo(out);
+                out.write(tail);
+            }
+
+            int status = connection.getResponseCode();
+            InputStream body = status < 400 ? connection.getInputStream() : connection.getErrorStream();
+            ByteArrayOutputStream response = new ByteArrayOutputStream();
+            byte[] buffer = new byte[8192];
+            for (int n; body != null && (n = body.read(buffer)) != -1; ) {
+                response.write(buffer, 0, n);
+            }
+            return describe(status, response.toString("UTF-8"), photo);
+        } finally {
+            connection.disconnect();
+        }
+    }
+
+    /** Turns the API's JSON answer into the text shown, drawing the top box on the preview. */
+    private String describe(int status, String json, Photo photo) {
+        try {
+            JSONObject result = new JSONObject(json);
+            if (status >= 400) {
+                return "Error " + status + ": " + result.optString("detail", json);
+            }
+            if (!result.optBoolean("detected")) {
+                return result.optString("message", "No bird found.");
+            }
+            String species = result.getString("species");
+            double confidence = result.getDouble("confidence");
+            JSONArray box = result.getJSONArray("bounding_box");
+            Bitmap marked = drawBox(photo, box.getDouble(0), box.getDouble(1), box.getDouble(2), box.getDouble(3));
+            runOnUiThread(() -> imageView.setImageBitmap(marked));
+            return String.format(Locale.US, "%s (%.0f%%)%nBox: x=%.0f y=%.0f w=%.0f h=%.0f", species,
+                    confidence * 100, box.getDouble(0), box.getDouble(1), box.getDouble(2), box.getDouble(3));
+        } catch (JSONException e) {
+            return status >= 400 ? "Error " + status : "Unexpected response: " + json;
+        }
+    }
+
+    /** Draws an [x, y, w, h] box given in original photo pixels onto a copy of the uploaded bitmap. */
+    static Bitmap drawBox(Photo photo, double x, double y, double w, double h) {
+        Bitmap marked = photo.bitmap.copy(Bitmap.Config.ARGB_8888, true);
+        float sx = (float) marked.getWidth() / photo.originalWidth;
+        float sy = (float) marked.getHeight() / photo.originalHeight;
+        Paint paint = new Paint();
+        paint.setColor(Color.GREEN);
+        paint.setStyle(Paint.Style.STROKE);
+        paint.setStrokeWidth(Math.max(2f, marked.getWidth() / 160f));
+        new Canvas(marked).drawRect((float) x * sx, (float) y * sy, (float) (x + w) * sx, (float) (y + h) * sy, paint);
+        return marked;
+    }
+
+    @Override
+    protected void onDestroy() {
+        network.shutdown();
+        super.onDestroy();
     }
 }
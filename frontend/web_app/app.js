@@ -7,6 +7,9 @@ const resultsSection = document.getElementById('results-section');
 
 // API ENDPOINT
 const API_URL = 'http://localhost:8000/predict/';
+// The model sees at most this many pixels on the long side, so larger photos are shrunk before upload
+const MODEL_INPUT_SIZE = 640;
+const UPLOAD_JPEG_QUALITY = 0.9;
 
 // Drag and drop events
 ['dragenter', 'dragover', 'dragleave', 'drop'].forEach(eventName => {
@@ -56,15 +59,67 @@ function handleFiles(files) {
     }
 }
 
+// Downscale to the model input size in the browser and re-encode as JPEG.
+// Resolves to {blob, width, height} with the original (EXIF-rotated) size, or null to send the file as is.
+async function downscaleForUpload(file) {
+    if (typeof createImageBitmap === 'undefined') return null;
+    let bitmap;
+    try {
+        bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+    } catch (error) {
+        return null;
+    }
+    const { width, height } = bitmap;
+    const scale = MODEL_INPUT_SIZE / Math.max(width, height);
+    if (scale >= 1) {
+        bitmap.close();
+        return null;
+    }
+    const targetWidth = Math.max(1, Math.round(width * scale));
+    const targetHeight = Math.max(1, Math.round(height * scale));
+
+    let canvas;
+    if (typeof OffscreenCanvas !== 'undefined') {
+        canvas = new OffscreenCanvas(targetWidth, targetHeight);
+    } else {
+        canvas = document.createElement('canvas');
+        canvas.width = targetWidth;
+        canvas.height = targetHeight;
+    }
+    const ctx = canvas.getContext('2d');
+    ctx.imageSmoothingQuality = 'high';
+    ctx.drawImage(bitmap, 0, 0, targetWidth, targetHeight);
+    bitmap.close();
+
+    const blob = canvas.convertToBlob
+        ? await canvas.convertToBlob({ type: 'image/jpeg', quality: UPLOAD_JPEG_QUALITY })
+        : await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', UPLOAD_JPEG_QUALITY));
+    return blob ? { blob, width, height } : null;
+}
+
 async function analyzeImage(file) {
     loader.classList.remove('hidden');
     resultsSection.classList.add('hidden');
 
     const formData = new FormData();
-    formData.append("file", file);
+    let url = API_URL;
+    let resized = null;
+    try {
+        resized = await downscaleForUpload(file);
+    } catch (error) {
+        // e.g. the canvas couldn't be encoded: the server can still take the original
+        console.warn("Client-side downscale failed, sending the original:", error);
+    }
+    if (resized) {
+        // Boxes come back in the original photo's pixels
+        formData.append("file", resized.blob, "upload.jpg");
+        url += `?original_width=${resized.width}&original_height=${resized.height}`;
+    } else {
+        formData.append("file", file);
+    }
 
     try {
-        const response = await fetch(API_URL, {
+        const response = await fetch(url, {
             method: 'POST',
             body: formData
         });
@@ -95,7 +150,7 @@ function displayResults(data) {
     document.getElementById('species-name').innerText = data.species;
     document.getElementById('confidence-score').innerText = Math.round(data.confidence * 100) + '%';
     
-    const info = data.info;
+    const info = data.info || {};
     document.getElementById('scientific-name').innerText = info.scientific_name || "N/A";
     document.getElementById('lifespan').innerText = info.lifespan || "N/A";
     document.getElementById('habitat').innerText = info.habitat || "N/A";